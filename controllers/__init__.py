@@ -1,7 +1,9 @@
 # local
 from .circuit import CircuitCreateController, CircuitListController, CircuitUpdateController
+from .circuit_statistics import CircuitStatisticsListController
 from .circuit_class import CircuitClassCreateController, CircuitClassListController, CircuitClassUpdateController
 from .property_type import PropertyTypeListController
+from .property_value import PropertyValueListController
 
 
 __all__ = [
@@ -14,6 +16,9 @@ __all__ = [
     # circuit_with_id
     'CircuitUpdateController',
 
+    # circuit_statistics
+    'CircuitStatisticsListController',
+
     # circuit_class
     'CircuitClassListController',
 
@@ -23,4 +28,7 @@ __all__ = [
 
     # property_type
     'PropertyTypeListController',
+
+    # property_value
+    'PropertyValueListController',
 ]
@@ -0,0 +1,149 @@
+# stdlib
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+# libs
+from cloudcix.api.membership import Membership
+from django.conf import settings
+from django.core.cache import cache
+from jaeger_client import Span
+from rest_framework.request import Request
+# local
+from circuit.instrumentation import upstream_call
+
+__all__ = [
+    'ADDRESS_FIELDS',
+    'ReadableAddressMixin',
+    'get_readable_addresses',
+    'prefetch_readable_addresses',
+]
+
+# Fields of a Circuit that hold the id of another Address, which the requesting User must be able to read
+ADDRESS_FIELDS = ('customer_address_id', 'service_provider_address_id')
+
+# Maximum number of Addresses read from Membership at the same time
+ADDRESS_READ_WORKERS = 8
+
+
+def _cache_key(token_hash: str, address_id: int) -> str:
+    """
+    Generate the cache key used to store that the User of a token can read an Address. Membership checks the read
+    with the token, so Users in the same Address with different permissions never share a result.
+    """
+    return f'circuit_readable_address_{token_hash}_{address_id}'
+
+
+def _can_read(request: Request, address_id: int, span: Span) -> bool:
+    with upstream_call():
+        response = Membership.address.read(
+            token=request.user.token,
+            pk=address_id,
+            span=span,
+        )
+    return response.status_code == 200
+
+
+def get_readable_addresses(request: Request, span: Span, address_ids: Iterable[int]) -> Set[int]:
+    """
+    Find which of the given Addresses the requesting User can read.
+    The User's own Address is always readable. Positive results are cached for `CIRCUIT_READABLE_ADDRESS_CACHE_TTL`
+    seconds for the User's token, and the rest are read from Membership concurrently rather than one after the other.
+    """
+    # The token is hashed so it is not stored in the cache keys
+    token_hash = hashlib.sha256(request.user.token.encode()).hexdigest()
+    address_ids = set(address_ids)
+    readable = {request.user.address['id']} & address_ids
+    keys = {_cache_key(token_hash, address_id): address_id for address_id in address_ids - readable}
+    if len(keys) == 0:
+        return readable
+    cached = cache.get_many(keys.keys())
+    readable.update(keys[key] for key in cached)
+    missing = [address_id for key, address_id in keys.items() if key not in cached]
+    span.set_tag('readable_address_cache_misses', len(missing))
+    if len(missing) == 0:
+        return readable
+
+    with ThreadPoolExecutor(max_workers=min(ADDRESS_READ_WORKERS, len(missing))) as executor:
+        # Run each read in a copy of this context so the calls are recorded by the active instrumentation
+        futures = {
+            address_id: executor.submit(copy_context().run, _can_read, request, address_id, span)
+            for address_id in missing
+        }
+        found = {address_id for address_id, future in futures.items() if future.result()}
+
+    cache.set_many(
+        {_cache_key(token_hash, address_id): True for address_id in found},
+        getattr(settings, 'CIRCUIT_READABLE_ADDRESS_CACHE_TTL', 60),
+    )
+    return readable | found
+
+
+class ReadableAddressMixin:
+    """
+    Checks the Address fields of a Circuit controller. Every Address sent to the controller is checked at once the
+    first time one is needed, and the results are kept in `lookups`, which can be shared between the controllers
+    validating a batch of Circuits so each Address is only checked once for the whole batch.
+    """
+
+    def __init__(self, *args, lookups: Optional[Dict[Tuple[str, int], Any]] = None, **kwargs):
+        """
+        :param lookups: An optional dict shared between controllers validating a batch of Circuits, so each distinct
+                        Circuit Class and Address is only looked up once for the whole batch
+        """
+        super().__init__(*args, **kwargs)
+        self._lookups = lookups if lookups is not None else {}
+        self._sent_data = kwargs.get('data', None)
+
+    def _sent_address_ids(self) -> Set[int]:
+        """
+        The ids sent in the Address fields, skipping any that are not integers as their validators reject them
+        """
+        address_ids = set()
+        if isinstance(self._sent_data, dict):
+            for field in ADDRESS_FIELDS:
+                try:
+                    address_ids.add(int(self._sent_data[field]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+        return address_ids
+
+    def _address_is_readable(self, address_id: int) -> bool:
+        """
+        Check that the requesting User can read the Address
+        """
+        key = ('address', address_id)
+        if key not in self._lookups:
+            address_ids = self._sent_address_ids() | {address_id}
+            unchecked = {pk for pk in address_ids if ('address', pk) not in self._lookups}
+            readable = get_readable_addresses(self.request, self.span, unchecked)
+            for pk in unchecked:
+                self._lookups[('address', pk)] = pk in readable
+        return self._lookups[key]
+
+
+def prefetch_readable_addresses(
+        request: Request,
+        span: Span,
+        items: Iterable[Any],
+        lookups: Dict[Tuple[str, int], Any],
+):
+    """
+    Check the Addresses sent in a batch of Circuits together, before the items are validated one at a time, and store
+    the results in the `lookups` shared by their controllers
+    """
+    address_ids = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        for field in ADDRESS_FIELDS:
+            try:
+                address_ids.add(int(item[field]))
+            except (KeyError, TypeError, ValueError):
+                continue
+    unchecked = {pk for pk in address_ids if ('address', pk) not in lookups}
+    if len(unchecked) == 0:
+        return
+    readable = get_readable_addresses(request, span, unchecked)
+    for pk in unchecked:
+        lookups[('address', pk)] = pk in readable
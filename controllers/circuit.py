@@ -1,26 +1,50 @@
 
 # stdlib
-from decimal import Decimal
+from datetime import datetime
 from typing import Any, Dict, Optional
 
 # libs
-from cloudcix.api.membership import Membership
 from cloudcix_rest.controllers import ControllerBase
 from dateutil import parser
-from netaddr import AddrFormatError, IPNetwork
-from urllib.parse import urlparse
 
 # local
+from circuit.controllers.address_validation import ReadableAddressMixin
 from circuit.models import Circuit, CircuitClass
+from circuit.controllers.property_schema import (
+    INVALID_BOOLEAN,
+    INVALID_LINK,
+    INVALID_NETWORK,
+    INVALID_NUMERIC,
+    MISSING_KEY,
+    MISSING_VALUE,
+    UNKNOWN_PROPERTY_TYPE,
+    get_property_schema,
+)
 
 __all__ = [
 
     'CircuitListController',
     'CircuitCreateController',
     'CircuitUpdateController',
+    'CircuitBulkUpdateController',
+    'parse_datetime',
 ]
 
 
+def parse_datetime(value: Any) -> datetime:
+    """
+    Parse a date sent by the User. ISO 8601 strings, which nearly every client sends, are parsed with
+    datetime.fromisoformat and only anything else is passed to the much slower dateutil parser
+    :raises ValueError, TypeError: If the value is not a date
+    """
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return parser.parse(value)
+
+
 class CircuitListController(ControllerBase):
     """
     Validates User data used to filter a list of Circuit records
@@ -65,10 +89,20 @@ class CircuitListController(ControllerBase):
         }
 
 
-class CircuitCreateController(ControllerBase):
+class CircuitCreateController(ReadableAddressMixin, ControllerBase):
     """
     Validates User data used to filter a list of Circuit records
     """
+    # Error codes for the errors returned by PropertySchema.validate
+    PROPERTY_ERRORS = {
+        MISSING_VALUE: 'circuit_circuit_create_114',
+        INVALID_NUMERIC: 'circuit_circuit_create_115',
+        INVALID_LINK: 'circuit_circuit_create_116',
+        INVALID_NETWORK: 'circuit_circuit_create_117',
+        MISSING_KEY: 'circuit_circuit_create_118',
+        INVALID_BOOLEAN: 'circuit_circuit_create_124',
+        UNKNOWN_PROPERTY_TYPE: 'circuit_circuit_create_125',
+    }
 
     class Meta(ControllerBase.Meta):
         """
@@ -121,9 +155,14 @@ class CircuitCreateController(ControllerBase):
         except (ValueError, TypeError):
             return 'circuit_circuit_create_103'
 
-        try:
-            obj = CircuitClass.objects.get(pk=circuit_class_id, member_id=self.request.user.member['id'])
-        except CircuitClass.DoesNotExist:
+        key = ('circuit_class', circuit_class_id)
+        if key not in self._lookups:
+            self._lookups[key] = CircuitClass.objects.filter(
+                pk=circuit_class_id,
+                member_id=self.request.user.member['id'],
+            ).first()
+        obj = self._lookups[key]
+        if obj is None:
             return 'circuit_circuit_create_104'
 
         self.cleaned_data['circuit_class'] = obj
@@ -143,14 +182,8 @@ class CircuitCreateController(ControllerBase):
         except (ValueError, TypeError):
             return 'circuit_circuit_create_106'
 
-        if self.request.user.address['id'] != customer_address_id:
-            response = Membership.address.read(
-                token=self.request.user.token,
-                pk=customer_address_id,
-                span=self.span,
-            )
-            if response.status_code != 200:
-                return 'circuit_circuit_create_107'
+        if not self._address_is_readable(customer_address_id):
+            return 'circuit_circuit_create_107'
         self.cleaned_data['customer_address_id'] = customer_address_id
         return None
 
@@ -200,7 +233,7 @@ class CircuitCreateController(ControllerBase):
             return 'circuit_circuit_create_109'
 
         try:
-            install_date = parser.parse(install_date)
+            install_date = parse_datetime(install_date)
         except(ValueError, TypeError):
             return 'circuit_circuit_create_110'
 
@@ -217,7 +250,7 @@ class CircuitCreateController(ControllerBase):
             return None
 
         try:
-            decommission_date = parser.parse(decommission_date)
+            decommission_date = parse_datetime(decommission_date)
         except(ValueError, TypeError):
             return 'circuit_circuit_create_111'
 
@@ -246,8 +279,8 @@ class CircuitCreateController(ControllerBase):
             # An error was raised for circuit class and cannot proceed with
             # validating properties until resolved
             return None
-        circuit_class = self.cleaned_data['circuit_class']
-        if circuit_class.properties.count() == 0:
+        schema = get_property_schema(self.cleaned_data['circuit_class'].pk)
+        if len(schema) == 0:
             # Circuit Class has no properties
             return None
 
@@ -256,34 +289,9 @@ class CircuitCreateController(ControllerBase):
             properties = {}
         if not isinstance(properties, dict):
             return 'circuit_circuit_create_113'
-        for p in circuit_class.properties.all():
-            if p.key in properties:
-                if p.required:
-                    if properties.get(p.key) is None:
-                        return 'circuit_circuit_create_114'
-                value = properties.get(p.key)
-                if value:
-                    if p.property_type_id == 1:
-                        value = str(value)
-                    elif p.property_type_id == 2:
-                        if not isinstance(value, (int, float, complex, Decimal)):
-                            return 'circuit_circuit_create_115'
-                    elif p.property_type_id == 3:
-                        if not isinstance(value, bool):
-                            return None
-                    elif p.property_type_id == 4:
-                        result = urlparse(value)
-                        if not all([result.scheme, result.netloc]):
-                            return 'circuit_circuit_create_116'
-                    elif p.property_type_id == 5:
-                        try:
-                            IPNetwork(value)
-                        except (TypeError, ValueError, AddrFormatError):
-                            return 'circuit_circuit_create_117'
-            else:
-                if p.required:
-                    return 'circuit_circuit_create_118'
-                properties.update({p.key: None})
+        error = schema.validate(properties)
+        if error is not None:
+            return self.PROPERTY_ERRORS[error]
 
         self.cleaned_data['properties'] = properties
         return None
@@ -315,23 +323,27 @@ class CircuitCreateController(ControllerBase):
         except (ValueError, TypeError):
             return 'circuit_circuit_create_121'
 
-        if self.request.user.address['id'] != service_provider_address_id:
-            response = Membership.address.read(
-                token=self.request.user.token,
-                pk=service_provider_address_id,
-                span=self.span,
-            )
-            if response.status_code != 200:
-                return 'circuit_circuit_create_122'
+        if not self._address_is_readable(service_provider_address_id):
+            return 'circuit_circuit_create_122'
 
         self.cleaned_data['service_provider_address_id'] = service_provider_address_id
         return None
 
 
-class CircuitUpdateController(ControllerBase):
+class CircuitUpdateController(ReadableAddressMixin, ControllerBase):
     """
     Validates User data used to filter a list of Circuit records
     """
+    # Error codes for the errors returned by PropertySchema.validate
+    PROPERTY_ERRORS = {
+        MISSING_VALUE: 'circuit_circuit_update_111',
+        INVALID_NUMERIC: 'circuit_circuit_update_112',
+        INVALID_LINK: 'circuit_circuit_update_113',
+        INVALID_NETWORK: 'circuit_circuit_update_114',
+        MISSING_KEY: 'circuit_circuit_update_115',
+        INVALID_BOOLEAN: 'circuit_circuit_update_121',
+        UNKNOWN_PROPERTY_TYPE: 'circuit_circuit_update_122',
+    }
 
     class Meta(ControllerBase.Meta):
         """
@@ -381,14 +393,8 @@ class CircuitUpdateController(ControllerBase):
         except (ValueError, TypeError):
             return 'circuit_circuit_update_103'
 
-        if self.request.user.address['id'] != customer_address_id:
-            response = Membership.address.read(
-                token=self.request.user.token,
-                pk=customer_address_id,
-                span=self.span,
-            )
-            if response.status_code != 200:
-                return 'circuit_circuit_update_104'
+        if not self._address_is_readable(customer_address_id):
+            return 'circuit_circuit_update_104'
         self.cleaned_data['customer_address_id'] = customer_address_id
         return None
 
@@ -438,7 +444,7 @@ class CircuitUpdateController(ControllerBase):
             return 'circuit_circuit_update_106'
 
         try:
-            install_date = parser.parse(install_date)
+            install_date = parse_datetime(install_date)
         except(ValueError, TypeError):
             return 'circuit_circuit_update_107'
 
@@ -455,7 +461,7 @@ class CircuitUpdateController(ControllerBase):
             return None
 
         try:
-            decommission_date = parser.parse(decommission_date)
+            decommission_date = parse_datetime(decommission_date)
         except(ValueError, TypeError):
             return 'circuit_circuit_update_108'
 
@@ -482,39 +488,15 @@ class CircuitUpdateController(ControllerBase):
             This will pass because the "width-cm" is not required.
         type: dict
         """
-        if self._instance.circuit_class.properties.count() == 0:
+        schema = get_property_schema(self._instance.circuit_class_id)
+        if len(schema) == 0:
             # Circuit Class has no properties
             return None
         if not isinstance(properties, dict):
             return 'circuit_circuit_update_110'
-        for p in self._instance.circuit_class.properties.all():
-            if p.key in properties:
-                if p.required:
-                    if properties.get(p.key) is None:
-                        return 'circuit_circuit_update_111'
-                value = properties.get(p.key)
-                if value:
-                    if p.property_type_id == 1:
-                        value = str(value)
-                    elif p.property_type_id == 2:
-                        if not isinstance(value, (int, float, complex, Decimal)):
-                            return 'circuit_circuit_update_112'
-                    elif p.property_type_id == 3:
-                        if not isinstance(value, bool):
-                            return None
-                    elif p.property_type_id == 4:
-                        result = urlparse(value)
-                        if not all([result.scheme, result.netloc]):
-                            return 'circuit_circuit_update_113'
-                    elif p.property_type_id == 5:
-                        try:
-                            IPNetwork(value)
-                        except (TypeError, ValueError, AddrFormatError):
-                            return 'circuit_circuit_update_114'
-            else:
-                if p.required:
-                    return 'circuit_circuit_update_115'
-                properties.update({p.key: None})
+        error = schema.validate(properties)
+        if error is not None:
+            return self.PROPERTY_ERRORS[error]
 
         self.cleaned_data['properties'] = properties
         return None
@@ -546,13 +528,101 @@ class CircuitUpdateController(ControllerBase):
         except (ValueError, TypeError):
             return 'circuit_circuit_update_118'
 
-        if self.request.user.address['id'] != service_provider_address_id:
-            response = Membership.address.read(
-                token=self.request.user.token,
-                pk=service_provider_address_id,
-                span=self.span,
-            )
-            if response.status_code != 200:
-                return 'circuit_circuit_update_119'
+        if not self._address_is_readable(service_provider_address_id):
+            return 'circuit_circuit_update_119'
         self.cleaned_data['service_provider_address_id'] = service_provider_address_id
         return None
+
+
+class CircuitBulkUpdateController(ControllerBase):
+    """
+    Validates User data used to update every Circuit record matching a filter. Only fields that can be set on a batch
+    of Circuits without looking at each one can be sent, and a field sent as null is cleared.
+    """
+
+    class Meta(ControllerBase.Meta):
+        """
+        Override some ControllerBase.Meta fields to make them more
+        specific for this Controller
+        """
+
+        model = Circuit
+        validation_order = (
+            'bandwidth',
+            'decommission_date',
+            'group_name',
+            'hand_off_point',
+            'reference',
+        )
+
+    def validate_bandwidth(self, bandwidth: Optional[int]) -> Optional[str]:
+        """
+        description: The bandwidth of the Circuits
+        required: false
+        type: integer
+        """
+        if bandwidth is not None:
+            try:
+                bandwidth = int(bandwidth)
+            except (ValueError, TypeError):
+                return 'circuit_circuit_bulk_update_104'
+        self.cleaned_data['bandwidth'] = bandwidth
+        return None
+
+    def validate_decommission_date(self, decommission_date) -> Optional[str]:
+        """
+        description: |
+            Date the Circuits were decommissioned. Circuits installed after this date are not updated and are counted
+            as conflicts instead.
+        required: false
+        type: string
+        """
+        if decommission_date is not None:
+            try:
+                decommission_date = parse_datetime(decommission_date)
+            except (ValueError, TypeError):
+                return 'circuit_circuit_bulk_update_105'
+        self.cleaned_data['decommission_date'] = decommission_date
+        return None
+
+    def validate_group_name(self, group_name: Optional[str]) -> Optional[str]:
+        """
+        description: The group name of the Circuits
+        required: false
+        type: string
+        """
+        if group_name is None:
+            group_name = ''
+        group_name = str(group_name).strip()
+        if len(group_name) > self.get_field('group_name').max_length:
+            return 'circuit_circuit_bulk_update_106'
+        self.cleaned_data['group_name'] = group_name
+        return None
+
+    def validate_hand_off_point(self, hand_off_point: Optional[str]) -> Optional[str]:
+        """
+        description: The hand off point location for the Circuits
+        required: false
+        type: string
+        """
+        if hand_off_point is None:
+            hand_off_point = ''
+        hand_off_point = str(hand_off_point).strip()
+        if len(hand_off_point) > self.get_field('hand_off_point').max_length:
+            return 'circuit_circuit_bulk_update_107'
+        self.cleaned_data['hand_off_point'] = hand_off_point
+        return None
+
+    def validate_reference(self, reference: Optional[str]) -> Optional[str]:
+        """
+        description: The reference for the Circuits
+        required: false
+        type: string
+        """
+        if reference is None:
+            reference = ''
+        reference = str(reference).strip()
+        if len(reference) > self.get_field('reference').max_length:
+            return 'circuit_circuit_bulk_update_108'
+        self.cleaned_data['reference'] = reference
+        return None
@@ -4,6 +4,7 @@ from typing import Any, Deque, Dict, List, Optional
 # libs
 from cloudcix_rest.controllers import ControllerBase
 # local
+from circuit.controllers.property_schema import PROPERTY_TYPE_CHECKS
 from circuit.models import CircuitClass, Property, PropertyType
 
 
@@ -14,6 +15,32 @@ __all__ = [
 ]
 
 
+def _property_type_pk(property_type_id: Any) -> Optional[int]:
+    """
+    Convert a sent property_type_id to an int, returning None if it is not a valid id
+    """
+    try:
+        return int(property_type_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_property_types(properties: List[Any]) -> Dict[int, PropertyType]:
+    """
+    Fetch every PropertyType referenced in the sent properties with a single query, leaving out any type that Circuit
+    property values cannot be validated against
+    """
+    ids = {
+        _property_type_pk(item.get('property_type_id'))
+        for item in properties
+        if isinstance(item, dict)
+    }
+    ids &= PROPERTY_TYPE_CHECKS.keys()
+    if len(ids) == 0:
+        return {}
+    return PropertyType.objects.in_bulk(ids)
+
+
 class CircuitClassListController(ControllerBase):
     """
     Validates User data used to filter a list of CircuitClass records
@@ -98,6 +125,7 @@ class CircuitClassCreateController(ControllerBase):
         if len(properties) == 0:
             return 'circuit_circuit_class_create_105'
         keys: List[str] = []
+        property_types = _get_property_types(properties)
         results: Deque = deque()
         for i, item in enumerate(properties):
             if not isinstance(item, dict):
@@ -105,9 +133,8 @@ class CircuitClassCreateController(ControllerBase):
             property_type_id = item.get('property_type_id', None)
             if property_type_id is None:
                 return 'circuit_circuit_class_create_107'
-            try:
-                property_type = PropertyType.objects.get(id=property_type_id)
-            except PropertyType.DoesNotExist:
+            property_type = property_types.get(_property_type_pk(property_type_id))
+            if property_type is None:
                 return 'circuit_circuit_class_create_108'
             key = item.get('key', None)
             if key is None:
@@ -201,6 +228,7 @@ class CircuitClassUpdateController(ControllerBase):
                 if not any(prop.get('key') == key for prop in properties):
                     return 'circuit_circuit_class_update_106'
 
+        property_types = _get_property_types(properties)
         results: Deque = deque()
         for item in properties:
             if not isinstance(item, dict):
@@ -208,9 +236,8 @@ class CircuitClassUpdateController(ControllerBase):
             property_type_id = item.get('property_type_id', None)
             if property_type_id is None:
                 return 'circuit_circuit_class_update_108'
-            try:
-                property_type = PropertyType.objects.get(id=property_type_id)
-            except PropertyType.DoesNotExist:
+            property_type = property_types.get(_property_type_pk(property_type_id))
+            if property_type is None:
                 return 'circuit_circuit_class_update_109'
             key = item.get('key', None)
             if key is None:
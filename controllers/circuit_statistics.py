@@ -0,0 +1,39 @@
+# libs
+from cloudcix_rest.controllers import ControllerBase
+
+
+__all__ = [
+    'CircuitStatisticsListController',
+]
+
+
+class CircuitStatisticsListController(ControllerBase):
+    """
+    Validates User data used to filter and order the statistics of Circuit records
+    """
+
+    class Meta(ControllerBase.Meta):
+        """
+        Override some ControllerBase.Meta fields to make them more
+        specific for this Controller
+        """
+
+        allowed_ordering = (
+            'num_circuits',
+            'total_bandwidth',
+            'circuit_class_id',
+            'decommission_month',
+            'group_name',
+            'hand_off_point',
+            'install_month',
+        )
+        search_fields = {
+            'address_id': ControllerBase.DEFAULT_NUMBER_FILTER_OPERATORS,
+            'circuit_class_id': ControllerBase.DEFAULT_NUMBER_FILTER_OPERATORS,
+            'customer_address_id': ControllerBase.DEFAULT_NUMBER_FILTER_OPERATORS,
+            'decommission_month': ControllerBase.DEFAULT_STRING_FILTER_OPERATORS,
+            'group_name': ControllerBase.DEFAULT_STRING_FILTER_OPERATORS,
+            'hand_off_point': ControllerBase.DEFAULT_STRING_FILTER_OPERATORS,
+            'install_month': ControllerBase.DEFAULT_STRING_FILTER_OPERATORS,
+            'service_provider_address_id': ControllerBase.DEFAULT_NUMBER_FILTER_OPERATORS,
+        }
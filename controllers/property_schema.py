@@ -0,0 +1,152 @@
+# stdlib
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+# libs
+from django.conf import settings
+from django.core.cache import cache
+from netaddr import AddrFormatError, IPNetwork
+# local
+from circuit.db_router import PRIMARY
+from circuit.models import Property
+
+__all__ = [
+    'INVALID_BOOLEAN',
+    'INVALID_LINK',
+    'INVALID_NETWORK',
+    'INVALID_NUMERIC',
+    'MISSING_KEY',
+    'MISSING_VALUE',
+    'PROPERTY_TYPE_CHECKS',
+    'UNKNOWN_PROPERTY_TYPE',
+    'PropertySchema',
+    'get_property_schema',
+    'invalidate_property_schema',
+]
+
+# Errors that can be returned by PropertySchema.validate. Each controller maps them to its own error codes
+MISSING_VALUE = 'missing_value'
+MISSING_KEY = 'missing_key'
+INVALID_NUMERIC = 'invalid_numeric'
+INVALID_LINK = 'invalid_link'
+INVALID_NETWORK = 'invalid_network'
+INVALID_BOOLEAN = 'invalid_boolean'
+UNKNOWN_PROPERTY_TYPE = 'unknown_property_type'
+
+
+def _check_string(value: Any) -> Optional[str]:
+    return None
+
+
+def _check_numeric(value: Any) -> Optional[str]:
+    if not isinstance(value, (int, float, complex, Decimal)):
+        return INVALID_NUMERIC
+    return None
+
+
+def _check_boolean(value: Any) -> Optional[str]:
+    if not isinstance(value, bool):
+        return INVALID_BOOLEAN
+    return None
+
+
+def _check_link(value: Any) -> Optional[str]:
+    try:
+        result = urlparse(value)
+    except (AttributeError, TypeError, ValueError):
+        return INVALID_LINK
+    if not all([result.scheme, result.netloc]):
+        return INVALID_LINK
+    return None
+
+
+def _check_network(value: Any) -> Optional[str]:
+    try:
+        IPNetwork(value)
+    except (TypeError, ValueError, AddrFormatError):
+        return INVALID_NETWORK
+    return None
+
+
+# Value checks for each PropertyType, by id
+PROPERTY_TYPE_CHECKS: Dict[int, Callable[[Any], Optional[str]]] = {
+    1: _check_string,
+    2: _check_numeric,
+    3: _check_boolean,
+    4: _check_link,
+    5: _check_network,
+}
+
+
+def _check_unknown(value: Any) -> Optional[str]:
+    return UNKNOWN_PROPERTY_TYPE
+
+
+class PropertySchema:
+    """
+    The live Property records of a Circuit Class, compiled into in-memory checks for the properties of a Circuit
+    """
+
+    def __init__(self, fields: Tuple[Tuple[str, bool, int], ...]):
+        """
+        :param fields: A (key, required, property_type_id) tuple for each live Property of the Circuit Class.
+                       A Property whose type has no check rejects any value sent for it.
+        """
+        self.fields = tuple(
+            (key, required, PROPERTY_TYPE_CHECKS.get(property_type_id, _check_unknown))
+            for key, required, property_type_id in fields
+        )
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def validate(self, properties: Dict[str, Any]) -> Optional[str]:
+        """
+        Check the sent properties against the schema, adding a None value for each optional key that was not sent
+        :return: One of the error constants in this module, or None if the properties are valid
+        """
+        for key, required, check in self.fields:
+            if key in properties:
+                value = properties[key]
+                if required and value is None:
+                    return MISSING_VALUE
+                if value:
+                    error = check(value)
+                    if error is not None:
+                        return error
+            else:
+                if required:
+                    return MISSING_KEY
+                properties[key] = None
+        return None
+
+
+def _cache_key(circuit_class_id: int) -> str:
+    """
+    Generate the cache key used to store the property schema of a Circuit Class
+    """
+    return f'circuit_property_schema_{circuit_class_id}'
+
+
+def get_property_schema(circuit_class_id: int) -> PropertySchema:
+    """
+    Load the live Property records of a Circuit Class once, and cache them until the Properties are changed.
+    They are read from the primary, as a replica that has not caught up with a change to the Properties would fill
+    the cache with the old schema for the whole TTL.
+    """
+    key = _cache_key(circuit_class_id)
+    fields = cache.get(key)
+    if fields is None:
+        fields = tuple(Property.objects.using(PRIMARY).filter(
+            circuit_class_id=circuit_class_id,
+            deleted__isnull=True,
+        ).order_by('key').values_list('key', 'required', 'property_type_id'))
+        cache.set(key, fields, getattr(settings, 'CIRCUIT_PROPERTY_SCHEMA_CACHE_TTL', 3600))
+    return PropertySchema(fields)
+
+
+def invalidate_property_schema(circuit_class_id: int):
+    """
+    Remove the cached property schema of a Circuit Class, which must be done whenever its Properties change
+    """
+    cache.delete(_cache_key(circuit_class_id))
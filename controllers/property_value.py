@@ -0,0 +1,29 @@
+# libs
+from cloudcix_rest.controllers import ControllerBase
+
+
+__all__ = [
+    'PropertyValueListController',
+]
+
+
+class PropertyValueListController(ControllerBase):
+    """
+    Validates User data used to page through a list of Circuit Property values
+    """
+
+    class Meta(ControllerBase.Meta):
+        """
+        Override some ControllerBase.Meta fields to make them more
+        specific for this Controller
+        """
+
+        allowed_ordering = (
+            'value',
+            'circuit__reference_number',
+            'circuit_id',
+            'key',
+        )
+        search_fields = {
+            'key': ControllerBase.DEFAULT_STRING_FILTER_OPERATORS,
+        }
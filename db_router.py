@@ -10,13 +10,74 @@ for various operations
 - Migrations
 
 This stuff could be used when it comes to sharding out the DBs too.
+
+Reads of circuit models can be spread over read replicas by listing their aliases in `CIRCUIT_READ_REPLICAS`.
+`CIRCUIT_READ_REPLICA_POLICY` chooses how a replica is picked for each read (`random` or `round_robin`).
+After a write, reads stay on the primary for `CIRCUIT_PRIMARY_PIN_SECONDS` so that the writer sees its own changes.
 """
 
 # stdlib
+import itertools
+import random
+import time
+from contextvars import ContextVar
 from typing import Any, Dict, Optional, Type
 # libs
+from django.conf import settings
+from django.db import connections
 from django.db.models import Model
 
+__all__ = [
+    'CircuitRouter',
+    'PRIMARY',
+    'pin_primary',
+    'primary_pinned_until',
+    'reset_primary_pin',
+]
+
+# Alias of the DB that every circuit model is written to
+PRIMARY = 'circuit'
+
+# time.monotonic() value until which reads in the current context must go to the primary
+_pinned_until: ContextVar[float] = ContextVar('circuit_primary_pinned_until', default=0.0)
+
+_round_robin = itertools.count()
+
+
+def pin_primary(seconds: Optional[float] = None):
+    """
+    Send reads in the current context to the primary for the given number of seconds, or the configured window
+    """
+    if seconds is None:
+        seconds = getattr(settings, 'CIRCUIT_PRIMARY_PIN_SECONDS', 5)
+    _pinned_until.set(max(_pinned_until.get(), time.monotonic() + seconds))
+
+
+def primary_pinned_until() -> float:
+    """
+    The time.monotonic() value until which reads in the current context go to the primary
+    """
+    return _pinned_until.get()
+
+
+def reset_primary_pin():
+    """
+    Forget any pin in the current context. Called at the start of each request, as contexts are reused by threads
+    """
+    _pinned_until.set(0.0)
+
+
+def _choose_replica() -> str:
+    """
+    Pick the DB to read from for a read that is allowed to go to a replica
+    """
+    replicas = getattr(settings, 'CIRCUIT_READ_REPLICAS', ())
+    if len(replicas) == 0:
+        return PRIMARY
+    if getattr(settings, 'CIRCUIT_READ_REPLICA_POLICY', 'random') == 'round_robin':
+        return replicas[next(_round_robin) % len(replicas)]
+    return random.choice(replicas)
+
 
 class CircuitRouter:
     """
@@ -30,10 +91,17 @@ class CircuitRouter:
         :param hints: Any hints that can be given to help the routing decision
         :return: The name of the DB to route reads to
         """
-        if model._meta.app_label == 'circuit':
-            return 'circuit'
-        # We don't read from any other DB during test so we can safely ignore this line from coverage
-        return None  # pragma: no cover
+        if model._meta.app_label != 'circuit':
+            # We don't read from any other DB during test so we can safely ignore this line from coverage
+            return None  # pragma: no cover
+        # Stay on the primary inside a transaction, after a recent write, and for instances loaded from the primary
+        # (e.g. refresh_from_db and related lookups straight after a save)
+        if connections[PRIMARY].in_atomic_block or time.monotonic() < _pinned_until.get():
+            return PRIMARY
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db == PRIMARY:
+            return PRIMARY
+        return _choose_replica()
 
     def db_for_write(self, model: Type[Model], **hints: Dict[str, Any]) -> Optional[str]:
         """
@@ -43,7 +111,8 @@ class CircuitRouter:
         :return: The name of the DB to route writes to
         """
         if model._meta.app_label == 'circuit':
-            return 'circuit'
+            pin_primary()
+            return PRIMARY
         return None  # pragma: no cover
 
     def allow_relation(self, model1: Type[Model], model2: Type[Model], **hints: Dict[str, Any]) -> Optional[bool]:
@@ -65,4 +134,4 @@ class CircuitRouter:
         :param hints: Any hints that can be given to help the decision
         :return: A flag that states whether the migration is allowed
         """
-        return True if app_label == 'circuit' and db == 'circuit' else None
+        return True if app_label == 'circuit' and db == PRIMARY else None
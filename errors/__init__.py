@@ -2,3 +2,4 @@
 from .circuit import *
 from .circuit_class import *
 from .property_type import *
+from .property_value import *
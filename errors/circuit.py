@@ -7,6 +7,59 @@ circuit_circuit_list_001 = (
     'One or more of the sent search fields contains invalid values. Please check the sent parameters and ensure they '
     'match the required patterns.'
 )
+circuit_circuit_list_002 = (
+    'The "after" parameter is invalid. "after" must be empty or the "next" value from the metadata of a previous '
+    'response.'
+)
+circuit_circuit_list_003 = 'The "count" parameter is invalid. "count" must be one of "exact", "capped" or "estimate".'
+circuit_circuit_list_004 = (
+    'The "fields" parameter is invalid. "fields" must be a comma separated list of fields of the Circuit record, '
+    'excluding "circuit_class".'
+)
+circuit_circuit_list_005 = 'The "expand" parameter is invalid. The only field that can be expanded is "circuit_class".'
+
+# Export
+circuit_circuit_export_001 = 'The "output" parameter is invalid. "output" must be either "ndjson" or "csv".'
+circuit_circuit_export_002 = (
+    'One or more of the sent search fields contains invalid values. Please check the sent parameters and ensure they '
+    'match the required patterns.'
+)
+
+# Changes
+circuit_circuit_changes_001 = (
+    'The "since" parameter is invalid. "since" must be empty or the "watermark" value from the metadata of a previous '
+    'response.'
+)
+circuit_circuit_changes_002 = (
+    'One or more of the sent search fields contains invalid values. Please check the sent parameters and ensure they '
+    'match the required patterns.'
+)
+
+# Statistics
+circuit_circuit_statistics_001 = (
+    'The "group_by" parameter is invalid. "group_by" must be a comma separated list of "circuit_class_id", '
+    '"decommission_month", "group_name", "hand_off_point" and "install_month".'
+)
+circuit_circuit_statistics_002 = (
+    'The "order" parameter is invalid. The statistics can only be ordered by "num_circuits", "total_bandwidth" or one '
+    'of the fields in "group_by".'
+)
+circuit_circuit_statistics_003 = (
+    'One or more of the sent search fields contains invalid values. Please check the sent parameters and ensure they '
+    'match the required patterns.'
+)
+
+# Import
+circuit_circuit_import_001 = 'No file was sent. The file to import must be sent as "file" in a multipart request.'
+circuit_circuit_import_002 = 'The "input" parameter is invalid. "input" must be either "csv" or "ndjson".'
+circuit_circuit_import_003 = (
+    'The sent file could not be read. It must be UTF-8 encoded, contain at least one row and, for CSV, have a header '
+    'row that only names fields of a Circuit.'
+)
+circuit_circuit_import_004 = (
+    'The row could not be read as a Circuit. A CSV row must have a value for each column in the header and an NDJSON '
+    'line must be a JSON object.'
+)
 
 # Create
 circuit_circuit_create_101 = 'The "bandwidth" parameter is invalid. "bandwidth" must be an integer.'
@@ -68,8 +121,22 @@ circuit_circuit_create_122 = (
 circuit_circuit_create_123 = (
     'The "group_name" parameter is invalid. "group_name" cannot be longer than 250 characters.'
 )
+circuit_circuit_create_124 = (
+    'The "properties" parameter is invalid. One of the sent values(boolean) in the dictionary must be a boolean.'
+)
+circuit_circuit_create_125 = (
+    'The "properties" parameter is invalid. One of the sent values is for a Property whose Property Type is not '
+    'supported, so no value can be accepted for it.'
+)
 circuit_circuit_create_201 = 'You do not have permission to make this request. Your Member must be self-managed.'
 
+# Bulk Create
+circuit_circuit_bulk_create_101 = 'The request body is invalid. It must be a non-empty array of Circuit objects.'
+circuit_circuit_bulk_create_102 = (
+    'The request body is invalid. The array contains more Circuit objects than can be created in one request.'
+)
+circuit_circuit_bulk_create_103 = 'The request body is invalid. Each item in the array must be an object.'
+
 # READ
 circuit_circuit_read_001 = 'The "pk" parameter is invalid. "pk" must belong to a valid Circuit record.'
 circuit_circuit_read_201 = (
@@ -139,5 +206,46 @@ circuit_circuit_update_119 = (
 circuit_circuit_update_120 = (
     'The "group_name" parameter is invalid. "group_name" cannot be longer than 250 characters.'
 )
+circuit_circuit_update_121 = (
+    'The "properties" parameter is invalid. One of the sent values(boolean) in the dictionary must be a boolean.'
+)
+circuit_circuit_update_122 = (
+    'The "properties" parameter is invalid. One of the sent values is for a Property whose Property Type is not '
+    'supported, so no value can be accepted for it.'
+)
 # Delete
 circuit_circuit_delete_001 = 'The "pk" path parameter is invalid. "pk" must belong to a valid Circuit record.'
+
+# Bulk Delete
+circuit_circuit_bulk_delete_101 = 'The "ids" parameter is invalid. "ids" must be an array of integers.'
+circuit_circuit_bulk_delete_102 = (
+    'The request is invalid. Either the "ids" parameter or at least one search filter must be sent.'
+)
+circuit_circuit_bulk_delete_103 = (
+    'One or more of the sent search fields contains invalid values. Please check the sent parameters and ensure they '
+    'match the required patterns.'
+)
+
+# Bulk Update
+circuit_circuit_bulk_update_101 = (
+    'The request body is invalid. It must be an object containing at least one of "bandwidth", "decommission_date", '
+    '"group_name", "hand_off_point" and "reference", and no other fields.'
+)
+circuit_circuit_bulk_update_102 = 'The request is invalid. At least one search filter must be sent.'
+circuit_circuit_bulk_update_103 = (
+    'One or more of the sent search fields contains invalid values. Please check the sent parameters and ensure they '
+    'match the required patterns.'
+)
+circuit_circuit_bulk_update_104 = 'The "bandwidth" parameter is invalid. "bandwidth" must be an integer.'
+circuit_circuit_bulk_update_105 = (
+    'The "decommission_date" parameter is invalid. "decommission_date" must be a date or null.'
+)
+circuit_circuit_bulk_update_106 = (
+    'The "group_name" parameter is invalid. "group_name" cannot be longer than 250 characters.'
+)
+circuit_circuit_bulk_update_107 = (
+    'The "hand_off_point" parameter is invalid. "hand_off_point" cannot be longer than 20 characters.'
+)
+circuit_circuit_bulk_update_108 = (
+    'The "reference" parameter is invalid. "reference" cannot be longer than 100 characters.'
+)
@@ -7,6 +7,13 @@ circuit_circuit_class_list_001 = (
     'One or more of the sent search fields contains invalid values. Please check the sent parameters and ensure they '
     'match the required patterns.'
 )
+circuit_circuit_class_list_002 = (
+    'The "after" parameter is invalid. "after" must be empty or the "next" value from the metadata of a previous '
+    'response.'
+)
+circuit_circuit_class_list_003 = (
+    'The "count" parameter is invalid. "count" must be one of "exact", "capped" or "estimate".'
+)
 
 # Create
 circuit_circuit_class_create_101 = 'The "name" parameter is invalid. "name" is required and must be a string.'
@@ -22,7 +29,7 @@ circuit_circuit_class_create_107 = (
 )
 circuit_circuit_class_create_108 = (
     'The "properties" parameter is invalid. One of the sent values for "property_type_id" does not belong to a valid '
-    'PropertyType record.'
+    'PropertyType record of a supported type.'
 )
 circuit_circuit_class_create_109 = (
     'The "properties" parameter is invalid. "key" is required for each item in the array "properties"'
@@ -68,7 +75,7 @@ circuit_circuit_class_update_108 = (
 )
 circuit_circuit_class_update_109 = (
     'The "properties" parameter is invalid. One of the sent values for "property_type_id" does not belong to a valid '
-    'PropertyType record.'
+    'PropertyType record of a supported type.'
 )
 circuit_circuit_class_update_110 = (
     'The "properties" parameter is invalid. "key" is required for each item in the array "properties"'
@@ -0,0 +1,9 @@
+"""
+Error Codes for all of the Methods in the PropertyValue Service
+"""
+
+# List
+circuit_property_value_list_001 = (
+    'One or more of the sent search fields contains invalid values. Please check the sent parameters and ensure they '
+    'match the required patterns.'
+)
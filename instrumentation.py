@@ -0,0 +1,320 @@
+"""
+Instrumentation of the DB queries and upstream (Membership) calls made while handling a request.
+
+`instrumented_span` is used in place of `tracer.start_span` in the views, and tags each span with the number of
+queries, the total SQL time, the slowest statement and the number and latency of upstream calls made inside it.
+`APIView` collects the same figures for the whole request and hands them to a single background writer, which sums
+them per endpoint and status code and writes the totals to InfluxDB in one batch at a fixed interval, using the
+`CLOUDCIX_INFLUX_TAGS`.
+
+`APIView` also carries the read-your-writes pin of the DB router across requests: once a request in a Member writes to
+the primary, the following requests in that Member read from the primary until the pin window has passed.
+"""
+# stdlib
+import logging
+import queue
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+# libs
+import requests
+from cloudcix_rest.views import APIView as BaseAPIView
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from opentracing import Span, Tracer
+from rest_framework.request import Request
+from rest_framework.response import Response
+# local
+from circuit.db_router import PRIMARY, pin_primary, primary_pinned_until, reset_primary_pin
+
+
+__all__ = [
+    'APIView',
+    'Metrics',
+    'instrumented_span',
+    'upstream_call',
+]
+
+logger = logging.getLogger('circuit.instrumentation')
+
+# The Metrics collectors that are currently active, from the outermost (the request) to the innermost (a span)
+_active: ContextVar[Tuple['Metrics', ...]] = ContextVar('circuit_metrics', default=())
+
+
+class Metrics:
+    """
+    Counts of the queries and upstream calls made while the collector is active
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.slowest_sql = ''
+        self.slowest_sql_time = 0.0
+        self.upstream_calls = 0
+        self.upstream_time = 0.0
+
+    def query_wrapper(self, execute: Callable, sql: str, params: Any, many: bool, context: Dict) -> Any:
+        """
+        DB execute wrapper that times every statement run on the connection
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self.queries += 1
+                self.sql_time += duration
+                if duration > self.slowest_sql_time:
+                    self.slowest_sql_time = duration
+                    self.slowest_sql = sql
+
+    def record_upstream_call(self, duration: float):
+        with self._lock:
+            self.upstream_calls += 1
+            self.upstream_time += duration
+
+    def fields(self) -> Dict[str, Any]:
+        """
+        The collected figures, with times in milliseconds
+        """
+        return {
+            'db_queries': self.queries,
+            'db_time_ms': round(self.sql_time * 1000, 3),
+            'db_slowest_ms': round(self.slowest_sql_time * 1000, 3),
+            'upstream_calls': self.upstream_calls,
+            'upstream_time_ms': round(self.upstream_time * 1000, 3),
+        }
+
+
+@contextmanager
+def _collect(metrics: Metrics) -> Iterator[Metrics]:
+    """
+    Make the collector active and record every query run on the circuit DB connections while it is
+    """
+    token = _active.set(_active.get() + (metrics,))
+    try:
+        with ExitStack() as stack:
+            for alias in (PRIMARY, *getattr(settings, 'CIRCUIT_READ_REPLICAS', ())):
+                stack.enter_context(connections[alias].execute_wrapper(metrics.query_wrapper))
+            yield metrics
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def instrumented_span(tracer: Tracer, operation_name: str, child_of: Optional[Span] = None) -> Iterator[Span]:
+    """
+    Start a span in the same way as `tracer.start_span` and tag it with the queries and upstream calls made in it
+    """
+    with tracer.start_span(operation_name, child_of=child_of) as span:
+        with _collect(Metrics()) as metrics:
+            try:
+                yield span
+            finally:
+                for tag, value in metrics.fields().items():
+                    span.set_tag(tag, value)
+                if metrics.slowest_sql:
+                    span.set_tag('db_slowest_statement', metrics.slowest_sql[:1000])
+
+
+@contextmanager
+def upstream_call() -> Iterator[None]:
+    """
+    Time a call to another service, and record it with every active collector
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        for metrics in _active.get():
+            metrics.record_upstream_call(duration)
+
+
+def _escape(value: Any) -> str:
+    """
+    Escape a measurement, tag key, tag value or field key for the InfluxDB line protocol. Line breaks cannot be
+    escaped, so they are replaced with spaces
+    """
+    return (
+        str(value)
+        .replace('\n', ' ')
+        .replace('\\', '\\\\')
+        .replace(',', '\\,')
+        .replace('=', '\\=')
+        .replace(' ', '\\ ')
+    )
+
+
+def _field_value(value: Any) -> str:
+    """
+    Format a field value for the InfluxDB line protocol
+    """
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return f'{value}i'
+    if isinstance(value, float):
+        return repr(value)
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def _line(measurement: str, tags: Dict[str, Any], fields: Dict[str, Any], timestamp: int) -> str:
+    """
+    Build one point in the InfluxDB line protocol, with the timestamp in seconds
+    """
+    tag_set = ''.join(f',{_escape(key)}={_escape(value)}' for key, value in sorted(tags.items()) if value != '')
+    field_set = ','.join(f'{_escape(key)}={_field_value(value)}' for key, value in sorted(fields.items()))
+    return f'{_escape(measurement)}{tag_set} {field_set} {timestamp}'
+
+
+def _aggregate(totals: Dict[Tuple[str, int], Dict[str, Any]], endpoint: str, status_code: int, fields: Dict[str, Any]):
+    """
+    Add the figures for one request to the totals of its endpoint and status code
+    """
+    total = totals.setdefault((endpoint, status_code), {'requests': 0})
+    total['requests'] += 1
+    for key, value in fields.items():
+        if key == 'db_slowest_ms':
+            total[key] = max(total.get(key, 0), value)
+        else:
+            total[key] = total.get(key, 0) + value
+
+
+class _InfluxWriter:
+    """
+    Collects the figures of each request from a bounded queue in one background thread, and writes their totals per
+    endpoint and status code to InfluxDB every `CIRCUIT_METRICS_FLUSH_SECONDS`. Requests never wait for the writer:
+    when the queue is full the figures are dropped, and the number dropped is written with the next batch.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._dropped = 0
+
+    def submit(self, endpoint: str, status_code: int, fields: Dict[str, Any]):
+        if not getattr(settings, 'CLOUDCIX_INFLUX_URL', None):
+            return
+        self._start()
+        try:
+            self._queue.put_nowait((endpoint, status_code, fields))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+    def _start(self):
+        """
+        Start the writer thread in the process handling the request, so it is never lost to a fork
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self._queue is None:
+                self._queue = queue.Queue(maxsize=getattr(settings, 'CIRCUIT_METRICS_QUEUE_SIZE', 10000))
+            self._thread = threading.Thread(target=self._run, name='circuit_influx_writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        interval = getattr(settings, 'CIRCUIT_METRICS_FLUSH_SECONDS', 10)
+        while True:
+            totals: Dict[Tuple[str, int], Dict[str, Any]] = {}
+            deadline = time.monotonic() + interval
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    endpoint, status_code, fields = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                _aggregate(totals, endpoint, status_code, fields)
+            with self._lock:
+                dropped, self._dropped = self._dropped, 0
+            if len(totals) > 0 or dropped > 0:
+                self._write(totals, dropped)
+
+    def _write(self, totals: Dict[Tuple[str, int], Dict[str, Any]], dropped: int):
+        tags = dict(getattr(settings, 'CLOUDCIX_INFLUX_TAGS', {}))
+        timestamp = int(time.time())
+        lines: List[str] = [
+            _line('circuit_request', {**tags, 'endpoint': endpoint, 'status_code': status_code}, fields, timestamp)
+            for (endpoint, status_code), fields in sorted(totals.items())
+        ]
+        if dropped > 0:
+            lines.append(_line('circuit_request_dropped', tags, {'requests': dropped}, timestamp))
+        url = settings.CLOUDCIX_INFLUX_URL
+        try:
+            requests.post(
+                f'{url}:{getattr(settings, "CLOUDCIX_INFLUX_PORT", 8086)}/write',
+                params={'db': getattr(settings, 'CLOUDCIX_INFLUX_DATABASE', 'metrics'), 'precision': 's'},
+                data='\n'.join(lines),
+                timeout=5,
+            )
+        except requests.RequestException:  # pragma: no cover
+            logger.warning('Could not write request metrics to InfluxDB', exc_info=True)
+
+
+_influx_writer = _InfluxWriter()
+
+
+def _primary_pin_cache_key(member_id: int) -> str:
+    """
+    Generate the cache key used to store the time until which reads in a Member go to the primary DB
+    """
+    return f'circuit_primary_pin_{member_id}'
+
+
+def _member_id(request: Request) -> Optional[int]:
+    member = getattr(request.user, 'member', None)
+    return member.get('id') if isinstance(member, dict) else None
+
+
+class APIView(BaseAPIView):
+    """
+    APIView that collects the queries and upstream calls made for each request and writes them to InfluxDB, and
+    keeps the Member's reads on the primary DB for a short window after it writes
+    """
+
+    def initial(self, request: Request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # The User is only known once the request has been authenticated
+        member_id = _member_id(request)
+        if member_id is not None:
+            pinned_until = cache.get(_primary_pin_cache_key(member_id))
+            if pinned_until is not None and pinned_until > time.time():
+                pin_primary(pinned_until - time.time())
+        self._primary_pinned_until = primary_pinned_until()
+
+    def _store_primary_pin(self, request: Request):
+        """
+        If the request wrote to the primary, pin the following requests in the Member to it for the pin window
+        """
+        if primary_pinned_until() <= getattr(self, '_primary_pinned_until', 0.0):
+            return
+        member_id = _member_id(request)
+        if member_id is None:
+            return
+        seconds = getattr(settings, 'CIRCUIT_PRIMARY_PIN_SECONDS', 5)
+        cache.set(_primary_pin_cache_key(member_id), time.time() + seconds, seconds)
+
+    def dispatch(self, request: Request, *args, **kwargs) -> Response:
+        endpoint = f'{self.__class__.__name__}.{request.method.lower()}'
+        # Threads handle many requests, so never carry a pin over from the last one
+        reset_primary_pin()
+        with _collect(Metrics()) as metrics:
+            response = super().dispatch(request, *args, **kwargs)
+        self._store_primary_pin(self.request)
+        # Queued for the background writer so InfluxDB latency is never part of the request
+        _influx_writer.submit(endpoint, response.status_code, metrics.fields())
+        return response
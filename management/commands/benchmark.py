@@ -0,0 +1,368 @@
+# stdlib
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from statistics import mean, quantiles
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+# libs
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+# local
+from circuit.models import Circuit, CircuitClass, Property, PropertyType, PropertyValue
+from circuit.utils import invalidate_addresses_in_member
+from circuit.views import (
+    CircuitClassCollection,
+    CircuitCollection,
+    CircuitResource,
+    PropertyValueCollection,
+)
+
+# The PropertyTypes the Circuit property validation knows about, by id
+PROPERTY_TYPES = {
+    1: 'string',
+    2: 'numeric',
+    3: 'boolean',
+    4: 'link',
+    5: 'network',
+}
+# Marker stored in `extra` on every seeded record so they can be found and removed again
+SEED_MARKER = {'benchmark': True}
+# Addresses in a seeded Member have ids starting at member_id * ADDRESS_ID_STRIDE
+ADDRESS_ID_STRIDE = 100000
+
+
+class _Response:
+    """
+    The parts of a requests.Response the views use
+    """
+
+    def __init__(self, status_code: int, data: Dict[str, Any]):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self) -> Dict[str, Any]:
+        return self._data
+
+
+class _AddressService:
+    """
+    Local stand-in for Membership.address that answers from the seeded Members after a configurable delay
+    """
+
+    def __init__(self, members: Dict[int, List[int]], latency: float):
+        self.members = members
+        self.addresses = {address_id for addresses in members.values() for address_id in addresses}
+        self.latency = latency
+        self.calls = 0
+
+    def list(self, token: str, params: Dict[str, Any], span: Any = None) -> _Response:
+        self.calls += 1
+        time.sleep(self.latency)
+        addresses = self.members.get(int(params['search[member_id]']), [])
+        page, limit = int(params['page']), int(params['limit'])
+        content = [{'id': address_id} for address_id in addresses[page * limit:(page + 1) * limit]]
+        return _Response(200, {'content': content, '_metadata': {'total_records': len(addresses)}})
+
+    def read(self, token: str, pk: int, span: Any = None) -> _Response:
+        self.calls += 1
+        time.sleep(self.latency)
+        if pk in self.addresses:
+            return _Response(200, {'content': {'id': pk}})
+        return _Response(404, {})
+
+
+class Command(BaseCommand):
+    """
+    Seed the circuit DB with synthetic data and time the main API methods against it
+    """
+    help = (
+        'Seed the circuit DB with synthetic Members, Circuit Classes, Properties and Circuits, then time the main '
+        'API methods with Membership replaced by a local stand-in, and write the results to a JSON file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=10000, help='Number of Circuits to seed.')
+        parser.add_argument('--members', type=int, default=10)
+        parser.add_argument('--addresses', type=int, default=100, help='Number of Addresses in each Member.')
+        parser.add_argument('--classes', type=int, default=5, help='Number of Circuit Classes in each Member.')
+        parser.add_argument('--properties', type=int, default=6, help='Number of Properties in each Circuit Class.')
+        parser.add_argument('--latency', type=float, default=20, help='Membership latency in milliseconds.')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=100, help='Page size used for the list methods.')
+        parser.add_argument('--cold-cache', action='store_true', help='Clear the Member Address cache each run.')
+        parser.add_argument('--skip-seed', action='store_true', help='Reuse data seeded by an earlier run.')
+        parser.add_argument('--clear', action='store_true', help='Remove the seeded data and exit.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the random number generator.')
+        parser.add_argument('--output', default='benchmark.json')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        if options['clear']:
+            self._clear()
+            return
+
+        if not options['skip_seed']:
+            self._clear()
+            self._seed(options)
+        members = self._members(options)
+        if len(members) == 0:
+            raise CommandError('There is no seeded data. Run the command without --skip-seed first.')
+
+        membership = SimpleNamespace(address=_AddressService(members, options['latency'] / 1000))
+        with mock.patch('circuit.utils.Membership', membership), \
+                mock.patch('circuit.controllers.address_validation.Membership', membership):
+            results = self._run(options, members, membership.address)
+
+        report = {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'options': {
+                key: options[key]
+                for key in ('scale', 'members', 'addresses', 'classes', 'properties', 'latency', 'iterations', 'limit')
+            },
+            'options_cold_cache': options['cold_cache'],
+            'scenarios': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+        self.stdout.write(f'{"scenario":<32} {"p50_ms":>9} {"p95_ms":>9} {"queries":>8} {"rows_scanned":>13}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<32} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} {result["queries"]:>8} '
+                f'{result["rows_scanned"]:>13}',
+            )
+        self.stdout.write(f'Results written to {options["output"]}')
+
+    # Seeding
+
+    def _clear(self):
+        """
+        Hard delete every record created by an earlier seed, including the Circuits created while timing
+        """
+        circuits = Circuit.objects.filter(circuit_class__extra__contains=SEED_MARKER)
+        PropertyValue.objects.filter(circuit__in=circuits).delete()
+        circuits.delete()
+        Property.objects.filter(circuit_class__extra__contains=SEED_MARKER).delete()
+        CircuitClass.objects.filter(extra__contains=SEED_MARKER).delete()
+
+    def _seed(self, options: Dict[str, Any]):
+        """
+        Create the synthetic Members, Circuit Classes, Properties and Circuits
+        """
+        for pk, name in PROPERTY_TYPES.items():
+            PropertyType.objects.get_or_create(pk=pk, defaults={'name': name})
+
+        classes = CircuitClass.objects.bulk_create([
+            CircuitClass(name=f'benchmark-{member_id}-{i}', member_id=member_id, extra=SEED_MARKER)
+            for member_id in range(1, options['members'] + 1)
+            for i in range(options['classes'])
+        ])
+        Property.objects.bulk_create([
+            Property(
+                circuit_class=circuit_class,
+                key=f'key-{i}',
+                property_type_id=(i % len(PROPERTY_TYPES)) + 1,
+                required=i == 0,
+                extra=SEED_MARKER,
+            )
+            for circuit_class in classes
+            for i in range(options['properties'])
+        ])
+        self.stdout.write(f'Seeded {len(classes)} Circuit Classes')
+
+        values: Dict[int, Callable[[int], Any]] = {
+            1: lambda n: f'value-{n}',
+            2: lambda n: n,
+            3: lambda n: n % 2 == 0,
+            4: lambda n: f'https://example.com/{n}',
+            5: lambda n: f'10.{n % 256}.{(n // 256) % 256}.0/24',
+        }
+        install_start = datetime(2015, 1, 1, tzinfo=timezone.utc)
+        batch: List[Circuit] = []
+        for n in range(options['scale']):
+            circuit_class = random.choice(classes)
+            addresses = self._member_addresses(circuit_class.member_id, options['addresses'])
+            install_date = install_start + timedelta(days=random.randint(0, 3650))
+            batch.append(Circuit(
+                address_id=random.choice(addresses),
+                bandwidth=random.choice((100, 1000, 10000)),
+                circuit_class=circuit_class,
+                customer_address_id=random.choice(addresses) if random.random() < 0.5 else None,
+                decommission_date=install_date + timedelta(days=365) if random.random() < 0.1 else None,
+                description=f'Benchmark circuit {n}',
+                extra=SEED_MARKER,
+                group_name=f'group-{n % 50}',
+                hand_off_point=f'hop-{n % 20}',
+                install_date=install_date,
+                properties={
+                    f'key-{i}': values[(i % len(PROPERTY_TYPES)) + 1](n)
+                    for i in range(options['properties'])
+                },
+                reference=f'REF-{n}',
+                service_provider_address_id=random.choice(addresses) if random.random() < 0.5 else None,
+            ))
+            if len(batch) == 5000:
+                Circuit.objects.bulk_create(batch)
+                batch = []
+                self.stdout.write(f'Seeded {n + 1} Circuits')
+        if len(batch) > 0:
+            Circuit.objects.bulk_create(batch)
+        self.stdout.write(f'Seeded {options["scale"]} Circuits')
+
+    @staticmethod
+    def _member_addresses(member_id: int, addresses: int) -> List[int]:
+        return [member_id * ADDRESS_ID_STRIDE + i for i in range(addresses)]
+
+    def _members(self, options: Dict[str, Any]) -> Dict[int, List[int]]:
+        """
+        Find the seeded Members and generate their Address ids
+        """
+        member_ids = CircuitClass.objects.filter(
+            extra__contains=SEED_MARKER,
+        ).order_by().values_list('member_id', flat=True).distinct()
+        return {
+            member_id: self._member_addresses(member_id, options['addresses'])
+            for member_id in member_ids
+        }
+
+    # Timing
+
+    def _user(self, member_id: int, address_id: int, is_global: bool) -> SimpleNamespace:
+        """
+        Build a stand-in for the authenticated User the views expect
+        """
+        return SimpleNamespace(
+            address={'id': address_id},
+            global_active=is_global,
+            id=1,
+            is_authenticated=True,
+            is_global=is_global,
+            member={'id': member_id, 'self_managed': True},
+            token='benchmark',
+        )
+
+    def _run(self, options: Dict[str, Any], members: Dict[int, List[int]], membership: _AddressService):
+        """
+        Time every scenario and collect its statistics
+        """
+        factory = APIRequestFactory()
+        member_id = min(members)
+        address_id = members[member_id][0]
+        local_user = self._user(member_id, address_id, False)
+        global_user = self._user(member_id, address_id, True)
+        limit = options['limit']
+        circuit_ids = list(
+            Circuit.objects.filter(party_address_ids__overlap=members[member_id]).values_list('id', flat=True)[:1000],
+        )
+        circuit_class = CircuitClass.objects.filter(member_id=member_id, extra__contains=SEED_MARKER).first()
+        if len(circuit_ids) == 0 or circuit_class is None:
+            raise CommandError(f'Member #{member_id} has no seeded Circuits.')
+
+        def create_data() -> Dict[str, Any]:
+            return {
+                'circuit_class_id': circuit_class.pk,
+                'customer_address_id': random.choice(members[member_id]),
+                'description': 'Benchmark circuit',
+                'install_date': '2024-01-01T00:00:00+00:00',
+                'properties': {'key-0': 'value'},
+                'service_provider_address_id': random.choice(members[member_id]),
+            }
+
+        scenarios = {
+            'circuit_list': (CircuitCollection, 'get', local_user, '/circuit/', {'limit': limit}),
+            'circuit_list_global': (CircuitCollection, 'get', global_user, '/circuit/', {'limit': limit}),
+            'circuit_list_filtered': (
+                CircuitCollection, 'get', global_user, '/circuit/',
+                {'limit': limit, 'search[group_name]': 'group-1', 'order': '-install_date'},
+            ),
+            'circuit_list_deep_page': (
+                CircuitCollection, 'get', global_user, '/circuit/', {'limit': limit, 'page': 50},
+            ),
+            'circuit_read': (CircuitResource, 'get', global_user, '/circuit/', None),
+            'circuit_create': (CircuitCollection, 'post', local_user, '/circuit/', None),
+            'circuit_class_list': (CircuitClassCollection, 'get', local_user, '/circuit_class/', {'limit': limit}),
+            'property_value_list': (
+                PropertyValueCollection, 'get', global_user, '/property_value/', {'limit': limit},
+            ),
+        }
+
+        results = {}
+        for name, (view_class, method, user, path, data) in scenarios.items():
+            view = view_class.as_view()
+            timings: List[float] = []
+            queries: Optional[CaptureQueriesContext] = None
+            upstream_calls = 0
+            for _ in range(options['iterations']):
+                if options['cold_cache']:
+                    invalidate_addresses_in_member(member_id)
+                kwargs: Dict[str, Any] = {}
+                if view_class is CircuitResource:
+                    kwargs['pk'] = random.choice(circuit_ids)
+                    path = f'/circuit/{kwargs["pk"]}/'
+                if view_class is PropertyValueCollection:
+                    kwargs['search_term'] = f'value-{random.randint(0, 99)}'
+                if method == 'post':
+                    request = factory.post(path, create_data(), format='json')
+                else:
+                    request = factory.get(path, data)
+                force_authenticate(request, user=user)
+                request.span = settings.TRACER.start_span('benchmark')
+
+                calls = membership.calls
+                with CaptureQueriesContext(connections['circuit']) as captured:
+                    start = time.perf_counter()
+                    response = view(request, **kwargs)
+                    if hasattr(response, 'render'):
+                        response.render()
+                    timings.append((time.perf_counter() - start) * 1000)
+                request.span.finish()
+                if response.status_code >= 400:
+                    raise CommandError(f'{name} returned {response.status_code}: {response.content[:500]!r}')
+                queries = captured
+                upstream_calls = membership.calls - calls
+
+            results[name] = {
+                'iterations': len(timings),
+                'mean_ms': mean(timings),
+                'p50_ms': quantiles(timings, n=100)[49] if len(timings) > 1 else timings[0],
+                'p95_ms': quantiles(timings, n=100)[94] if len(timings) > 1 else timings[0],
+                'queries': len(queries.captured_queries),
+                'sql_ms': sum(float(query['time']) for query in queries.captured_queries) * 1000,
+                'rows_scanned': self._rows_scanned(queries.captured_queries),
+                'upstream_calls': upstream_calls,
+            }
+        return results
+
+    @staticmethod
+    def _rows_scanned(captured_queries: List[Dict[str, str]]) -> int:
+        """
+        Re-run the SELECT statements of the last run with EXPLAIN ANALYZE and add up the rows read by every scan
+        node, including the ones that were removed by a filter
+        """
+        def walk(node: Dict[str, Any]) -> int:
+            rows = 0
+            if 'Scan' in node['Node Type']:
+                rows += int((node.get('Actual Rows', 0) + node.get('Rows Removed by Filter', 0)) *
+                            node.get('Actual Loops', 1))
+            for child in node.get('Plans', []):
+                rows += walk(child)
+            return rows
+
+        total = 0
+        with connections['circuit'].cursor() as cursor:
+            for query in captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}')
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                total += walk(plan[0]['Plan'])
+        return total
@@ -0,0 +1,54 @@
+# stdlib
+import json
+import random
+from statistics import median
+from typing import Dict, List
+# libs
+from django.core.management.base import BaseCommand
+from django.db.models import Q, QuerySet
+# local
+from circuit.models import Circuit
+
+
+class Command(BaseCommand):
+    """
+    Compare the three-way OR Address filter with the party_address_ids GIN lookup on the current circuit DB
+    """
+    help = (
+        'Time the Circuit list query with the three-way OR Address filter against the party_address_ids lookup, '
+        'for Address lists of different sizes, using EXPLAIN ANALYZE on the circuit DB.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=50)
+
+    def handle(self, *args, **options):
+        known = list(Circuit.objects.order_by().values_list('address_id', flat=True).distinct())
+        self.stdout.write(f'{"addresses":>10} {"q_objects_ms":>14} {"party_ms":>10}')
+        for size in options['sizes']:
+            # Mix Addresses that own Circuits with ones that do not, as a Member's Address list would
+            sample = random.sample(known, min(size, len(known)))
+            sample += random.sample(range(10 ** 8, 10 ** 9), size - len(sample))
+
+            q_objects = (
+                Q(address_id__in=sample) |
+                Q(customer_address_id__in=sample) |
+                Q(service_provider_address_id__in=sample)
+            )
+            party = Q(party_address_ids__overlap=sample)
+            results: Dict[str, List[float]] = {'q_objects': [], 'party': []}
+            for _ in range(options['repeat']):
+                for name, address_filtering in (('q_objects', q_objects), ('party', party)):
+                    objs = Circuit.objects.filter(address_filtering).order_by('reference_number')
+                    results[name].append(self._execution_time(objs[:options['limit']]))
+            self.stdout.write(f'{size:>10} {median(results["q_objects"]):>14.2f} {median(results["party"]):>10.2f}')
+
+    @staticmethod
+    def _execution_time(objs: QuerySet) -> float:
+        """
+        Run the query with EXPLAIN ANALYZE and return the execution time reported by PostgreSQL in milliseconds
+        """
+        plan = json.loads(objs.explain(analyze=True, format='json'))
+        return plan[0]['Execution Time']
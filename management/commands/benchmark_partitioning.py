@@ -0,0 +1,135 @@
+# stdlib
+import json
+import time
+from statistics import median
+from typing import Any, Dict, List
+# libs
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import QuerySet
+# local
+from circuit.management.commands.benchmark import SEED_MARKER
+from circuit.models import Circuit, CircuitClass, PropertyValue
+
+# Member the growth Circuits are created in, kept away from the Members seeded by the benchmark command
+MEMBER_ID = 999999
+# Address whose list and insert latency is measured at each size
+PROBE_ADDRESS_ID = 1
+# Number of Circuits the probe Address owns, which stays the same while the table grows
+PROBE_CIRCUITS = 500
+
+
+class Command(BaseCommand):
+    """
+    Grow the circuit table in steps and time Address scoped reads and inserts at each size
+    """
+    help = (
+        'Grow the circuit table to each of the given sizes, spreading the new Circuits over many Addresses, and time '
+        'the Address scoped list query and single Circuit inserts for one Address at each size. With the table '
+        'partitioned by address_id both should stay flat as the table grows. Seeded rows are removed with --clear.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000, 5000000])
+        parser.add_argument('--addresses', type=int, default=10000, help='Number of Addresses to spread rows over.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=50)
+        parser.add_argument('--clear', action='store_true', help='Remove the seeded data and exit.')
+        parser.add_argument('--output', default='benchmark_partitioning.json')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self._clear()
+            return
+        circuit_class, _ = CircuitClass.objects.get_or_create(
+            name='benchmark-partitioning',
+            member_id=MEMBER_ID,
+            defaults={'extra': SEED_MARKER},
+        )
+        self._grow(circuit_class, PROBE_CIRCUITS, [PROBE_ADDRESS_ID])
+
+        results: List[Dict[str, Any]] = []
+        self.stdout.write(f'{"rows":>10} {"owned_ms":>10} {"visible_ms":>12} {"insert_ms":>10}')
+        for size in sorted(options['sizes']):
+            missing = size - Circuit.objects.filter(circuit_class=circuit_class).count()
+            if missing > 0:
+                addresses = range(PROBE_ADDRESS_ID + 1, PROBE_ADDRESS_ID + options['addresses'])
+                self._grow(circuit_class, missing, addresses)
+            with connections['circuit'].cursor() as cursor:
+                cursor.execute('ANALYZE circuit')
+
+            # Circuits owned by the Address are found in one partition. Circuits visible to it through the customer
+            # and service provider Addresses can be in any partition, so that list probes the index of each one
+            owned = Circuit.objects.filter(address_id=PROBE_ADDRESS_ID).order_by('reference_number')
+            visible = Circuit.objects.filter(
+                party_address_ids__contains=[PROBE_ADDRESS_ID],
+            ).order_by('reference_number')
+            owned_ms = median(self._execution_time(owned[:options['limit']]) for _ in range(options['repeat']))
+            visible_ms = median(self._execution_time(visible[:options['limit']]) for _ in range(options['repeat']))
+            insert_ms = median(self._insert_time(circuit_class) for _ in range(options['repeat']))
+            results.append({'rows': size, 'owned_ms': owned_ms, 'visible_ms': visible_ms, 'insert_ms': insert_ms})
+            self.stdout.write(f'{size:>10} {owned_ms:>10.2f} {visible_ms:>12.2f} {insert_ms:>10.2f}')
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+    @staticmethod
+    def _grow(circuit_class: CircuitClass, count: int, address_ids: Any):
+        """
+        Insert `count` Circuits spread over the given Addresses in one statement. The triggers fill in the
+        reference_number, party_address_ids and change_xid as for any other insert.
+        """
+        address_ids = list(address_ids)
+        with connections['circuit'].cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO circuit (
+                    created, updated, extra, address_id, circuit_class_id, description, install_date, properties,
+                    party_address_ids, change_xid, reference_number
+                )
+                SELECT NOW(), NOW(), %s::jsonb, (%s::integer[])[1 + n %% %s], %s, 'benchmark', NOW(), '{}'::jsonb,
+                    '{}', 0, NULL
+                FROM generate_series(1, %s) AS n
+                """,
+                [json.dumps(SEED_MARKER), address_ids, len(address_ids), circuit_class.pk, count],
+            )
+
+    @staticmethod
+    def _insert_time(circuit_class: CircuitClass) -> float:
+        """
+        Time the insert of one Circuit for the probe Address, rolling it back so the table size stays the same
+        """
+        with transaction.atomic(using='circuit'):
+            start = time.perf_counter()
+            Circuit.objects.create(
+                address_id=PROBE_ADDRESS_ID,
+                circuit_class=circuit_class,
+                description='benchmark',
+                install_date=circuit_class.created,
+                extra=SEED_MARKER,
+            )
+            elapsed = (time.perf_counter() - start) * 1000
+            transaction.set_rollback(True, using='circuit')
+        return elapsed
+
+    @staticmethod
+    def _execution_time(objs: QuerySet) -> float:
+        """
+        Run the query with EXPLAIN ANALYZE and return the execution time reported by PostgreSQL in milliseconds
+        """
+        plan = json.loads(objs.explain(analyze=True, format='json'))
+        return plan[0]['Execution Time']
+
+    @staticmethod
+    def _clear():
+        """
+        Remove every Circuit created by this command, and its Circuit Class
+        """
+        circuits = Circuit.objects.filter(
+            circuit_class__member_id=MEMBER_ID,
+            circuit_class__extra__contains=SEED_MARKER,
+        )
+        PropertyValue.objects.filter(circuit__in=circuits.values('id')).delete()
+        circuits.delete()
+        CircuitClass.objects.filter(member_id=MEMBER_ID, extra__contains=SEED_MARKER).delete()
@@ -0,0 +1,114 @@
+# stdlib
+import json
+from typing import Any, Dict, Iterator, List, Tuple
+# libs
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count, QuerySet
+# local
+from circuit.management.commands.benchmark import SEED_MARKER
+from circuit.models import Circuit, CircuitClass, Property
+
+# Tables whose rows the list queries must not read with a sequential scan. The partitions of circuit are named
+# circuit_p<n>
+CHECKED_TABLES = ('circuit', 'circuit_class', 'property')
+
+
+def _plan_nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _plan_nodes(child)
+
+
+def _is_checked(relation: str) -> bool:
+    return relation in CHECKED_TABLES or (relation.startswith('circuit_p') and relation[len('circuit_p'):].isdigit())
+
+
+def list_query_shapes(address_id: int, circuit_class: CircuitClass, limit: int) -> List[Tuple[str, QuerySet]]:
+    """
+    Build the main list query shapes for an Address and a Circuit Class, each limited to a page of `limit` records
+    """
+    ordering = ('reference_number', 'id')
+    return [
+        ('owned_circuits', Circuit.objects.filter(address_id=address_id).order_by(*ordering)[:limit]),
+        ('customer_circuits', Circuit.objects.filter(customer_address_id=address_id).order_by(*ordering)[:limit]),
+        (
+            'service_provider_circuits',
+            Circuit.objects.filter(service_provider_address_id=address_id).order_by(*ordering)[:limit],
+        ),
+        (
+            'visible_circuits',
+            Circuit.objects.filter(party_address_ids__contains=[address_id]).order_by(*ordering)[:limit],
+        ),
+        (
+            'class_circuits',
+            Circuit.objects.filter(circuit_class_id=circuit_class.pk).order_by(*ordering)[:limit],
+        ),
+        (
+            'newest_circuits',
+            Circuit.objects.filter(address_id=address_id).order_by('-reference_number', '-id')[:limit],
+        ),
+        (
+            'member_circuit_classes',
+            CircuitClass.objects.prefetch_related(None).filter(
+                member_id=circuit_class.member_id,
+            ).order_by('name', 'id')[:limit],
+        ),
+        (
+            'class_properties',
+            Property.objects.filter(circuit_class_id=circuit_class.pk, deleted__isnull=True).order_by('key', 'id'),
+        ),
+    ]
+
+
+def scanned_relations(objs: QuerySet) -> List[Tuple[str, str]]:
+    """
+    EXPLAIN a query and return the (node type, index or table name) of each scan of circuit, its partitions,
+    circuit_class or property in the plan
+    """
+    plan = json.loads(objs.explain(format='json'))[0]['Plan']
+    return [
+        (node['Node Type'], node.get('Index Name', node['Relation Name']))
+        for node in _plan_nodes(plan)
+        if 'Relation Name' in node and _is_checked(node['Relation Name'])
+    ]
+
+
+class Command(BaseCommand):
+    """
+    EXPLAIN the main list query shapes against the data seeded by the benchmark command, and fail if any of them reads
+    circuit, circuit_class or property with a sequential scan instead of an index
+    """
+    help = (
+        'EXPLAIN the Circuit, Circuit Class and Property list queries for a seeded Address, Circuit Class and Member, '
+        'and exit with an error if any of them scans circuit, circuit_class or property sequentially. Run the '
+        'benchmark command first to seed the data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=50, help='Page size used for the list queries.')
+
+    def handle(self, *args, **options):
+        # Probe the busiest seeded Address and Circuit Class, where a sequential scan is most tempting to the planner
+        busiest = Circuit.objects.filter(
+            circuit_class__extra__contains=SEED_MARKER,
+        ).values('address_id', 'circuit_class_id').annotate(num=Count('id')).order_by('-num').first()
+        if busiest is None:
+            raise CommandError('There is no seeded data. Run the benchmark command first.')
+        address_id = busiest['address_id']
+        circuit_class = CircuitClass.objects.get(pk=busiest['circuit_class_id'])
+
+        with connections['circuit'].cursor() as cursor:
+            cursor.execute('ANALYZE circuit, circuit_class, property')
+
+        failed = []
+        self.stdout.write(f'{"shape":<28} {"scans"}')
+        for name, objs in list_query_shapes(address_id, circuit_class, options['limit']):
+            scans = scanned_relations(objs)
+            self.stdout.write(f'{name:<28} {", ".join(f"{node_type} {target}" for node_type, target in scans)}')
+            if any(node_type == 'Seq Scan' for node_type, _ in scans):
+                failed.append(name)
+
+        if len(failed) > 0:
+            raise CommandError(f'Sequential scans in: {", ".join(failed)}')
+        self.stdout.write('Every list query shape reads through an index')
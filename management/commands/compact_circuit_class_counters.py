@@ -0,0 +1,32 @@
+# stdlib
+# libs
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+# local
+
+
+class Command(BaseCommand):
+    """
+    Add the pending counter deltas to their Circuit Classes in short transactions, until none are left
+    """
+    help = (
+        'Add the counter deltas that the triggers on circuit and property record in circuit_class_counter_delta to the '
+        'num_circuits and num_properties counters of their Circuit Classes, and remove them. Each batch is compacted '
+        'in its own transaction, so writes to the Circuit Classes being compacted only wait for one batch. The '
+        'triggers already compact a Circuit Class once it has more than a few dozen deltas, so this is only needed to '
+        'fold in the rest, e.g. before running reports on the counters.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='Deltas compacted per transaction.')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            with transaction.atomic(using='circuit'), connections['circuit'].cursor() as cursor:
+                cursor.execute('SELECT compact_circuit_class_counters(%s)', [options['batch_size']])
+                compacted = cursor.fetchone()[0]
+            total += compacted
+            if compacted < options['batch_size']:
+                break
+        self.stdout.write(f'Compacted {total} counter delta(s)')
@@ -0,0 +1,87 @@
+# stdlib
+from typing import List, Tuple
+# libs
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+# local
+
+# Count the live Circuits and Properties of every Circuit Class, next to its totals: the counters stored on it plus
+# the deltas that have not been compacted into them yet
+COUNT_SQL = """
+    SELECT
+        circuit_class.id,
+        circuit_class.num_circuits + COALESCE(pending.num_circuits, 0),
+        COALESCE(circuits.num, 0),
+        circuit_class.num_properties + COALESCE(pending.num_properties, 0),
+        COALESCE(properties.num, 0)
+    FROM circuit_class
+    LEFT JOIN (
+        SELECT circuit_class_id, SUM(num_circuits) AS num_circuits, SUM(num_properties) AS num_properties
+        FROM circuit_class_counter_delta
+        GROUP BY circuit_class_id
+    ) AS pending ON pending.circuit_class_id = circuit_class.id
+    LEFT JOIN (
+        SELECT circuit_class_id, COUNT(*) AS num
+        FROM circuit
+        WHERE deleted IS NULL
+        GROUP BY circuit_class_id
+    ) AS circuits ON circuits.circuit_class_id = circuit_class.id
+    LEFT JOIN (
+        SELECT circuit_class_id, COUNT(*) AS num
+        FROM property
+        WHERE deleted IS NULL
+        GROUP BY circuit_class_id
+    ) AS properties ON properties.circuit_class_id = circuit_class.id
+    WHERE (
+        circuit_class.num_circuits + COALESCE(pending.num_circuits, 0),
+        circuit_class.num_properties + COALESCE(pending.num_properties, 0)
+    ) IS DISTINCT FROM (COALESCE(circuits.num, 0), COALESCE(properties.num, 0))
+    ORDER BY circuit_class.id
+"""
+
+# Add all of the pending deltas to the counters, so the counters alone can be repaired
+COMPACT_SQL = 'SELECT compact_circuit_class_counters(NULL)'
+
+REPAIR_SQL = """
+    UPDATE circuit_class
+    SET num_circuits = %s, num_properties = %s, counters_compacted = clock_timestamp()
+    WHERE id = %s
+"""
+
+
+class Command(BaseCommand):
+    """
+    Find Circuit Classes whose counters do not match their live Circuits and Properties, and repair them
+    """
+    help = (
+        'Count the live Circuits and Properties of every Circuit Class and repair the totals that do not match. The '
+        'totals are kept up to date by triggers, so this is only needed if they were disabled or the data was changed '
+        'around them. Writes to circuit and property wait while the pending deltas are compacted and the counts are '
+        'taken, unless --dry-run is given, which only reports the drift.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report the drift without repairing it.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic(using='circuit'), connections['circuit'].cursor() as cursor:
+            if not options['dry_run']:
+                # Stop the counters from moving between being counted and being repaired
+                cursor.execute('LOCK TABLE circuit, property IN SHARE MODE')
+                cursor.execute(COMPACT_SQL)
+            cursor.execute(COUNT_SQL)
+            drift: List[Tuple[int, int, int, int, int]] = cursor.fetchall()
+
+            for pk, num_circuits, live_circuits, num_properties, live_properties in drift:
+                self.stdout.write(
+                    f'Circuit Class #{pk}: num_circuits {num_circuits} -> {live_circuits}, '
+                    f'num_properties {num_properties} -> {live_properties}',
+                )
+            if not options['dry_run'] and len(drift) > 0:
+                cursor.executemany(
+                    REPAIR_SQL,
+                    [(live_circuits, live_properties, pk) for pk, _, live_circuits, _, live_properties in drift],
+                )
+
+        action = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(f'{action} {len(drift)} Circuit Class(es) with drifted counters')
@@ -0,0 +1,81 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('circuit', '0006_django5'),
+    ]
+
+    operations = [
+        # ############################################################################## #
+        #               Per Address counter for Circuit reference_numbers                #
+        # ############################################################################## #
+        migrations.RunSQL(
+            """
+            CREATE TABLE circuit_reference_number (
+                address_id integer PRIMARY KEY,
+                last_reference_number integer NOT NULL
+            );
+            """,
+            reverse_sql='DROP TABLE circuit_reference_number;',
+        ),
+
+        # Backfill the counters from the existing Circuits, including deleted ones, so no number already handed out
+        # to a live Circuit can be generated again
+        migrations.RunSQL(
+            """
+            INSERT INTO circuit_reference_number (address_id, last_reference_number)
+            SELECT address_id, COALESCE(MAX(reference_number), 0)
+            FROM circuit
+            GROUP BY address_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+
+        # ############################################################################## #
+        #               Calculate the reference_number for a Circuit                     #
+        # ############################################################################## #
+        # The upsert locks the counter row for the Address until the inserting transaction ends, so concurrent
+        # inserts for the same Address are serialised and each one receives a distinct number in constant time.
+        migrations.RunSQL(
+            """
+            CREATE OR REPLACE FUNCTION insert_circuit_reference_number()
+                RETURNS TRIGGER AS
+            $BODY$
+            BEGIN
+                INSERT INTO circuit_reference_number AS counter (address_id, last_reference_number)
+                VALUES (NEW.address_id, 1)
+                ON CONFLICT (address_id) DO UPDATE
+                    SET last_reference_number = counter.last_reference_number + 1
+                RETURNING counter.last_reference_number INTO NEW.reference_number;
+                RETURN NEW;
+            END;
+            $BODY$
+
+            LANGUAGE plpgsql VOLATILE
+            COST 100;
+            """,
+            reverse_sql="""
+            CREATE OR REPLACE FUNCTION insert_circuit_reference_number()
+                RETURNS TRIGGER AS
+            $BODY$
+            DECLARE
+                new_reference_number integer;
+            BEGIN
+                SELECT COALESCE(MAX(reference_number), 0) + 1 INTO new_reference_number
+                FROM circuit
+                WHERE deleted IS NULL AND address_id = NEW.address_id;
+                NEW.reference_number := new_reference_number;
+                IF NEW.reference_number IS NULL THEN
+                    NEW.reference_number := 1;
+                END IF;
+                RETURN NEW;
+            END;
+            $BODY$
+
+            LANGUAGE plpgsql VOLATILE
+            COST 100;
+            """,
+        ),
+    ]
@@ -0,0 +1,90 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Upper
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('circuit', '0007_reference_number_sequence'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='PropertyValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.TextField()),
+                ('value', models.TextField()),
+                ('circuit', models.ForeignKey(
+                    on_delete=django.db.models.deletion.DO_NOTHING,
+                    related_name='property_values',
+                    to='circuit.circuit',
+                )),
+            ],
+            options={
+                'db_table': 'circuit_property_value',
+                'ordering': ['value'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='propertyvalue',
+            index=GinIndex(OpClass(Upper('value'), name='gin_trgm_ops'), name='circuit_property_value_trgm'),
+        ),
+
+        # ############################################################################## #
+        #               Keep circuit_property_value in line with Circuit.properties      #
+        # ############################################################################## #
+        migrations.RunSQL(
+            """
+            CREATE OR REPLACE FUNCTION sync_circuit_property_value()
+                RETURNS TRIGGER AS
+            $BODY$
+            BEGIN
+                IF TG_OP = 'UPDATE' THEN
+                    IF NEW.properties IS NOT DISTINCT FROM OLD.properties THEN
+                        RETURN NEW;
+                    END IF;
+                    DELETE FROM circuit_property_value WHERE circuit_id = NEW.id;
+                END IF;
+                IF jsonb_typeof(NEW.properties) = 'object' THEN
+                    INSERT INTO circuit_property_value (circuit_id, key, value)
+                    SELECT NEW.id, p.key, p.value
+                    FROM jsonb_each_text(NEW.properties) AS p
+                    WHERE p.value IS NOT NULL;
+                END IF;
+                RETURN NEW;
+            END;
+            $BODY$
+
+            LANGUAGE plpgsql VOLATILE
+            COST 100;
+            """,
+            reverse_sql='DROP FUNCTION sync_circuit_property_value();',
+        ),
+        migrations.RunSQL(
+            """
+            CREATE TRIGGER sync_circuit_property_value
+                AFTER INSERT OR UPDATE OF properties ON circuit
+                FOR EACH ROW EXECUTE PROCEDURE sync_circuit_property_value();
+            """,
+            reverse_sql='DROP TRIGGER sync_circuit_property_value ON circuit;',
+        ),
+
+        # Backfill the values of the existing Circuits
+        migrations.RunSQL(
+            """
+            INSERT INTO circuit_property_value (circuit_id, key, value)
+            SELECT c.id, p.key, p.value
+            FROM circuit AS c,
+                jsonb_each_text(
+                    CASE WHEN jsonb_typeof(c.properties) = 'object' THEN c.properties ELSE '{}'::jsonb END
+                ) AS p
+            WHERE p.value IS NOT NULL;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
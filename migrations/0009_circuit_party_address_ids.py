@@ -0,0 +1,69 @@
+import django.contrib.postgres.fields
+from django.contrib.postgres.indexes import GinIndex
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('circuit', '0008_property_value'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='circuit',
+            name='party_address_ids',
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.IntegerField(),
+                default=list,
+                editable=False,
+                size=None,
+            ),
+        ),
+
+        # ############################################################################## #
+        #               Keep party_address_ids in line with the Address columns          #
+        # ############################################################################## #
+        migrations.RunSQL(
+            """
+            CREATE OR REPLACE FUNCTION set_circuit_party_address_ids()
+                RETURNS TRIGGER AS
+            $BODY$
+            BEGIN
+                NEW.party_address_ids := ARRAY_REMOVE(
+                    ARRAY[NEW.address_id, NEW.customer_address_id, NEW.service_provider_address_id],
+                    NULL
+                );
+                RETURN NEW;
+            END;
+            $BODY$
+
+            LANGUAGE plpgsql VOLATILE
+            COST 100;
+            """,
+            reverse_sql='DROP FUNCTION set_circuit_party_address_ids();',
+        ),
+        migrations.RunSQL(
+            """
+            CREATE TRIGGER set_circuit_party_address_ids
+                BEFORE INSERT OR UPDATE ON circuit
+                FOR EACH ROW EXECUTE PROCEDURE set_circuit_party_address_ids();
+            """,
+            reverse_sql='DROP TRIGGER set_circuit_party_address_ids ON circuit;',
+        ),
+
+        # Backfill the existing Circuits
+        migrations.RunSQL(
+            """
+            UPDATE circuit SET party_address_ids = ARRAY_REMOVE(
+                ARRAY[address_id, customer_address_id, service_provider_address_id],
+                NULL
+            );
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='circuit',
+            index=GinIndex(fields=['party_address_ids'], name='circuit_party_address_ids'),
+        ),
+    ]
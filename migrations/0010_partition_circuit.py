@@ -0,0 +1,114 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Number of hash partitions the circuit table is split into by address_id
+CIRCUIT_PARTITIONS = 16
+
+
+def _rebuild_circuit(partition_by: str, partitions: str, primary_key: str) -> str:
+    """
+    Build the SQL that rebuilds the circuit table with the given PARTITION BY clause and primary key.
+
+    The rows are copied into a new table under an ACCESS EXCLUSIVE lock. The indexes, foreign keys and triggers of the
+    old table are read from the catalog and created again on the new one with the same names, so the indexes declared
+    on the Circuit model keep the names Django knows them by.
+    """
+    return f"""
+    DO $$
+    DECLARE
+        i integer;
+        index_defs text[];
+        constraint_defs text[];
+        trigger_defs text[];
+        definition text;
+    BEGIN
+        LOCK TABLE circuit IN ACCESS EXCLUSIVE MODE;
+
+        SELECT COALESCE(ARRAY_AGG(indexdef), '{{}}') INTO index_defs
+        FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = 'circuit' AND indexname <> 'circuit_pkey';
+
+        SELECT COALESCE(ARRAY_AGG(FORMAT('ALTER TABLE circuit ADD CONSTRAINT %I %s', conname,
+                                         pg_get_constraintdef(oid))), '{{}}') INTO constraint_defs
+        FROM pg_constraint
+        WHERE conrelid = 'circuit'::regclass AND contype = 'f';
+
+        SELECT COALESCE(ARRAY_AGG(pg_get_triggerdef(oid)), '{{}}') INTO trigger_defs
+        FROM pg_trigger
+        WHERE tgrelid = 'circuit'::regclass AND NOT tgisinternal;
+
+        CREATE TABLE circuit_rebuild (LIKE circuit INCLUDING DEFAULTS) {partition_by};
+        {partitions}
+
+        -- Give the new table its own sequence, so nothing on it depends on the old table
+        CREATE SEQUENCE circuit_rebuild_id_seq AS bigint;
+        ALTER TABLE circuit_rebuild ALTER COLUMN id SET DEFAULT nextval('circuit_rebuild_id_seq');
+        INSERT INTO circuit_rebuild SELECT * FROM circuit;
+        PERFORM setval('circuit_rebuild_id_seq', COALESCE((SELECT MAX(id) FROM circuit_rebuild), 0) + 1, false);
+
+        DROP TABLE circuit;
+        ALTER TABLE circuit_rebuild RENAME TO circuit;
+        ALTER SEQUENCE circuit_rebuild_id_seq RENAME TO circuit_id_seq;
+        ALTER SEQUENCE circuit_id_seq OWNED BY circuit.id;
+        ALTER TABLE circuit ADD CONSTRAINT circuit_pkey PRIMARY KEY ({primary_key});
+
+        FOREACH definition IN ARRAY index_defs || constraint_defs || trigger_defs LOOP
+            EXECUTE definition;
+        END LOOP;
+    END
+    $$;
+    """
+
+
+PARTITION = _rebuild_circuit(
+    'PARTITION BY HASH (address_id)',
+    f"""
+        FOR i IN 0..{CIRCUIT_PARTITIONS - 1} LOOP
+            EXECUTE FORMAT(
+                'CREATE TABLE %I PARTITION OF circuit_rebuild FOR VALUES WITH (MODULUS %s, REMAINDER %s)',
+                'circuit_p' || i,
+                {CIRCUIT_PARTITIONS},
+                i
+            );
+        END LOOP;
+    """,
+    # The partition key must be part of every unique constraint on a partitioned table. id is still unique on its own
+    # as it comes from one sequence
+    'id, address_id',
+)
+
+UNPARTITION = _rebuild_circuit('', '', 'id')
+
+
+class Migration(migrations.Migration):
+    """
+    Partition the circuit table by address_id.
+
+    Every Circuit query and the reference_number trigger are scoped by Address, so hash partitions keep the indexes
+    and vacuum work each query and insert touches in proportion to one partition rather than the whole table.
+    Row triggers on a partitioned table require PostgreSQL 13 or later.
+    """
+
+    dependencies = [
+        ('circuit', '0009_circuit_party_address_ids'),
+    ]
+
+    operations = [
+        # A foreign key can only reference a partitioned table through a unique constraint that includes the
+        # partition key, so circuit_property_value keeps circuit_id without a constraint. Its rows are only written by
+        # the `sync_circuit_property_value` trigger
+        migrations.AlterField(
+            model_name='propertyvalue',
+            name='circuit',
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name='property_values',
+                to='circuit.circuit',
+            ),
+        ),
+        migrations.RunSQL(
+            PARTITION,
+            reverse_sql=UNPARTITION,
+        ),
+    ]
@@ -0,0 +1,54 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('circuit', '0010_partition_circuit'),
+    ]
+
+    operations = [
+        # ############################################################################## #
+        #               Calculate the reference_number for a Circuit                     #
+        # ############################################################################## #
+        # Only generate a number when none is given, so the import can take a block of numbers per Address from
+        # circuit_reference_number in one statement and assign them itself
+        migrations.RunSQL(
+            """
+            CREATE OR REPLACE FUNCTION insert_circuit_reference_number()
+                RETURNS TRIGGER AS
+            $BODY$
+            BEGIN
+                IF NEW.reference_number IS NULL THEN
+                    INSERT INTO circuit_reference_number AS counter (address_id, last_reference_number)
+                    VALUES (NEW.address_id, 1)
+                    ON CONFLICT (address_id) DO UPDATE
+                        SET last_reference_number = counter.last_reference_number + 1
+                    RETURNING counter.last_reference_number INTO NEW.reference_number;
+                END IF;
+                RETURN NEW;
+            END;
+            $BODY$
+
+            LANGUAGE plpgsql VOLATILE
+            COST 100;
+            """,
+            reverse_sql="""
+            CREATE OR REPLACE FUNCTION insert_circuit_reference_number()
+                RETURNS TRIGGER AS
+            $BODY$
+            BEGIN
+                INSERT INTO circuit_reference_number AS counter (address_id, last_reference_number)
+                VALUES (NEW.address_id, 1)
+                ON CONFLICT (address_id) DO UPDATE
+                    SET last_reference_number = counter.last_reference_number + 1
+                RETURNING counter.last_reference_number INTO NEW.reference_number;
+                RETURN NEW;
+            END;
+            $BODY$
+
+            LANGUAGE plpgsql VOLATILE
+            COST 100;
+            """,
+        ),
+    ]
@@ -0,0 +1,199 @@
+import django.contrib.postgres.fields
+from django.contrib.postgres.indexes import GinIndex
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The dimensions of circuit_rollup, as read from a row of circuit
+DIMENSIONS = """
+    address_id,
+    customer_address_id,
+    service_provider_address_id,
+    circuit_class_id,
+    group_name,
+    hand_off_point,
+    date_trunc('month', install_date AT TIME ZONE 'UTC')::date,
+    date_trunc('month', decommission_date AT TIME ZONE 'UTC')::date
+"""
+
+COLUMNS = """
+    address_id,
+    customer_address_id,
+    service_provider_address_id,
+    circuit_class_id,
+    group_name,
+    hand_off_point,
+    install_month,
+    decommission_month
+"""
+
+
+def _apply_delta(rows: str) -> str:
+    """
+    Build the statements that add the (dimensions..., num_circuits, total_bandwidth) deltas selected by `rows` to
+    circuit_rollup, and remove the rows that no longer count any Circuit
+    """
+    return f"""
+    INSERT INTO circuit_rollup AS rollup (
+        {COLUMNS}, party_address_ids, num_circuits, total_bandwidth
+    )
+    SELECT
+        {COLUMNS},
+        ARRAY_REMOVE(ARRAY[address_id, customer_address_id, service_provider_address_id], NULL),
+        SUM(num_circuits),
+        SUM(total_bandwidth)
+    FROM (
+        {rows}
+    ) AS delta ({COLUMNS}, num_circuits, total_bandwidth)
+    GROUP BY {COLUMNS}
+    HAVING SUM(num_circuits) <> 0 OR SUM(total_bandwidth) <> 0
+    ON CONFLICT ON CONSTRAINT circuit_rollup_key DO UPDATE SET
+        num_circuits = rollup.num_circuits + EXCLUDED.num_circuits,
+        total_bandwidth = rollup.total_bandwidth + EXCLUDED.total_bandwidth;
+
+    DELETE FROM circuit_rollup WHERE num_circuits = 0;
+    """
+
+
+def _live(table: str, sign: str) -> str:
+    return f"""
+        SELECT {DIMENSIONS}, {sign}1, {sign}COALESCE(bandwidth, 0)::bigint
+        FROM {table}
+        WHERE deleted IS NULL
+    """
+
+
+def _trigger_function(name: str, rows: str) -> str:
+    return f"""
+    CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER AS
+    $BODY$
+    BEGIN
+        {_apply_delta(rows)}
+        RETURN NULL;
+    END;
+    $BODY$
+
+    LANGUAGE plpgsql VOLATILE
+    COST 100;
+    """
+
+
+class Migration(migrations.Migration):
+    """
+    Roll the live Circuits up by Addresses, Circuit Class, group name, hand off point and install and decommission
+    month, so the statistics can be read without scanning circuit.
+
+    The triggers are statement level with transition tables, so a set based insert, update or delete of many Circuits
+    applies one grouped upsert to circuit_rollup instead of one per row. NULLS NOT DISTINCT needs PostgreSQL 15.
+    """
+
+    dependencies = [
+        ('circuit', '0011_reference_number_if_null'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CircuitRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address_id', models.IntegerField()),
+                ('customer_address_id', models.IntegerField(null=True)),
+                ('decommission_month', models.DateField(null=True)),
+                ('group_name', models.CharField(max_length=250, null=True)),
+                ('hand_off_point', models.CharField(max_length=20, null=True)),
+                ('install_month', models.DateField()),
+                ('num_circuits', models.IntegerField()),
+                ('party_address_ids', django.contrib.postgres.fields.ArrayField(
+                    base_field=models.IntegerField(),
+                    default=list,
+                    size=None,
+                )),
+                ('service_provider_address_id', models.IntegerField(null=True)),
+                ('total_bandwidth', models.BigIntegerField()),
+                ('circuit_class', models.ForeignKey(
+                    db_constraint=False,
+                    on_delete=django.db.models.deletion.DO_NOTHING,
+                    related_name='+',
+                    to='circuit.circuitclass',
+                )),
+            ],
+            options={
+                'db_table': 'circuit_rollup',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='circuitrollup',
+            constraint=models.UniqueConstraint(
+                fields=(
+                    'address_id',
+                    'customer_address_id',
+                    'service_provider_address_id',
+                    'circuit_class',
+                    'group_name',
+                    'hand_off_point',
+                    'install_month',
+                    'decommission_month',
+                ),
+                name='circuit_rollup_key',
+                nulls_distinct=False,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='circuitrollup',
+            index=GinIndex(fields=['party_address_ids'], name='circuit_rollup_party_ids'),
+        ),
+        migrations.AddIndex(
+            model_name='circuitrollup',
+            index=models.Index(
+                fields=['num_circuits'],
+                name='circuit_rollup_empty',
+                condition=models.Q(num_circuits=0),
+            ),
+        ),
+
+        # ############################################################################## #
+        #               Keep circuit_rollup in line with the live Circuits               #
+        # ############################################################################## #
+        migrations.RunSQL(
+            _trigger_function('circuit_rollup_insert', _live('new_rows', '+')),
+            reverse_sql='DROP FUNCTION circuit_rollup_insert();',
+        ),
+        migrations.RunSQL(
+            _trigger_function(
+                'circuit_rollup_update',
+                f"{_live('old_rows', '-')} UNION ALL {_live('new_rows', '+')}",
+            ),
+            reverse_sql='DROP FUNCTION circuit_rollup_update();',
+        ),
+        migrations.RunSQL(
+            _trigger_function('circuit_rollup_delete', _live('old_rows', '-')),
+            reverse_sql='DROP FUNCTION circuit_rollup_delete();',
+        ),
+        migrations.RunSQL(
+            """
+            CREATE TRIGGER circuit_rollup_insert
+                AFTER INSERT ON circuit
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE PROCEDURE circuit_rollup_insert();
+            CREATE TRIGGER circuit_rollup_update
+                AFTER UPDATE ON circuit
+                REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE PROCEDURE circuit_rollup_update();
+            CREATE TRIGGER circuit_rollup_delete
+                AFTER DELETE ON circuit
+                REFERENCING OLD TABLE AS old_rows
+                FOR EACH STATEMENT EXECUTE PROCEDURE circuit_rollup_delete();
+            """,
+            reverse_sql="""
+            DROP TRIGGER circuit_rollup_insert ON circuit;
+            DROP TRIGGER circuit_rollup_update ON circuit;
+            DROP TRIGGER circuit_rollup_delete ON circuit;
+            """,
+        ),
+
+        # Backfill from the existing Circuits
+        migrations.RunSQL(
+            _apply_delta(_live('circuit', '+')),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('circuit', '0012_circuit_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='circuit',
+            index=models.Index(fields=['updated', 'id'], name='circuit_updated_id'),
+        ),
+    ]
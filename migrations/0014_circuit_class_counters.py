@@ -0,0 +1,159 @@
+from django.db import migrations, models
+
+
+def _live(source: str, column: str, sign: str) -> str:
+    return f"""
+        SELECT {column}, {sign}1
+        FROM {source}
+        WHERE deleted IS NULL
+    """
+
+
+def _trigger_function(name: str, counter: str, rows: str) -> str:
+    """
+    Build a trigger function that adds the (circuit_class_id, delta) rows selected by `rows` to `counter`.
+    The Circuit Classes are locked in id order first, so statements changing the same Circuit Classes at the same
+    time wait for each other rather than deadlock. The updated timestamp is moved along with the counter, as the
+    totals are part of the Circuit Class that is returned to Users.
+    """
+    return f"""
+    CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER AS
+    $BODY$
+    BEGIN
+        WITH delta AS (
+            SELECT circuit_class_id, SUM(num) AS num
+            FROM (
+                {rows}
+            ) AS changed (circuit_class_id, num)
+            GROUP BY circuit_class_id
+            HAVING SUM(num) <> 0
+        ), locked AS (
+            SELECT id
+            FROM circuit_class
+            WHERE id IN (SELECT circuit_class_id FROM delta)
+            ORDER BY id
+            FOR UPDATE
+        )
+        UPDATE circuit_class
+        SET {counter} = circuit_class.{counter} + delta.num, updated = NOW()
+        FROM delta
+        JOIN locked ON locked.id = delta.circuit_class_id
+        WHERE circuit_class.id = delta.circuit_class_id;
+        RETURN NULL;
+    END;
+    $BODY$
+
+    LANGUAGE plpgsql VOLATILE
+    COST 100;
+    """
+
+
+def _operations(table: str, counter: str, column: str) -> list:
+    """
+    Build the trigger functions and triggers that keep `counter` in line with the live rows of `table`
+    """
+    prefix = f'circuit_class_{counter}'
+    return [
+        migrations.RunSQL(
+            _trigger_function(f'{prefix}_insert', counter, _live('new_rows', column, '+')),
+            reverse_sql=f'DROP FUNCTION {prefix}_insert();',
+        ),
+        migrations.RunSQL(
+            _trigger_function(
+                f'{prefix}_update',
+                counter,
+                f"{_live('old_rows', column, '-')} UNION ALL {_live('new_rows', column, '+')}",
+            ),
+            reverse_sql=f'DROP FUNCTION {prefix}_update();',
+        ),
+        migrations.RunSQL(
+            _trigger_function(f'{prefix}_delete', counter, _live('old_rows', column, '-')),
+            reverse_sql=f'DROP FUNCTION {prefix}_delete();',
+        ),
+        migrations.RunSQL(
+            f"""
+            CREATE TRIGGER {prefix}_insert
+                AFTER INSERT ON {table}
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE PROCEDURE {prefix}_insert();
+            CREATE TRIGGER {prefix}_update
+                AFTER UPDATE ON {table}
+                REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE PROCEDURE {prefix}_update();
+            CREATE TRIGGER {prefix}_delete
+                AFTER DELETE ON {table}
+                REFERENCING OLD TABLE AS old_rows
+                FOR EACH STATEMENT EXECUTE PROCEDURE {prefix}_delete();
+            """,
+            reverse_sql=f"""
+            DROP TRIGGER {prefix}_insert ON {table};
+            DROP TRIGGER {prefix}_update ON {table};
+            DROP TRIGGER {prefix}_delete ON {table};
+            """,
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+    """
+    Keep counters of the live Circuits and Properties on circuit_class, so reading the totals of a Circuit Class does
+    not count its Circuits and Properties.
+
+    The triggers are statement level with transition tables, so inserting, deleting or moving many Circuits in one
+    statement updates each Circuit Class once. The counters are filled in from the existing rows, counted in the same
+    way as the reconcile_circuit_class_counters command, which repairs any later drift.
+    """
+
+    dependencies = [
+        ('circuit', '0013_circuit_updated_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='circuitclass',
+            name='num_circuits',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='circuitclass',
+            name='num_properties',
+            field=models.IntegerField(default=0),
+        ),
+
+        # ############################################################################## #
+        #        Keep the counters in line with the live Circuits and Properties         #
+        # ############################################################################## #
+        *_operations('circuit', 'num_circuits', 'circuit_class_id'),
+        *_operations('property', 'num_properties', 'circuit_class_id'),
+
+        # Backfill from the existing Circuits and Properties
+        migrations.RunSQL(
+            """
+            LOCK TABLE circuit, property IN SHARE MODE;
+            UPDATE circuit_class
+            SET num_circuits = counted.num_circuits, num_properties = counted.num_properties
+            FROM (
+                SELECT
+                    circuit_class.id,
+                    COALESCE(circuits.num, 0) AS num_circuits,
+                    COALESCE(properties.num, 0) AS num_properties
+                FROM circuit_class
+                LEFT JOIN (
+                    SELECT circuit_class_id, COUNT(*) AS num
+                    FROM circuit
+                    WHERE deleted IS NULL
+                    GROUP BY circuit_class_id
+                ) AS circuits ON circuits.circuit_class_id = circuit_class.id
+                LEFT JOIN (
+                    SELECT circuit_class_id, COUNT(*) AS num
+                    FROM property
+                    WHERE deleted IS NULL
+                    GROUP BY circuit_class_id
+                ) AS properties ON properties.circuit_class_id = circuit_class.id
+            ) AS counted
+            WHERE circuit_class.id = counted.id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,177 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Replace the single column indexes, which also index deleted rows, with partial composite indexes of the live rows
+    shaped like the list queries: scoped by an Address column, Circuit Class or Member and ordered by the default
+    ordering, with id as the tie break. The indexes on id alone are dropped, as the primary keys already cover them.
+    """
+
+    dependencies = [
+        ('circuit', '0014_circuit_class_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='circuit',
+            index=models.Index(
+                condition=models.Q(('deleted__isnull', True)),
+                fields=['address_id', 'reference_number', 'id'],
+                name='circuit_live_address_ref',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='circuit',
+            index=models.Index(
+                condition=models.Q(('deleted__isnull', True)),
+                fields=['customer_address_id', 'reference_number', 'id'],
+                name='circuit_live_customer_ref',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='circuit',
+            index=models.Index(
+                condition=models.Q(('deleted__isnull', True)),
+                fields=['service_provider_address_id', 'reference_number', 'id'],
+                name='circuit_live_sp_ref',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='circuit',
+            index=models.Index(
+                condition=models.Q(('deleted__isnull', True)),
+                fields=['circuit_class', 'reference_number', 'id'],
+                name='circuit_live_class_ref',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='circuit',
+            index=GinIndex(
+                condition=models.Q(('deleted__isnull', True)),
+                fields=['party_address_ids'],
+                name='circuit_live_party_ids',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='circuit',
+            index=models.Index(
+                condition=models.Q(('deleted__isnull', True)),
+                fields=['reference_number', 'id'],
+                name='circuit_live_ref_number',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='circuit',
+            index=models.Index(
+                condition=models.Q(('deleted__isnull', True)),
+                fields=['decommission_date', 'id'],
+                name='circuit_live_decommission',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='circuit',
+            index=models.Index(
+                condition=models.Q(('deleted__isnull', True)),
+                fields=['group_name', 'id'],
+                name='circuit_live_group_name',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='circuit',
+            index=models.Index(
+                condition=models.Q(('deleted__isnull', True)),
+                fields=['install_date', 'id'],
+                name='circuit_live_install_date',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='circuit',
+            index=models.Index(
+                condition=models.Q(('deleted__isnull', True)),
+                fields=['reference', 'id'],
+                name='circuit_live_reference',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='circuitclass',
+            index=models.Index(
+                condition=models.Q(('deleted__isnull', True)),
+                fields=['member_id', 'name', 'id'],
+                name='circuit_class_live_member',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(
+                condition=models.Q(('deleted__isnull', True)),
+                fields=['circuit_class', 'key', 'id'],
+                name='property_live_class_key',
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name='circuit',
+            name='circuit_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='circuit',
+            name='circuit_address_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='circuit',
+            name='circuit_customer_address_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='circuit',
+            name='circuit_sp_address_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='circuit',
+            name='circuit_party_address_ids',
+        ),
+        migrations.RemoveIndex(
+            model_name='circuit',
+            name='circuit_reference_number',
+        ),
+        migrations.RemoveIndex(
+            model_name='circuit',
+            name='circuit_decommission_date',
+        ),
+        migrations.RemoveIndex(
+            model_name='circuit',
+            name='circuit_group_name',
+        ),
+        migrations.RemoveIndex(
+            model_name='circuit',
+            name='circuit_install_date',
+        ),
+        migrations.RemoveIndex(
+            model_name='circuit',
+            name='circuit_reference',
+        ),
+        migrations.RemoveIndex(
+            model_name='circuitclass',
+            name='circuit_class_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='circuitclass',
+            name='circuit_class_name',
+        ),
+        migrations.RemoveIndex(
+            model_name='circuitclass',
+            name='circuit_class_member_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='property',
+            name='property_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='property',
+            name='property_key',
+        ),
+        migrations.RemoveIndex(
+            model_name='propertytype',
+            name='property_type_id',
+        ),
+    ]
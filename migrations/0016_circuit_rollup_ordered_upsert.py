@@ -0,0 +1,96 @@
+import importlib
+from django.db import migrations
+
+# The rollup migration, whose columns and row selects are reused and whose trigger functions are restored on reverse
+rollup = importlib.import_module('circuit.migrations.0012_circuit_rollup')
+
+# The deltas of an update: the old rows are taken away and the new rows added
+UPDATE_ROWS = f"{rollup._live('old_rows', '-')} UNION ALL {rollup._live('new_rows', '+')}"
+
+
+def _apply_delta(rows: str) -> str:
+    """
+    Build the statements that add the (dimensions..., num_circuits, total_bandwidth) deltas selected by `rows` to
+    circuit_rollup, and remove the rows among them that no longer count any Circuit.
+    The rows are upserted in key order, so statements touching the same rollup rows at the same time wait for each
+    other rather than deadlock. Only the upserted rows are checked for removal.
+    """
+    return f"""
+    WITH upserted AS (
+        INSERT INTO circuit_rollup AS rollup (
+            {rollup.COLUMNS}, party_address_ids, num_circuits, total_bandwidth
+        )
+        SELECT
+            {rollup.COLUMNS},
+            ARRAY_REMOVE(ARRAY[address_id, customer_address_id, service_provider_address_id], NULL),
+            SUM(num_circuits),
+            SUM(total_bandwidth)
+        FROM (
+            {rows}
+        ) AS delta ({rollup.COLUMNS}, num_circuits, total_bandwidth)
+        GROUP BY {rollup.COLUMNS}
+        HAVING SUM(num_circuits) <> 0 OR SUM(total_bandwidth) <> 0
+        ORDER BY {rollup.COLUMNS}
+        ON CONFLICT ON CONSTRAINT circuit_rollup_key DO UPDATE SET
+            num_circuits = rollup.num_circuits + EXCLUDED.num_circuits,
+            total_bandwidth = rollup.total_bandwidth + EXCLUDED.total_bandwidth
+        RETURNING rollup.id, rollup.num_circuits
+    )
+    SELECT ARRAY_AGG(id ORDER BY id) INTO emptied
+    FROM upserted
+    WHERE num_circuits = 0;
+
+    -- A statement cannot change a row twice, so the emptied rows are removed by a second statement
+    IF emptied IS NOT NULL THEN
+        DELETE FROM circuit_rollup WHERE id = ANY(emptied);
+    END IF;
+    """
+
+
+def _trigger_function(name: str, rows: str) -> str:
+    return f"""
+    CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER AS
+    $BODY$
+    DECLARE
+        emptied bigint[];
+    BEGIN
+        {_apply_delta(rows)}
+        RETURN NULL;
+    END;
+    $BODY$
+
+    LANGUAGE plpgsql VOLATILE
+    COST 100;
+    """
+
+
+class Migration(migrations.Migration):
+    """
+    Upsert the rollup rows of a statement in key order, and only remove the emptied rows among the ones it upserted.
+    Until now concurrent statements could lock the same rollup rows in different orders and deadlock, and every write
+    to circuit looked through circuit_rollup for empty rows. The index that served that search is dropped.
+    """
+
+    dependencies = [
+        ('circuit', '0015_live_row_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            _trigger_function('circuit_rollup_insert', rollup._live('new_rows', '+')),
+            reverse_sql=rollup._trigger_function('circuit_rollup_insert', rollup._live('new_rows', '+')),
+        ),
+        migrations.RunSQL(
+            _trigger_function('circuit_rollup_update', UPDATE_ROWS),
+            reverse_sql=rollup._trigger_function('circuit_rollup_update', UPDATE_ROWS),
+        ),
+        migrations.RunSQL(
+            _trigger_function('circuit_rollup_delete', rollup._live('old_rows', '-')),
+            reverse_sql=rollup._trigger_function('circuit_rollup_delete', rollup._live('old_rows', '-')),
+        ),
+        migrations.RemoveIndex(
+            model_name='circuitrollup',
+            name='circuit_rollup_empty',
+        ),
+    ]
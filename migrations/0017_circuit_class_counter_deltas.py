@@ -0,0 +1,151 @@
+import importlib
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The counters migration, whose row selects are reused and whose trigger functions are restored on reverse
+counters = importlib.import_module('circuit.migrations.0014_circuit_class_counters')
+
+COMPACT_FUNCTION = """
+    CREATE OR REPLACE FUNCTION compact_circuit_class_counters(batch_size integer)
+        RETURNS integer AS
+    $BODY$
+    DECLARE
+        compacted integer;
+    BEGIN
+        -- Compactions wait for each other, so they never update the same Circuit Classes in different orders
+        PERFORM pg_advisory_xact_lock(hashtext('compact_circuit_class_counters'));
+
+        WITH moved AS (
+            DELETE FROM circuit_class_counter_delta
+            WHERE id IN (
+                SELECT id
+                FROM circuit_class_counter_delta
+                ORDER BY id
+                LIMIT batch_size
+            )
+            RETURNING circuit_class_id, num_circuits, num_properties
+        ), summed AS (
+            SELECT
+                circuit_class_id,
+                SUM(num_circuits) AS num_circuits,
+                SUM(num_properties) AS num_properties,
+                COUNT(*) AS num_rows
+            FROM moved
+            GROUP BY circuit_class_id
+        ), applied AS (
+            UPDATE circuit_class
+            SET
+                num_circuits = circuit_class.num_circuits + summed.num_circuits,
+                num_properties = circuit_class.num_properties + summed.num_properties,
+                counters_compacted = clock_timestamp()
+            FROM summed
+            WHERE circuit_class.id = summed.circuit_class_id
+        )
+        SELECT COALESCE(SUM(num_rows), 0) INTO compacted FROM summed;
+        RETURN compacted;
+    END;
+    $BODY$
+
+    LANGUAGE plpgsql VOLATILE
+    COST 100;
+"""
+
+
+def _trigger_function(name: str, counter: str, rows: str) -> str:
+    """
+    Build a trigger function that records the (circuit_class_id, delta) rows selected by `rows` as one
+    circuit_class_counter_delta row per Circuit Class. circuit_class itself is not locked or updated, so statements
+    changing the Circuits or Properties of the same Circuit Class do not wait for each other.
+    """
+    other = 'num_properties' if counter == 'num_circuits' else 'num_circuits'
+    return f"""
+    CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER AS
+    $BODY$
+    BEGIN
+        INSERT INTO circuit_class_counter_delta (circuit_class_id, {counter}, {other})
+        SELECT circuit_class_id, SUM(num), 0
+        FROM (
+            {rows}
+        ) AS changed (circuit_class_id, num)
+        GROUP BY circuit_class_id
+        HAVING SUM(num) <> 0;
+        RETURN NULL;
+    END;
+    $BODY$
+
+    LANGUAGE plpgsql VOLATILE
+    COST 100;
+    """
+
+
+def _functions(counter: str, column: str, builder) -> str:
+    """
+    Build the insert, update and delete trigger functions for `counter` with the given function builder
+    """
+    prefix = f'circuit_class_{counter}'
+    insert_rows = counters._live('new_rows', column, '+')
+    update_rows = f"{counters._live('old_rows', column, '-')} UNION ALL {counters._live('new_rows', column, '+')}"
+    delete_rows = counters._live('old_rows', column, '-')
+    return ''.join([
+        builder(f'{prefix}_insert', counter, insert_rows),
+        builder(f'{prefix}_update', counter, update_rows),
+        builder(f'{prefix}_delete', counter, delete_rows),
+    ])
+
+
+class Migration(migrations.Migration):
+    """
+    Record changes to the counters of a Circuit Class in circuit_class_counter_delta instead of updating circuit_class.
+
+    The triggers from 0014 locked the Circuit Class row and moved its updated timestamp on every write to its Circuits
+    and Properties, so those writes were serialized per Circuit Class. Now each statement inserts its deltas, and
+    compact_circuit_class_counters adds them to circuit_class in batches, setting counters_compacted rather than
+    updated. Reading the totals adds the deltas that have not been compacted yet.
+    """
+
+    dependencies = [
+        ('circuit', '0016_circuit_rollup_ordered_upsert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CircuitClassCounterDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('num_circuits', models.IntegerField(default=0)),
+                ('num_properties', models.IntegerField(default=0)),
+                ('circuit_class', models.ForeignKey(
+                    db_constraint=False,
+                    on_delete=django.db.models.deletion.DO_NOTHING,
+                    related_name='counter_deltas',
+                    to='circuit.circuitclass',
+                )),
+            ],
+            options={
+                'db_table': 'circuit_class_counter_delta',
+            },
+        ),
+        migrations.AddField(
+            model_name='circuitclass',
+            name='counters_compacted',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunSQL(
+            COMPACT_FUNCTION,
+            reverse_sql='DROP FUNCTION compact_circuit_class_counters(integer);',
+        ),
+
+        # ############################################################################## #
+        #      Record the deltas, and fold any left over into circuit_class on reverse   #
+        # ############################################################################## #
+        migrations.RunSQL(
+            _functions('num_circuits', 'circuit_class_id', _trigger_function)
+            + _functions('num_properties', 'circuit_class_id', _trigger_function),
+            reverse_sql=(
+                _functions('num_circuits', 'circuit_class_id', counters._trigger_function)
+                + _functions('num_properties', 'circuit_class_id', counters._trigger_function)
+                + 'SELECT compact_circuit_class_counters(NULL);'
+            ),
+        ),
+    ]
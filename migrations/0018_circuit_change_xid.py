@@ -0,0 +1,60 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Order the change feed by the id of the transaction that last wrote each Circuit, instead of by `updated`.
+
+    `updated` is set from different clocks: Python in save() and the transaction start time of the DB in set based
+    writes, and neither is the order the changes commit in. A transaction id is compared against the oldest
+    transaction still running, so the feed only reads past changes that can no longer be joined by older ones.
+    pg_current_xact_id needs PostgreSQL 13. The existing Circuits are left at 0, before every later change.
+    """
+
+    dependencies = [
+        ('circuit', '0017_circuit_class_counter_deltas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='circuit',
+            name='change_xid',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+
+        # ############################################################################## #
+        #           Stamp every written Circuit with the id of its transaction           #
+        # ############################################################################## #
+        migrations.RunSQL(
+            """
+            CREATE OR REPLACE FUNCTION set_circuit_change_xid()
+                RETURNS TRIGGER AS
+            $BODY$
+            BEGIN
+                NEW.change_xid := pg_current_xact_id()::text::bigint;
+                RETURN NEW;
+            END;
+            $BODY$
+
+            LANGUAGE plpgsql VOLATILE
+            COST 100;
+            """,
+            reverse_sql='DROP FUNCTION set_circuit_change_xid();',
+        ),
+        migrations.RunSQL(
+            """
+            CREATE TRIGGER set_circuit_change_xid
+                BEFORE INSERT OR UPDATE ON circuit
+                FOR EACH ROW EXECUTE PROCEDURE set_circuit_change_xid();
+            """,
+            reverse_sql='DROP TRIGGER set_circuit_change_xid ON circuit;',
+        ),
+        migrations.RemoveIndex(
+            model_name='circuit',
+            name='circuit_updated_id',
+        ),
+        migrations.AddIndex(
+            model_name='circuit',
+            index=models.Index(fields=['change_xid', 'id'], name='circuit_change_xid_id'),
+        ),
+    ]
@@ -0,0 +1,126 @@
+import importlib
+from django.db import migrations
+
+# The counter deltas migration, whose row selects are reused and whose trigger functions are restored on reverse
+deltas = importlib.import_module('circuit.migrations.0017_circuit_class_counter_deltas')
+
+# Number of pending deltas a Circuit Class can have before a write to it compacts them
+COMPACT_THRESHOLD = 64
+
+COMPACT_FOR_FUNCTION = """
+    CREATE OR REPLACE FUNCTION compact_circuit_class_counters_for(class_ids integer[])
+        RETURNS integer AS
+    $BODY$
+    DECLARE
+        compacted integer;
+    BEGIN
+        IF cardinality(class_ids) = 0 THEN
+            RETURN 0;
+        END IF;
+        -- Leave it to the next write when another compaction is running, rather than make this one wait for it
+        IF NOT pg_try_advisory_xact_lock(hashtext('compact_circuit_class_counters')) THEN
+            RETURN 0;
+        END IF;
+
+        WITH moved AS (
+            DELETE FROM circuit_class_counter_delta
+            WHERE circuit_class_id = ANY(class_ids)
+            RETURNING circuit_class_id, num_circuits, num_properties
+        ), summed AS (
+            SELECT
+                circuit_class_id,
+                SUM(num_circuits) AS num_circuits,
+                SUM(num_properties) AS num_properties,
+                COUNT(*) AS num_rows
+            FROM moved
+            GROUP BY circuit_class_id
+        ), applied AS (
+            UPDATE circuit_class
+            SET
+                num_circuits = circuit_class.num_circuits + summed.num_circuits,
+                num_properties = circuit_class.num_properties + summed.num_properties,
+                counters_compacted = clock_timestamp()
+            FROM summed
+            WHERE circuit_class.id = summed.circuit_class_id
+        )
+        SELECT COALESCE(SUM(num_rows), 0) INTO compacted FROM summed;
+        RETURN compacted;
+    END;
+    $BODY$
+
+    LANGUAGE plpgsql VOLATILE
+    COST 100;
+"""
+
+
+def _trigger_function(name: str, counter: str, rows: str) -> str:
+    """
+    Build a trigger function that records the (circuit_class_id, delta) rows selected by `rows` as one
+    circuit_class_counter_delta row per Circuit Class, then compacts the deltas of the Circuit Classes it wrote to that
+    have more than COMPACT_THRESHOLD of them, so the deltas read with the totals stay few without a scheduled job
+    """
+    other = 'num_properties' if counter == 'num_circuits' else 'num_circuits'
+    return f"""
+    CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER AS
+    $BODY$
+    DECLARE
+        touched integer[];
+    BEGIN
+        WITH recorded AS (
+            INSERT INTO circuit_class_counter_delta (circuit_class_id, {counter}, {other})
+            SELECT circuit_class_id, SUM(num), 0
+            FROM (
+                {rows}
+            ) AS changed (circuit_class_id, num)
+            GROUP BY circuit_class_id
+            HAVING SUM(num) <> 0
+            RETURNING circuit_class_id
+        )
+        SELECT ARRAY_AGG(circuit_class_id) INTO touched FROM recorded;
+
+        IF touched IS NOT NULL THEN
+            PERFORM compact_circuit_class_counters_for(ARRAY(
+                SELECT circuit_class_id
+                FROM circuit_class_counter_delta
+                WHERE circuit_class_id = ANY(touched)
+                GROUP BY circuit_class_id
+                HAVING COUNT(*) > {COMPACT_THRESHOLD}
+            ));
+        END IF;
+        RETURN NULL;
+    END;
+    $BODY$
+
+    LANGUAGE plpgsql VOLATILE
+    COST 100;
+    """
+
+
+class Migration(migrations.Migration):
+    """
+    Compact the counter deltas of a Circuit Class from the writes to it, once it has more than COMPACT_THRESHOLD of
+    them, so circuit_class_counter_delta stays small without scheduling the compact_circuit_class_counters command.
+
+    Only one compaction runs at a time. A write that finds another one running leaves its deltas for the next write
+    instead of waiting, so writes to the Circuits of a Circuit Class still do not wait for each other.
+    """
+
+    dependencies = [
+        ('circuit', '0018_circuit_change_xid'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            COMPACT_FOR_FUNCTION,
+            reverse_sql='DROP FUNCTION compact_circuit_class_counters_for(integer[]);',
+        ),
+        migrations.RunSQL(
+            deltas._functions('num_circuits', 'circuit_class_id', _trigger_function)
+            + deltas._functions('num_properties', 'circuit_class_id', _trigger_function),
+            reverse_sql=(
+                deltas._functions('num_circuits', 'circuit_class_id', deltas._trigger_function)
+                + deltas._functions('num_properties', 'circuit_class_id', deltas._trigger_function)
+            ),
+        ),
+    ]
@@ -1,12 +1,18 @@
 from .circuit import Circuit
 from .circuit_class import CircuitClass
+from .circuit_class_counter_delta import CircuitClassCounterDelta
+from .circuit_rollup import CircuitRollup
 from .property import Property
 from .property_type import PropertyType
+from .property_value import PropertyValue
 
 
 __all__ = [
     'Circuit',
     'CircuitClass',
+    'CircuitClassCounterDelta',
+    'CircuitRollup',
     'Property',
     'PropertyType',
+    'PropertyValue',
 ]
@@ -1,5 +1,7 @@
 # libs
 from cloudcix_rest.models import BaseManager, BaseModel
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.urls import reverse
 # local
@@ -29,10 +31,15 @@ class CircuitManager(BaseManager):
 class Circuit(BaseModel):
     """
     The Circuit model represents a circuit.
+
+    The circuit table is hash partitioned by address_id, and its primary key in the DB is (id, address_id).
     """
     # Fields
     address_id = models.IntegerField()
     bandwidth = models.IntegerField(null=True)
+    # The id of the transaction that last wrote the Circuit, set by the `set_circuit_change_xid` trigger to order the
+    # change feed
+    change_xid = models.BigIntegerField(default=0, editable=False)
     circuit_class = models.ForeignKey(CircuitClass, models.CASCADE, related_name='circuits')
     customer_address_id = models.IntegerField(null=True)
     decommission_date = models.DateTimeField(null=True)
@@ -40,6 +47,9 @@ class Circuit(BaseModel):
     group_name = models.CharField(max_length=250, null=True)
     hand_off_point = models.CharField(max_length=20, null=True)
     install_date = models.DateTimeField()
+    # The non-null values of address_id, customer_address_id and service_provider_address_id, maintained by the
+    # `set_circuit_party_address_ids` trigger so visibility can be checked with one GIN index lookup
+    party_address_ids = ArrayField(models.IntegerField(), default=list, editable=False)
     properties = models.JSONField(default=dict)
     reference_number = models.IntegerField()
     reference = models.CharField(max_length=100, null=True, default='')
@@ -54,16 +64,61 @@ class Circuit(BaseModel):
         # Django default table names are f'{app_label}_{table}' but we only
         # need the table name since we have multiple DBs
         db_table = 'circuit'
+        # Every list reads live Circuits only, so the indexes leave out deleted rows. Each one ends with id, the tie
+        # break the lists are ordered by, so a page can be read in index order without sorting
         indexes = [
-            models.Index(fields=['id'], name='circuit_id'),
-            models.Index(fields=['address_id'], name='circuit_address_id'),
-            models.Index(fields=['customer_address_id'], name='circuit_customer_address_id'),
-            models.Index(fields=['decommission_date'], name='circuit_decommission_date'),
-            models.Index(fields=['group_name'], name='circuit_group_name'),
-            models.Index(fields=['install_date'], name='circuit_install_date'),
-            models.Index(fields=['reference_number'], name='circuit_reference_number'),
-            models.Index(fields=['reference'], name='circuit_reference'),
-            models.Index(fields=['service_provider_address_id'], name='circuit_sp_address_id'),
+            models.Index(
+                fields=['address_id', 'reference_number', 'id'],
+                name='circuit_live_address_ref',
+                condition=models.Q(deleted__isnull=True),
+            ),
+            models.Index(
+                fields=['customer_address_id', 'reference_number', 'id'],
+                name='circuit_live_customer_ref',
+                condition=models.Q(deleted__isnull=True),
+            ),
+            models.Index(
+                fields=['service_provider_address_id', 'reference_number', 'id'],
+                name='circuit_live_sp_ref',
+                condition=models.Q(deleted__isnull=True),
+            ),
+            models.Index(
+                fields=['circuit_class', 'reference_number', 'id'],
+                name='circuit_live_class_ref',
+                condition=models.Q(deleted__isnull=True),
+            ),
+            GinIndex(
+                fields=['party_address_ids'],
+                name='circuit_live_party_ids',
+                condition=models.Q(deleted__isnull=True),
+            ),
+            models.Index(
+                fields=['reference_number', 'id'],
+                name='circuit_live_ref_number',
+                condition=models.Q(deleted__isnull=True),
+            ),
+            models.Index(
+                fields=['decommission_date', 'id'],
+                name='circuit_live_decommission',
+                condition=models.Q(deleted__isnull=True),
+            ),
+            models.Index(
+                fields=['group_name', 'id'],
+                name='circuit_live_group_name',
+                condition=models.Q(deleted__isnull=True),
+            ),
+            models.Index(
+                fields=['install_date', 'id'],
+                name='circuit_live_install_date',
+                condition=models.Q(deleted__isnull=True),
+            ),
+            models.Index(
+                fields=['reference', 'id'],
+                name='circuit_live_reference',
+                condition=models.Q(deleted__isnull=True),
+            ),
+            # Serves the change feed, which reads every row, deleted or not, in (change_xid, id) order past a watermark
+            models.Index(fields=['change_xid', 'id'], name='circuit_change_xid_id'),
         ]
 
         ordering = ['reference_number']
@@ -1,16 +1,23 @@
 # stdlib
-from datetime import datetime
+from typing import Any, Iterable, List, Tuple
 # libs
 from cloudcix_rest.models import BaseManager, BaseModel
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Max, OuterRef, Prefetch, Subquery, Sum, prefetch_related_objects
+from django.db.models.functions import Coalesce, Now
 from django.urls import reverse
 # local
 
 
 __all__ = [
+    'COUNTER_FIELDS',
     'CircuitClass',
 ]
 
+# Fields of a Circuit Class that are maintained in the DB by compact_circuit_class_counters, and are never written
+# from Django
+COUNTER_FIELDS = ('num_circuits', 'num_properties', 'counters_compacted')
+
 
 class CircuitClassManager(BaseManager):
     """
@@ -26,6 +33,81 @@ class CircuitClassManager(BaseManager):
             'properties',
         )
 
+    def _pending(self, counter: str) -> Coalesce:
+        """
+        The sum of the deltas to `counter` of the outer Circuit Class that have not been compacted into it yet
+        """
+        delta_model = self.model.counter_deltas.rel.related_model
+        return Coalesce(
+            Subquery(
+                delta_model.objects.filter(
+                    circuit_class_id=OuterRef('pk'),
+                ).order_by().values('circuit_class_id').annotate(total=Sum(counter)).values('total'),
+            ),
+            0,
+        )
+
+    def load_totals(self, circuit_classes: Iterable['CircuitClass']):
+        """
+        Read the totals of the given Circuit Class records in one query. The counters and the deltas not yet compacted
+        into them are read in the same statement, so a compaction running at the same time is not counted twice.
+        :param circuit_classes: The CircuitClass instances to populate. Duplicate instances of the same record are all
+                                populated
+        """
+        circuit_classes = list(circuit_classes)
+        if len(circuit_classes) == 0:
+            return
+        # Deleted Circuit Classes can still be nested in the records returned, so they are not filtered out here
+        totals = {
+            pk: (num_circuits + pending_circuits, num_properties + pending_properties)
+            for pk, num_circuits, pending_circuits, num_properties, pending_properties in models.QuerySet(
+                self.model,
+            ).filter(
+                pk__in={circuit_class.pk for circuit_class in circuit_classes},
+            ).annotate(
+                pending_circuits=self._pending('num_circuits'),
+                pending_properties=self._pending('num_properties'),
+            ).values_list('pk', 'num_circuits', 'pending_circuits', 'num_properties', 'pending_properties')
+        }
+        for circuit_class in circuit_classes:
+            circuit_class._total_circuits, circuit_class._total_properties = totals.get(circuit_class.pk, (0, 0))
+
+    def totals_version(self, pks: Any) -> Tuple[Any, ...]:
+        """
+        Return values that change whenever the totals of any of the given Circuit Classes change, for building
+        validators. A delta that commits late can have a lower id than ones already seen, so the deltas are counted as
+        well. They are only removed by a compaction, which moves counters_compacted forward.
+        :param pks: The ids of the Circuit Classes, or a queryset selecting them
+        """
+        delta_model = self.model.counter_deltas.rel.related_model
+        deltas = delta_model.objects.filter(circuit_class_id__in=pks).aggregate(num=Count('id'), last=Max('id'))
+        compacted = models.QuerySet(self.model).filter(pk__in=pks).aggregate(last=Max('counters_compacted'))
+        return deltas['num'], deltas['last'], compacted['last']
+
+    def prefetch_totals(self, circuit_classes: Iterable['CircuitClass']) -> List['CircuitClass']:
+        """
+        Load the live properties and the totals for a page of Circuit Class records in two queries, so serializing the
+        page does not run any further queries per record
+        :param circuit_classes: The CircuitClass instances to populate. Duplicate instances of the same record (e.g.
+                                from a select_related on a page of Circuits) are all populated
+        :return: The supplied instances as a list
+        """
+        circuit_classes = list(circuit_classes)
+        if len(circuit_classes) == 0:
+            return circuit_classes
+
+        property_model = self.model.properties.rel.related_model
+        prefetch_related_objects(
+            circuit_classes,
+            Prefetch(
+                'properties',
+                queryset=property_model.objects.filter(deleted__isnull=True),
+                to_attr='live_properties',
+            ),
+        )
+        self.load_totals(circuit_classes)
+        return circuit_classes
+
 
 class CircuitClass(BaseModel):
     """
@@ -34,6 +116,11 @@ class CircuitClass(BaseModel):
     # Fields
     name = models.CharField(max_length=250)
     member_id = models.IntegerField()
+    # Counters of the live Circuits and Properties in the Circuit Class, as of the last compaction of the deltas the
+    # triggers record in circuit_class_counter_delta
+    counters_compacted = models.DateTimeField(null=True)
+    num_circuits = models.IntegerField(default=0)
+    num_properties = models.IntegerField(default=0)
 
     objects = CircuitClassManager()
 
@@ -45,9 +132,12 @@ class CircuitClass(BaseModel):
         # need the table name since we have multiple DBs
         db_table = 'circuit_class'
         indexes = [
-            models.Index(fields=['id'], name='circuit_class_id'),
-            models.Index(fields=['name'], name='circuit_class_name'),
-            models.Index(fields=['member_id'], name='circuit_class_member_id'),
+            # Serves the list of the live Circuit Classes in a Member, ordered by name with id as the tie break
+            models.Index(
+                fields=['member_id', 'name', 'id'],
+                name='circuit_class_live_member',
+                condition=models.Q(deleted__isnull=True),
+            ),
         ]
 
         ordering = ['name']
@@ -61,19 +151,47 @@ class CircuitClass(BaseModel):
 
     def cascade_delete(self):
         """
-        Delete the Circuit Class, and delete the Property records that are related to it
+        Delete the Circuit Class, and delete the Property records that are related to it.
+        Each table is updated with a single statement, and both use the transaction's timestamp from the DB.
+        """
+        with transaction.atomic(using='circuit'):
+            self.properties.filter(deleted__isnull=True).update(deleted=Now(), updated=Now())
+            CircuitClass.objects.filter(pk=self.pk).update(deleted=Now(), updated=Now())
+
+    def get_live_properties(self) -> Iterable[models.Model]:
+        """
+        Return the Property records of this Circuit Class that have not been deleted, using the values loaded by
+        CircuitClassManager.prefetch_totals when they are available
+        """
+        if hasattr(self, 'live_properties'):
+            return self.live_properties
+        return self.properties.filter(deleted__isnull=True)
+
+    def save(self, *args, **kwargs):
+        """
+        Save the Circuit Class without writing the counters, which the DB may have changed since it was loaded
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    def refresh_counters(self):
+        """
+        Reload the totals after writing Circuits or Properties of the Circuit Class
         """
-        deltime = datetime.utcnow()
-        for property in self.properties.all():
-            property.deleted = deltime
-            property.save()
-        self.deleted = deltime
-        self.save()
+        CircuitClass.objects.load_totals([self])
 
     @property
-    def total_circuits(self):
-        return self.circuits.filter(deleted__isnull=True).count()
+    def total_circuits(self) -> int:
+        if not hasattr(self, '_total_circuits'):
+            CircuitClass.objects.load_totals([self])
+        return self._total_circuits
 
     @property
-    def total_properties(self):
-        return self.properties.filter(deleted__isnull=True).count()
+    def total_properties(self) -> int:
+        if not hasattr(self, '_total_properties'):
+            CircuitClass.objects.load_totals([self])
+        return self._total_properties
@@ -0,0 +1,38 @@
+# libs
+from django.db import models
+# local
+from .circuit_class import CircuitClass
+
+
+__all__ = [
+    'CircuitClassCounterDelta',
+]
+
+
+class CircuitClassCounterDelta(models.Model):
+    """
+    The CircuitClassCounterDelta model holds a change to the counters of a Circuit Class that has not been added to
+    circuit_class yet.
+    The `circuit_class_*` triggers on circuit and property insert one row per Circuit Class per statement instead of
+    updating circuit_class, so writes to the Circuits of a Circuit Class do not wait for each other. The rows of a
+    Circuit Class are added to circuit_class and removed by the triggers once it has more than a few dozen of them,
+    or by the compact_circuit_class_counters command.
+    It should never be written to directly.
+    """
+    # Fields
+    circuit_class = models.ForeignKey(
+        CircuitClass,
+        models.DO_NOTHING,
+        db_constraint=False,
+        related_name='counter_deltas',
+    )
+    num_circuits = models.IntegerField(default=0)
+    num_properties = models.IntegerField(default=0)
+
+    class Meta:
+        """
+        Metadata about the model for Django to use in whatever way it sees fit
+        """
+        # Django default table names are f'{app_label}_{table}' but we only
+        # need the table name since we have multiple DBs
+        db_table = 'circuit_class_counter_delta'
@@ -0,0 +1,60 @@
+# libs
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models
+# local
+from .circuit_class import CircuitClass
+
+
+__all__ = [
+    'CircuitRollup',
+]
+
+
+class CircuitRollup(models.Model):
+    """
+    The CircuitRollup model holds the number of live Circuits and their total bandwidth for each combination of
+    Addresses, Circuit Class, group name, hand off point and install and decommission month.
+    It is maintained by the `circuit_rollup_*` triggers on circuit and should never be written to directly.
+    """
+    # Fields
+    address_id = models.IntegerField()
+    circuit_class = models.ForeignKey(CircuitClass, models.DO_NOTHING, db_constraint=False, related_name='+')
+    customer_address_id = models.IntegerField(null=True)
+    decommission_month = models.DateField(null=True)
+    group_name = models.CharField(max_length=250, null=True)
+    hand_off_point = models.CharField(max_length=20, null=True)
+    install_month = models.DateField()
+    num_circuits = models.IntegerField()
+    # The non-null Address ids, so visibility is checked in the same way as for Circuits
+    party_address_ids = ArrayField(models.IntegerField(), default=list)
+    service_provider_address_id = models.IntegerField(null=True)
+    total_bandwidth = models.BigIntegerField()
+
+    class Meta:
+        """
+        Metadata about the model for Django to use in whatever way it sees fit
+        """
+        # Django default table names are f'{app_label}_{table}' but we only
+        # need the table name since we have multiple DBs
+        db_table = 'circuit_rollup'
+        constraints = [
+            # The key the triggers upsert on. NULL is a value of its own in each dimension
+            models.UniqueConstraint(
+                fields=[
+                    'address_id',
+                    'customer_address_id',
+                    'service_provider_address_id',
+                    'circuit_class',
+                    'group_name',
+                    'hand_off_point',
+                    'install_month',
+                    'decommission_month',
+                ],
+                name='circuit_rollup_key',
+                nulls_distinct=False,
+            ),
+        ]
+        indexes = [
+            GinIndex(fields=['party_address_ids'], name='circuit_rollup_party_ids'),
+        ]
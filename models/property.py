@@ -46,8 +46,12 @@ class Property(BaseModel):
         # need the table name since we have multiple DBs
         db_table = 'property'
         indexes = [
-            models.Index(fields=['id'], name='property_id'),
-            models.Index(fields=['key'], name='property_key'),
+            # Serves loading the live Properties of Circuit Classes, ordered by key
+            models.Index(
+                fields=['circuit_class', 'key', 'id'],
+                name='property_live_class_key',
+                condition=models.Q(deleted__isnull=True),
+            ),
             models.Index(fields=['required'], name='property_required'),
         ]
 
@@ -24,7 +24,6 @@ class PropertyType(BaseModel):
         # need the table name since we have multiple DBs
         db_table = 'property_type'
         indexes = [
-            models.Index(fields=['id'], name='property_type_id'),
             models.Index(fields=['name'], name='property_type_name'),
         ]
 
@@ -0,0 +1,37 @@
+# libs
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import models
+from django.db.models.functions import Upper
+# local
+from .circuit import Circuit
+
+
+__all__ = [
+    'PropertyValue',
+]
+
+
+class PropertyValue(models.Model):
+    """
+    The PropertyValue model is a normalised copy of the values in Circuit.properties, one row per key.
+    It is maintained by the `sync_circuit_property_value` trigger and should never be written to directly.
+    """
+    # Fields
+    # circuit is partitioned, and a foreign key constraint can only reference it together with address_id
+    circuit = models.ForeignKey(Circuit, models.DO_NOTHING, db_constraint=False, related_name='property_values')
+    key = models.TextField()
+    value = models.TextField()
+
+    class Meta:
+        """
+        Metadata about the model for Django to use in whatever way it sees fit
+        """
+        # Django default table names are f'{app_label}_{table}' but we only
+        # need the table name since we have multiple DBs
+        db_table = 'circuit_property_value'
+        indexes = [
+            # Matches the UPPER(value) LIKE UPPER(%term%) generated for `value__icontains`
+            GinIndex(OpClass(Upper('value'), name='gin_trgm_ops'), name='circuit_property_value_trgm'),
+        ]
+
+        ordering = ['value']
@@ -1,6 +1,6 @@
 
 # local
-from .circuit import CircuitSerializer
+from .circuit import CIRCUIT_FIELD_COLUMNS, CircuitSerializer, serialize_circuit_rows
 from .circuit_class import CircuitClassSerializer
 from .property import PropertySerializer
 from .property_type import PropertyTypeSerializer
@@ -8,7 +8,9 @@ from .property_type import PropertyTypeSerializer
 
 __all__ = [
     # circuit
+    'CIRCUIT_FIELD_COLUMNS',
     'CircuitSerializer',
+    'serialize_circuit_rows',
 
     # circuit_class
     'CircuitClassSerializer',
@@ -46,7 +46,7 @@ class CircuitClassSerializer(serpy.Serializer):
     id = serpy.Field()
     name = serpy.Field()
     member_id = serpy.Field()
-    properties = PropertySerializer(attr='properties.iterator', call=True, many=True)
+    properties = PropertySerializer(attr='get_live_properties', call=True, many=True)
     total_circuits = serpy.Field()
     total_properties = serpy.Field()
     updated = serpy.Field(attr='updated.isoformat', call=True)
@@ -35,6 +35,23 @@ DATABASES = {
     },
 }
 
+# Read replicas of the circuit DB, as a comma separated list of hosts. Reads are spread over them by the router
+PGSQLAPI_REPLICA_HOSTS = [host for host in os.getenv('PGSQLAPI_REPLICA_HOSTS', '').split(',') if host]
+for i, replica_host in enumerate(PGSQLAPI_REPLICA_HOSTS):
+    DATABASES[f'circuit_replica_{i}'] = {
+        **DATABASES['circuit'],
+        'HOST': replica_host,
+        # In tests the replicas are the same DB as the primary
+        'TEST': {'MIRROR': 'circuit'},
+    }
+CIRCUIT_READ_REPLICAS = [f'circuit_replica_{i}' for i in range(len(PGSQLAPI_REPLICA_HOSTS))]
+
+# How a replica is chosen for each read; random or round_robin
+CIRCUIT_READ_REPLICA_POLICY = os.getenv('CIRCUIT_READ_REPLICA_POLICY', 'random')
+
+# Number of seconds that reads stay on the primary circuit DB after a write, so writers read their own changes
+CIRCUIT_PRIMARY_PIN_SECONDS = float(os.getenv('CIRCUIT_PRIMARY_PIN_SECONDS', 5))
+
 DATABASE_ROUTERS = [
     'circuit.db_router.CircuitRouter',
 ]
@@ -47,6 +64,34 @@ INSTALLED_APPS = [
 USE_I18N = False
 USE_L10N = False
 
+# Number of seconds the Addresses in a Member are cached for global users. Membership does not notify this service
+# when they change, so an Address removed from a Member stays visible to its global users for up to this long
+CIRCUIT_ADDRESS_CACHE_TTL = int(os.getenv('CIRCUIT_ADDRESS_CACHE_TTL', 300))
+
+# Number of seconds an Address that the requesting User can read is remembered for their token, instead of reading it
+# from Membership
+CIRCUIT_READABLE_ADDRESS_CACHE_TTL = int(os.getenv('CIRCUIT_READABLE_ADDRESS_CACHE_TTL', 60))
+
+# Maximum number of Circuits that can be sent in one bulk request
+CIRCUIT_BULK_LIMIT = int(os.getenv('CIRCUIT_BULK_LIMIT', 1000))
+
+# Number of Circuits read from the DB cursor at a time when exporting
+CIRCUIT_EXPORT_CHUNK_SIZE = int(os.getenv('CIRCUIT_EXPORT_CHUNK_SIZE', 2000))
+
+# Number of rows of an imported file validated and copied into the DB at a time
+CIRCUIT_IMPORT_CHUNK_SIZE = int(os.getenv('CIRCUIT_IMPORT_CHUNK_SIZE', 5000))
+
+# Number of seconds the property schema of a Circuit Class is cached for. It is also cleared whenever it changes
+CIRCUIT_PROPERTY_SCHEMA_CACHE_TTL = int(os.getenv('CIRCUIT_PROPERTY_SCHEMA_CACHE_TTL', 3600))
+
+# Number of request figures that can wait for the InfluxDB writer before more are dropped, and the number of seconds
+# the figures are summed per endpoint before each batch is written
+CIRCUIT_METRICS_QUEUE_SIZE = int(os.getenv('CIRCUIT_METRICS_QUEUE_SIZE', 10000))
+CIRCUIT_METRICS_FLUSH_SECONDS = int(os.getenv('CIRCUIT_METRICS_FLUSH_SECONDS', 10))
+
+# Number of records counted before stopping when a list is requested with count=capped
+CIRCUIT_COUNT_CAP = int(os.getenv('CIRCUIT_COUNT_CAP', 10000))
+
 ORG = ORGANIZATION_URL.split('.')[0]
 
 APPLICATION_NAME = os.getenv('APPLICATION_NAME', f'{POD_NAME}_{ORG}_circuit')
@@ -0,0 +1,95 @@
+# stdlib
+from datetime import datetime, timezone
+from unittest import mock, skipUnless
+# libs
+from django.conf import settings
+from django.db import connections
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+# local
+from circuit.db_router import PRIMARY, CircuitRouter, pin_primary, reset_primary_pin
+from circuit.models import Circuit, CircuitClass
+
+REPLICAS = ['circuit_replica_a', 'circuit_replica_b']
+
+
+@override_settings(CIRCUIT_READ_REPLICAS=REPLICAS, CIRCUIT_PRIMARY_PIN_SECONDS=5)
+class CircuitRouterTest(SimpleTestCase):
+    """
+    Reads go to a replica unless the context has written recently, is in a transaction or reads a primary instance
+    """
+
+    def setUp(self):
+        self.router = CircuitRouter()
+        reset_primary_pin()
+        self.addCleanup(reset_primary_pin)
+
+    def test_reads_go_to_a_replica(self):
+        self.assertIn(self.router.db_for_read(Circuit), REPLICAS)
+
+    @override_settings(CIRCUIT_READ_REPLICAS=[])
+    def test_reads_go_to_the_primary_without_replicas(self):
+        self.assertEqual(self.router.db_for_read(Circuit), PRIMARY)
+
+    @override_settings(CIRCUIT_READ_REPLICA_POLICY='round_robin')
+    def test_round_robin_uses_every_replica_in_turn(self):
+        chosen = [self.router.db_for_read(Circuit) for _ in range(4)]
+        self.assertEqual(set(chosen), set(REPLICAS))
+        self.assertEqual(chosen[:2], chosen[2:])
+
+    def test_write_pins_reads_to_the_primary_for_the_window(self):
+        with mock.patch('circuit.db_router.time.monotonic', return_value=100.0):
+            self.assertEqual(self.router.db_for_write(Circuit), PRIMARY)
+            self.assertEqual(self.router.db_for_read(Circuit), PRIMARY)
+        with mock.patch('circuit.db_router.time.monotonic', return_value=104.9):
+            self.assertEqual(self.router.db_for_read(Circuit), PRIMARY)
+        with mock.patch('circuit.db_router.time.monotonic', return_value=105.1):
+            self.assertIn(self.router.db_for_read(Circuit), REPLICAS)
+
+    def test_pin_is_only_extended(self):
+        with mock.patch('circuit.db_router.time.monotonic', return_value=100.0):
+            pin_primary(10)
+            pin_primary(1)
+        with mock.patch('circuit.db_router.time.monotonic', return_value=109.0):
+            self.assertEqual(self.router.db_for_read(Circuit), PRIMARY)
+
+    def test_reads_in_a_transaction_go_to_the_primary(self):
+        with mock.patch.object(connections[PRIMARY], 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Circuit), PRIMARY)
+
+    def test_reads_for_a_primary_instance_go_to_the_primary(self):
+        instance = CircuitClass(name='class', member_id=1)
+        instance._state.db = PRIMARY
+        self.assertEqual(self.router.db_for_read(Circuit, instance=instance), PRIMARY)
+        instance._state.db = REPLICAS[0]
+        self.assertIn(self.router.db_for_read(Circuit, instance=instance), REPLICAS)
+
+
+@skipUnless(settings.CIRCUIT_READ_REPLICAS, 'PGSQLAPI_REPLICA_HOSTS is not set')
+class CircuitRouterReplicaTest(TransactionTestCase):
+    """
+    With a replica configured, a written Circuit is read back from the primary and later reads use the replica
+    """
+    databases = {PRIMARY, 'default', *settings.CIRCUIT_READ_REPLICAS}
+
+    def setUp(self):
+        reset_primary_pin()
+        self.addCleanup(reset_primary_pin)
+
+    def test_read_your_writes(self):
+        circuit_class = CircuitClass.objects.create(name='class', member_id=1)
+        circuit = Circuit.objects.create(
+            address_id=10,
+            circuit_class=circuit_class,
+            description='circuit',
+            install_date=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            reference_number=None,
+        )
+        objs = Circuit.objects.filter(pk=circuit.pk)
+        self.assertEqual(objs.db, PRIMARY)
+        self.assertTrue(objs.exists())
+
+        reset_primary_pin()
+        objs = Circuit.objects.filter(pk=circuit.pk)
+        self.assertIn(objs.db, settings.CIRCUIT_READ_REPLICAS)
+        # The test replicas mirror the primary, so the Circuit is visible there once the pin is gone
+        self.assertTrue(objs.exists())
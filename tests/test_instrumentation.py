@@ -0,0 +1,30 @@
+# libs
+from django.test import SimpleTestCase
+# local
+from circuit.instrumentation import _aggregate, _line
+
+
+class InfluxLineTest(SimpleTestCase):
+    """
+    Request figures are summed per endpoint and written as valid InfluxDB line protocol
+    """
+
+    def test_escaping(self):
+        line = _line(
+            'circuit_request',
+            {'endpoint': 'A b,c=d', 'empty': ''},
+            {'db_queries': 3, 'db_time_ms': 1.5, 'note': 'say "hi"'},
+            100,
+        )
+        self.assertEqual(
+            line,
+            'circuit_request,endpoint=A\\ b\\,c\\=d db_queries=3i,db_time_ms=1.5,note="say \\"hi\\"" 100',
+        )
+
+    def test_aggregate(self):
+        totals = {}
+        _aggregate(totals, 'CircuitCollection.get', 200, {'db_queries': 2, 'db_slowest_ms': 4.0})
+        _aggregate(totals, 'CircuitCollection.get', 200, {'db_queries': 3, 'db_slowest_ms': 1.0})
+        _aggregate(totals, 'CircuitCollection.get', 400, {'db_queries': 1, 'db_slowest_ms': 0.5})
+        self.assertEqual(totals[('CircuitCollection.get', 200)], {'requests': 2, 'db_queries': 5, 'db_slowest_ms': 4.0})
+        self.assertEqual(totals[('CircuitCollection.get', 400)]['requests'], 1)
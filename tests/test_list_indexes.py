@@ -0,0 +1,58 @@
+# stdlib
+from datetime import datetime, timezone
+# libs
+from django.db import connections
+from django.test import TestCase
+# local
+from circuit.management.commands.check_list_indexes import list_query_shapes, scanned_relations
+from circuit.models import Circuit, CircuitClass, Property, PropertyType
+
+MEMBER_ID = 1
+ADDRESS_IDS = range(10, 50)
+
+
+class ListIndexTest(TestCase):
+    """
+    The main list query shapes read circuit, its partitions, circuit_class and property through an index
+    """
+    databases = {'circuit', 'default'}
+
+    @classmethod
+    def setUpTestData(cls):
+        property_type = PropertyType.objects.create(name='string')
+        circuit_classes = CircuitClass.objects.bulk_create([
+            CircuitClass(name=f'class-{i}', member_id=MEMBER_ID) for i in range(20)
+        ])
+        Property.objects.bulk_create([
+            Property(circuit_class=circuit_class, key=f'key-{j}', property_type=property_type, required=False)
+            for circuit_class in circuit_classes
+            for j in range(5)
+        ])
+        address_ids = list(ADDRESS_IDS)
+        Circuit.objects.bulk_create([
+            Circuit(
+                address_id=address_ids[i % len(address_ids)],
+                circuit_class=circuit_classes[i % len(circuit_classes)],
+                customer_address_id=address_ids[(i + 1) % len(address_ids)],
+                description=f'circuit-{i}',
+                install_date=datetime(2024, 1, 1, tzinfo=timezone.utc),
+                reference_number=None,
+                service_provider_address_id=address_ids[(i + 2) % len(address_ids)],
+            )
+            for i in range(4000)
+        ])
+        cls.circuit_class = circuit_classes[0]
+
+    def setUp(self):
+        with connections['circuit'].cursor() as cursor:
+            cursor.execute('ANALYZE circuit, circuit_class, property')
+            # At this scale a sequential scan can be the cheapest plan even where an index fits. Making it the last
+            # resort means one is only left in the plan when no index can serve the shape
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_list_shapes_use_indexes(self):
+        for name, objs in list_query_shapes(ADDRESS_IDS[0], self.circuit_class, 50):
+            with self.subTest(shape=name):
+                scans = scanned_relations(objs)
+                self.assertGreater(len(scans), 0)
+                self.assertNotIn('Seq Scan', [node_type for node_type, _ in scans])
@@ -0,0 +1,75 @@
+# stdlib
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict
+# libs
+from django.conf import settings
+from django.db import connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+# local
+from circuit.models import Circuit, CircuitClass, Property, PropertyType
+from circuit.views import CircuitClassCollection, CircuitCollection
+
+MEMBER_ID = 1
+ADDRESS_ID = 10
+
+
+class ListQueryCountTest(TestCase):
+    """
+    The number of queries run by the list methods does not grow with the number of records on the page
+    """
+    databases = {'circuit', 'default'}
+
+    @classmethod
+    def setUpTestData(cls):
+        property_type = PropertyType.objects.create(name='string')
+        for i in range(10):
+            circuit_class = CircuitClass.objects.create(name=f'class-{i}', member_id=MEMBER_ID)
+            Property.objects.bulk_create([
+                Property(circuit_class=circuit_class, key=f'key-{j}', property_type=property_type, required=False)
+                for j in range(2)
+            ])
+            for j in range(3):
+                Circuit.objects.create(
+                    address_id=ADDRESS_ID,
+                    circuit_class=circuit_class,
+                    description=f'circuit-{i}-{j}',
+                    install_date=datetime(2024, 1, 1, tzinfo=timezone.utc),
+                    reference_number=None,
+                )
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = SimpleNamespace(
+            address={'id': ADDRESS_ID},
+            global_active=False,
+            id=1,
+            is_authenticated=True,
+            is_global=False,
+            member={'id': MEMBER_ID, 'self_managed': True},
+            token='test',
+        )
+
+    def _count_queries(self, view_class: type, path: str, data: Dict[str, Any]) -> int:
+        request = self.factory.get(path, data)
+        force_authenticate(request, user=self.user)
+        request.span = settings.TRACER.start_span('test')
+        with CaptureQueriesContext(connections['circuit']) as captured:
+            response = view_class.as_view()(request)
+            response.render()
+        request.span.finish()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['content']), data['limit'])
+        return len(captured)
+
+    def test_circuit_class_list(self):
+        small = self._count_queries(CircuitClassCollection, '/circuit_class/', {'limit': 2})
+        large = self._count_queries(CircuitClassCollection, '/circuit_class/', {'limit': 8})
+        self.assertEqual(small, large)
+
+    def test_circuit_list(self):
+        small = self._count_queries(CircuitCollection, '/circuit/', {'limit': 2})
+        large = self._count_queries(CircuitCollection, '/circuit/', {'limit': 20})
+        self.assertEqual(small, large)
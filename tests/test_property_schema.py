@@ -0,0 +1,37 @@
+# libs
+from django.test import SimpleTestCase
+# local
+from circuit.controllers.property_schema import (
+    INVALID_BOOLEAN,
+    INVALID_NUMERIC,
+    MISSING_KEY,
+    PropertySchema,
+    UNKNOWN_PROPERTY_TYPE,
+)
+
+
+class PropertySchemaTest(SimpleTestCase):
+    """
+    The property values of a Circuit are checked against the ids of the Property Types of its Circuit Class
+    """
+
+    def test_checks_by_type_id(self):
+        schema = PropertySchema((('flag', False, 3), ('name', False, 1), ('size', False, 2)))
+        self.assertIsNone(schema.validate({'flag': True, 'name': 'a', 'size': 2}))
+        self.assertEqual(schema.validate({'flag': 'yes'}), INVALID_BOOLEAN)
+        self.assertEqual(schema.validate({'size': '2'}), INVALID_NUMERIC)
+
+    def test_string_accepts_any_value(self):
+        schema = PropertySchema((('name', False, 1),))
+        self.assertIsNone(schema.validate({'name': 5}))
+
+    def test_unknown_type_is_rejected(self):
+        schema = PropertySchema((('colour', False, 6),))
+        self.assertEqual(schema.validate({'colour': 'red'}), UNKNOWN_PROPERTY_TYPE)
+
+    def test_missing_optional_key_is_added(self):
+        schema = PropertySchema((('name', False, 1), ('size', True, 2)))
+        properties = {'size': 1}
+        self.assertIsNone(schema.validate(properties))
+        self.assertEqual(properties, {'name': None, 'size': 1})
+        self.assertEqual(schema.validate({}), MISSING_KEY)
@@ -9,6 +9,36 @@ urlpatterns = [
         name='circuit_collection',
     ),
 
+    path(
+        'circuit/bulk/',
+        views.CircuitBulkCollection.as_view(),
+        name='circuit_bulk_collection',
+    ),
+
+    path(
+        'circuit/changes/',
+        views.CircuitChangesCollection.as_view(),
+        name='circuit_changes_collection',
+    ),
+
+    path(
+        'circuit/export/',
+        views.CircuitExportCollection.as_view(),
+        name='circuit_export_collection',
+    ),
+
+    path(
+        'circuit/import/',
+        views.CircuitImportCollection.as_view(),
+        name='circuit_import_collection',
+    ),
+
+    path(
+        'circuit/statistics/',
+        views.CircuitStatisticsCollection.as_view(),
+        name='circuit_statistics_collection',
+    ),
+
     path(
         'circuit/<int:pk>/',
         views.CircuitResource.as_view(),
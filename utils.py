@@ -1,36 +1,273 @@
 # stdlib
-from typing import List
+import base64
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
 # libs
 from cloudcix.api.membership import Membership
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Model, Q, QuerySet
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
 from jaeger_client import Span
 from rest_framework.request import Request
+from rest_framework.response import Response
 # local
+from circuit.instrumentation import upstream_call
 
+# Number of Addresses requested from Membership per page
+ADDRESS_PAGE_LIMIT = 50
+# Maximum number of pages that are requested from Membership at the same time
+ADDRESS_PAGE_WORKERS = 8
 
-def get_addresses_in_member(request: Request, span: Span) -> List[int]:
+
+def _member_addresses_cache_key(member_id: int) -> str:
+    """
+    Generate the cache key used to store the Address ids in a Member
     """
-    Given a token, make requests to Membership to fetch all the Addresses in the Member that the token is from
+    return f'circuit_member_addresses_{member_id}'
+
+
+def _list_address_page(request: Request, member_id: int, page: int, span: Span) -> Dict[str, Any]:
+    """
+    Fetch a single page of the Addresses in a Member from Membership
     """
     params = {
-        'page': 0,
-        'limit': 50,
-        'search[member_id]': request.user.member['id'],
+        'page': page,
+        'limit': ADDRESS_PAGE_LIMIT,
+        'search[member_id]': member_id,
     }
-    response = Membership.address.list(
-        token=request.user.token,
-        params=params,
-        span=span,
-    )
-    address_ids = [a['id'] for a in response.json()['content']]
-
-    total_records = response.json()['_metadata']['total_records']
-    while len(address_ids) < total_records:  # pragma: no cover
-        params['page'] += 1
+    with upstream_call():
         response = Membership.address.list(
             token=request.user.token,
             params=params,
             span=span,
         )
-        address_ids.extend([a['id'] for a in response.json()['content']])
+    return response.json()
+
 
+def get_addresses_in_member(request: Request, span: Span) -> List[int]:
+    """
+    Given a token, make requests to Membership to fetch all the Addresses in the Member that the token is from.
+    The result is cached per Member for `CIRCUIT_ADDRESS_CACHE_TTL` seconds. On a cache miss the first page is
+    fetched to find `total_records`, and the remaining pages are then fetched concurrently.
+
+    Addresses are managed in Membership, which does not notify this service when they change, so the cache mostly
+    relies on its TTL: an Address removed from the Member stays visible until the entry expires. The one change that
+    can be detected here is a new Address of the requesting User that is missing from the cached list, in which case
+    the list is fetched again.
+    """
+    member_id = request.user.member['id']
+    key = _member_addresses_cache_key(member_id)
+    address_ids = cache.get(key)
+    if address_ids is None:
+        span.set_tag('address_cache', 'miss')
+    elif request.user.address['id'] not in address_ids:
+        # The requesting User's Address was added to the Member after the list was cached, so it is refetched and
+        # the cached entry replaced
+        span.set_tag('address_cache', 'stale')
+    else:
+        span.set_tag('address_cache', 'hit')
+        return address_ids
+
+    data = _list_address_page(request, member_id, 0, span)
+    address_ids = [a['id'] for a in data['content']]
+
+    total_records = data['_metadata']['total_records']
+    pages = range(1, -(-total_records // ADDRESS_PAGE_LIMIT))
+    if len(pages) > 0:  # pragma: no cover
+        with ThreadPoolExecutor(max_workers=min(ADDRESS_PAGE_WORKERS, len(pages))) as executor:
+            # Run each page in a copy of this context so the calls are recorded by the active instrumentation
+            futures = [
+                executor.submit(copy_context().run, _list_address_page, request, member_id, page, span)
+                for page in pages
+            ]
+            for future in futures:
+                address_ids.extend([a['id'] for a in future.result()['content']])
+
+    cache.set(key, address_ids, getattr(settings, 'CIRCUIT_ADDRESS_CACHE_TTL', 300))
     return address_ids
+
+
+def get_address_filtering(request: Request, span: Span, prefix: str = '') -> Q:
+    """
+    Build the filter that limits Circuit records to the ones the requesting User can see, i.e. the ones where their
+    Address (or any Address in their Member for global-active Users) is the owner, customer or service provider
+    :param prefix: The lookup path to the Circuit from the model being filtered, e.g. `circuit__`
+    """
+    # A global-active user can list all circuits in their member
+    # party_address_ids holds all three Address columns, so a single GIN index lookup replaces a three-way OR
+    if request.user.is_global and request.user.global_active:
+        addresses = get_addresses_in_member(request, span)
+        return Q(**{f'{prefix}party_address_ids__overlap': addresses})
+    return Q(**{f'{prefix}party_address_ids__contains': [request.user.address['id']]})
+
+
+def invalidate_addresses_in_member(member_id: int):
+    """
+    Remove the cached Address ids for a Member so that the next request fetches them from Membership again.
+    Nothing in this service changes the Addresses of a Member, so this is for callers that know the entry is out of
+    date, such as the benchmark command measuring a cold cache.
+    """
+    cache.delete(_member_addresses_cache_key(member_id))
+
+
+def _get_ordering_value(obj: Union[Model, Dict[str, Any]], field: str) -> Any:
+    """
+    Follow an ordering field, which may span relations (e.g. `circuit_class__name`), to its value on an object,
+    or read it from a row returned by `.values()`
+    """
+    if isinstance(obj, dict):
+        value = obj[field]
+    else:
+        value = obj
+        for attr in field.split('__'):
+            if value is None:
+                return None
+            value = getattr(value, attr)
+    if isinstance(value, date):
+        value = value.isoformat()
+    return value
+
+
+def _is_nullable(model: type, field: str) -> bool:
+    """
+    Check if an ordering field, which may span relations, can contain NULL values
+    """
+    for attr in field.split('__'):
+        model_field = model._meta.get_field(attr)
+        if model_field.null:
+            return True
+        model = model_field.related_model
+    return False
+
+
+def encode_cursor(obj: Union[Model, Dict[str, Any]], order: str) -> str:
+    """
+    Build the opaque `after` token that points to the position just after the given object in the given ordering.
+    The object can also be a row returned by `.values()` that includes the ordering field and `id`.
+    """
+    value = _get_ordering_value(obj, order.lstrip('-'))
+    pk = obj['id'] if isinstance(obj, dict) else obj.pk
+    raw = json.dumps([value, pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: str) -> Tuple[Any, int]:
+    """
+    Read the ordering value and id back from an `after` token
+    :raises ValueError: If the token is not one generated by `encode_cursor`
+    """
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if isinstance(value, (dict, list)) or not isinstance(pk, int):
+        raise ValueError('Invalid cursor')
+    return value, pk
+
+
+def paginate_by_cursor(objs: QuerySet, order: str, after: str, limit: int) -> Tuple[List[Model], Optional[str]]:
+    """
+    Keyset pagination. Seek past the position encoded in `after` (or start at the beginning if it is empty) using
+    the ordering column with `id` as a tie break, instead of an OFFSET that has to walk every earlier row.
+    PostgreSQL sorts NULLs last in ascending order and first in descending order, which the seek condition follows.
+    :raises ValueError: If `after` is not a valid token
+    :return: The page of objects and the token for the next page, which is None when there are no more records
+    """
+    descending = order.startswith('-')
+    field = order.lstrip('-')
+    objs = objs.order_by(order, '-id' if descending else 'id')
+
+    if after:
+        value, pk = decode_cursor(after)
+        nullable = _is_nullable(objs.model, field)
+        if value is None:
+            if descending:
+                seek = Q(**{f'{field}__isnull': True, 'id__lt': pk}) | Q(**{f'{field}__isnull': False})
+            else:
+                seek = Q(**{f'{field}__isnull': True, 'id__gt': pk})
+        else:
+            # The redundant range condition on its own gives the planner a start point in the index on the column
+            if descending:
+                seek = Q(**{f'{field}__lte': value}) & (
+                    Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+                )
+            else:
+                seek = Q(**{f'{field}__gte': value}) & (
+                    Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk})
+                )
+                if nullable:
+                    seek |= Q(**{f'{field}__isnull': True})
+        objs = objs.filter(seek)
+
+    page = list(objs[:limit + 1])
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_cursor(page[-1], order)
+    return page, None
+
+
+# Ways that the total number of records in a list can be counted
+COUNT_STRATEGIES = ('exact', 'capped', 'estimate')
+
+
+def count_records(objs: QuerySet, strategy: str) -> Union[int, str]:
+    """
+    Count the records in a filtered list using the given strategy
+    - exact: a full COUNT of the matching records
+    - capped: stop counting after `CIRCUIT_COUNT_CAP` records, and return e.g. "10000+" if there are more than that
+    - estimate: the number of rows the PostgreSQL planner expects the query to return, which needs no scan at all
+    """
+    objs = objs.order_by()
+    if strategy == 'capped':
+        cap = getattr(settings, 'CIRCUIT_COUNT_CAP', 10000)
+        total = objs[:cap + 1].count()
+        return f'{cap}+' if total > cap else total
+    if strategy == 'estimate':
+        plan = json.loads(objs.explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+    return objs.count()
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Build a quoted ETag from the values that the content of a response depends on
+    """
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def is_conditional(request: Request) -> bool:
+    """
+    Check if a GET request sent any validators to be checked against the current content
+    """
+    return bool(request.META.get('HTTP_IF_NONE_MATCH') or request.META.get('HTTP_IF_MODIFIED_SINCE'))
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    Check the conditional headers of a GET request against the validators of the current content.
+    If-None-Match takes precedence over If-Modified-Since, as in RFC 9110.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags or etag.strip('"') in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    if if_modified_since is not None and last_modified is not None:
+        return int(last_modified.timestamp()) <= if_modified_since
+    return False
+
+
+def set_validators(response: Response, etag: Optional[str], last_modified: Optional[datetime]) -> Response:
+    """
+    Add the ETag and Last-Modified headers to a response, for the validators that were generated
+    """
+    if etag is not None:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
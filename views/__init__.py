@@ -1,5 +1,10 @@
 # local
 from .circuit import CircuitCollection, CircuitResource
+from .circuit_bulk import CircuitBulkCollection
+from .circuit_changes import CircuitChangesCollection
+from .circuit_export import CircuitExportCollection
+from .circuit_import import CircuitImportCollection
+from .circuit_statistics import CircuitStatisticsCollection
 from .circuit_class import CircuitClassCollection, CircuitClassResource
 from .property_type import PropertyTypeCollection
 from .property_value import PropertyValueCollection
@@ -8,6 +13,11 @@ __all__ = [
     # Circuit
     'CircuitCollection',
     'CircuitResource',
+    'CircuitBulkCollection',
+    'CircuitChangesCollection',
+    'CircuitExportCollection',
+    'CircuitImportCollection',
+    'CircuitStatisticsCollection',
 
     # Circuit Class
     'CircuitClassCollection',
@@ -5,23 +5,38 @@ Management of Circuit
 from datetime import datetime
 # libs
 from cloudcix_rest.exceptions import Http400, Http404
-from cloudcix_rest.views import APIView
 from django.conf import settings
 from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.response import Response
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db.models import Count, Max
 # local
 from circuit.controllers.circuit import (
     CircuitCreateController,
     CircuitListController,
     CircuitUpdateController,
 )
-from circuit.models import Circuit
+from circuit.db_router import PRIMARY
+from circuit.instrumentation import APIView, instrumented_span
+from circuit.models import Circuit, CircuitClass
 from circuit.permissions.circuit import Permissions
-from circuit.serializers import CircuitSerializer
-from circuit.utils import get_addresses_in_member
+from circuit.serializers import (
+    CIRCUIT_FIELD_COLUMNS,
+    CircuitClassSerializer,
+    CircuitSerializer,
+    serialize_circuit_rows,
+)
+from circuit.utils import (
+    COUNT_STRATEGIES,
+    count_records,
+    get_address_filtering,
+    is_conditional,
+    is_not_modified,
+    make_etag,
+    paginate_by_cursor,
+    set_validators,
+)
 
 
 __all__ = [
@@ -40,33 +55,51 @@ class CircuitCollection(APIView):
         summary: Retrieve a list of Circuit records
         description: |
             Retrieve a list of Circuit records for the requesting User's Member.
+
+            The response has an ETag header if the records are counted exactly or validators were sent. Send it back
+            in If-None-Match to receive a 304 response with no content if the list has not changed.
+
+            Send the `after` parameter to page with a cursor instead of `page`. Send it empty for the first page and
+            then send the `next` value from the previous response's metadata, which is null once every record has
+            been returned. In this mode `total_records` is only calculated when `count` is also sent.
+
+            Send `count` to choose how `total_records` is calculated. `exact` (the default) counts every matching
+            record, `capped` stops counting at a limit and returns e.g. "10000+" when there are more records, and
+            `estimate` returns the database's estimate of the number of records. The strategy that was used is
+            returned as `count_strategy` in the metadata.
+
+            Send `fields` as a comma separated list of field names to receive only those fields of each Circuit, e.g.
+            `fields=id,reference,reference_number,address_id`. The nested Circuit Class is only sent when
+            `expand=circuit_class` is also sent. Without either parameter every field and the Circuit Class are sent.
         responses:
             200:
                 description: A list of Circuit records, filtered and ordered by the User
+            304:
+                description: The list has not changed since the sent validators were generated
             400: {}
         """
         tracer = settings.TRACER
 
-        with tracer.start_span('validating_controller', child_of=request.span) as span:
+        with instrumented_span(tracer, 'validating_controller', child_of=request.span) as span:
             controller = CircuitListController(data=request.GET, request=request, span=span)
             # By validating the controller we will generate the filters
             controller.is_valid()
+
+            # Sparse fieldsets read only the requested columns, and the Circuit Class only when it is expanded
+            projection = 'fields' in request.GET or 'expand' in request.GET
+            fields = list(CIRCUIT_FIELD_COLUMNS)
+            if 'fields' in request.GET:
+                fields = [field.strip() for field in request.GET['fields'].split(',') if field.strip()]
+                if len(fields) == 0 or any(field not in CIRCUIT_FIELD_COLUMNS for field in fields):
+                    return Http400(error_code='circuit_circuit_list_004')
+            expand = {field.strip() for field in request.GET.get('expand', '').split(',') if field.strip()}
+            if not expand <= {'circuit_class'}:
+                return Http400(error_code='circuit_circuit_list_005')
+            with_circuit_class = not projection or 'circuit_class' in expand
+
         # Now get a list of Circuit records using the filters
-        with tracer.start_span('get_objects', child_of=request.span):
-            # A global-active user can list all projects in their member
-            if request.user.is_global and request.user.global_active:
-                addresses = get_addresses_in_member(request, span)
-                address_filtering = (
-                    Q(address_id__in=addresses) |
-                    Q(customer_address_id__in=addresses) |
-                    Q(service_provider_address_id__in=addresses)
-                )
-            else:
-                address_filtering = (
-                    Q(address_id=request.user.address['id']) |
-                    Q(customer_address_id=request.user.address['id']) |
-                    Q(service_provider_address_id=request.user.address['id'])
-                )
+        with instrumented_span(tracer, 'get_objects', child_of=request.span) as span:
+            address_filtering = get_address_filtering(request, span)
             try:
                 # Search and exclude can be empty dicts so there's no need to check
                 # if they're populated
@@ -79,32 +112,121 @@ class CircuitCollection(APIView):
                     **controller.cleaned_data['exclude'],
                 ).order_by(
                     controller.cleaned_data['order'],
+                    # id breaks ties so pages are stable, in the same direction so the indexes can be read backwards
+                    '-id' if controller.cleaned_data['order'].startswith('-') else 'id',
                 )
 
             except (ValueError, ValidationError):
                 return Http400(error_code='circuit_circuit_list_001')
 
-        with tracer.start_span('generating_metadata', child_of=request.span):
-            total_records = objs.count()
+        with instrumented_span(tracer, 'checking_validators', child_of=request.span):
+            # Cursor mode is meant for walking the whole list, so only count the records when asked to
+            cursor_mode = 'after' in request.GET
+            count_strategy = request.GET.get('count', None if cursor_mode else 'exact')
+            if count_strategy is not None and count_strategy not in COUNT_STRATEGIES:
+                return Http400(error_code='circuit_circuit_list_003')
+
+            # Generating the validators reads every matching record, so it is only done when the request sent
+            # validators, or when the records are counted exactly anyway and the count can share the read
+            totals = None
+            etag = None
+            last_modified = None
+            if count_strategy == 'exact' or is_conditional(request):
+                # The list changes when a Circuit in it, or the Circuit Class nested in one, is created, updated or
+                # deleted, or when the totals of a nested Circuit Class change. Only the ETag validates the list: the
+                # latest updated timestamp of the matching Circuits does not move when one is deleted or stops
+                # matching, and the number of them is needed to notice that
+                if with_circuit_class:
+                    totals = objs.order_by().aggregate(
+                        last_updated=Max('updated'),
+                        class_updated=Max('circuit_class__updated'),
+                        total=Count('id'),
+                    )
+                    totals_version = CircuitClass.objects.totals_version(objs.order_by().values('circuit_class_id'))
+                    etag = make_etag(
+                        request.GET.urlencode(),
+                        totals['total'],
+                        totals['last_updated'],
+                        totals['class_updated'],
+                        totals_version,
+                    )
+                else:
+                    totals = objs.order_by().aggregate(last_updated=Max('updated'), total=Count('id'))
+                    etag = make_etag(request.GET.urlencode(), totals['total'], totals['last_updated'])
+                if is_not_modified(request, etag, last_modified):
+                    return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+        with instrumented_span(tracer, 'generating_metadata', child_of=request.span):
             page = controller.cleaned_data['page']
             order = controller.cleaned_data['order']
             limit = controller.cleaned_data['limit']
             warnings = controller.warnings
 
-            metadata = {
-                'page': page,
-                'limit': limit,
-                'order': order,
-                'total_records': total_records,
-                'warnings': warnings,
-            }
-            objs = objs[page * limit:(page + 1) * limit]
-
-        with tracer.start_span('serializing_data', child_of=request.span) as span:
-            span.set_tag('num_objects', objs.count())
-            data = CircuitSerializer(instance=objs, many=True).data
+            total_records = None
+            if count_strategy == 'exact':
+                # Already counted for the validators
+                total_records = totals['total']
+            elif count_strategy is not None:
+                total_records = count_records(objs, count_strategy)
+
+            if projection:
+                columns = {CIRCUIT_FIELD_COLUMNS[field] for field in fields}
+                # id and the ordering field are needed for the cursor, and circuit_class_id to expand the Circuit Class
+                columns |= {'id', order.lstrip('-')}
+                if with_circuit_class:
+                    columns.add('circuit_class_id')
+                objs = objs.select_related(None).values(*columns)
+
+            if cursor_mode:
+                try:
+                    objs, next_cursor = paginate_by_cursor(objs, order, request.GET['after'], limit)
+                except ValueError:
+                    return Http400(error_code='circuit_circuit_list_002')
+
+                metadata = {
+                    'after': request.GET['after'],
+                    'count_strategy': count_strategy,
+                    'limit': limit,
+                    'next': next_cursor,
+                    'order': order,
+                    'total_records': total_records,
+                    'warnings': warnings,
+                }
+            else:
+                metadata = {
+                    'count_strategy': count_strategy,
+                    'page': page,
+                    'limit': limit,
+                    'order': order,
+                    'total_records': total_records,
+                    'warnings': warnings,
+                }
+                objs = list(objs[page * limit:(page + 1) * limit])
+
+        with instrumented_span(tracer, 'prefetching_related', child_of=request.span):
+            circuit_classes = None
+            if not projection:
+                # Load the nested Circuit Class properties for the whole page at once instead of per row
+                CircuitClass.objects.prefetch_totals(obj.circuit_class for obj in objs)
+            elif with_circuit_class:
+                # Serialize each Circuit Class on the page once, however many Circuits it is nested in
+                circuit_classes = {
+                    circuit_class.pk: CircuitClassSerializer(instance=circuit_class).data
+                    for circuit_class in CircuitClass.objects.prefetch_totals(
+                        CircuitClass.objects.prefetch_related(None).filter(
+                            pk__in={row['circuit_class_id'] for row in objs},
+                        ),
+                    )
+                }
+
+        with instrumented_span(tracer, 'serializing_data', child_of=request.span) as span:
+            span.set_tag('num_objects', len(objs))
+            if projection:
+                data = serialize_circuit_rows(objs, fields, circuit_classes)
+            else:
+                data = CircuitSerializer(instance=objs, many=True).data
 
-        return Response({'content': data, '_metadata': metadata})
+        return set_validators(Response({'content': data, '_metadata': metadata}), etag, last_modified)
 
     def post(self, request: Request) -> Response:
         """
@@ -122,23 +244,25 @@ class CircuitCollection(APIView):
         tracer = settings.TRACER
 
         # Have Permission checks as early as possible
-        with tracer.start_span('checking_permissions', child_of=request.span):
+        with instrumented_span(tracer, 'checking_permissions', child_of=request.span):
             err = Permissions.create(request)
             if err is not None:
                 return err
 
-        with tracer.start_span('validating_controller', child_of=request.span) as span:
+        with instrumented_span(tracer, 'validating_controller', child_of=request.span) as span:
             controller = CircuitCreateController(data=request.data, request=request, span=span)
             if not controller.is_valid():
                 return Http400(errors=controller.errors)
 
-        with tracer.start_span('saving_object', child_of=request.span):
+        with instrumented_span(tracer, 'saving_object', child_of=request.span):
             controller.instance.address_id = request.user.address['id']
             controller.instance.save()
             # Refresh after saving to add refernece_number generated by trigger to response data
             controller.instance.refresh_from_db()
+            # The totals of the Circuit Class were moved by the insert
+            controller.instance.circuit_class.refresh_counters()
 
-        with tracer.start_span('serializing_data', child_of=request.span):
+        with instrumented_span(tracer, 'serializing_data', child_of=request.span):
             data = CircuitSerializer(instance=controller.instance).data
 
         return Response({'content': data}, status=status.HTTP_201_CREATED)
@@ -156,6 +280,9 @@ class CircuitResource(APIView):
         description: |
             Attempt to read a Circuit record by the given `pk`, returning a 404 if it does not exist.
 
+            The response has an ETag header. Send it back in If-None-Match to receive a 304 response with no
+            content if the Circuit has not changed.
+
         path_params:
             pk:
                 description: The id of the Circuit record to be read.
@@ -163,27 +290,43 @@ class CircuitResource(APIView):
         responses:
             200:
                 description: Circuit record was read successfully
+            304:
+                description: Circuit record has not changed since the sent validators were generated
             403: {}
             404: {}
         """
         tracer = settings.TRACER
 
-        with tracer.start_span('retrieving_request_object', child_of=request.span):
+        with instrumented_span(tracer, 'retrieving_request_object', child_of=request.span):
             try:
                 obj = Circuit.objects.get(id=pk)
             except Circuit.DoesNotExist:
                 return Http404(error_code='circuit_circuit_read_001')
 
         # Check perms for the user and object
-        with tracer.start_span('checking_permissions', child_of=request.span):
+        with instrumented_span(tracer, 'checking_permissions', child_of=request.span):
             err = Permissions.read(request, obj, request.span)
             if err is not None:
                 return err
 
-        with tracer.start_span('serializing_data', child_of=request.span):
+        with instrumented_span(tracer, 'checking_validators', child_of=request.span):
+            # The totals of the nested Circuit Class are not timestamped, so only the ETag validates the Circuit
+            circuit_class = obj.circuit_class
+            etag = make_etag(
+                obj.pk,
+                obj.updated,
+                circuit_class.updated,
+                circuit_class.total_circuits,
+                circuit_class.total_properties,
+            )
+            last_modified = None
+            if is_not_modified(request, etag, last_modified):
+                return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+        with instrumented_span(tracer, 'serializing_data', child_of=request.span):
             data = CircuitSerializer(instance=obj).data
 
-        return Response({'content': data})
+        return set_validators(Response({'content': data}), etag, last_modified)
 
     def put(self, request: Request, pk: int, partial: bool = False) -> Response:
         """
@@ -203,13 +346,14 @@ class CircuitResource(APIView):
         """
         tracer = settings.TRACER
 
-        with tracer.start_span('retrieving_requested_object', child_of=request.span):
+        with instrumented_span(tracer, 'retrieving_requested_object', child_of=request.span):
             try:
-                obj = Circuit.objects.get(id=pk, address_id=request.user.address['id'])
+                # Loaded from the primary, as every column is written back from it
+                obj = Circuit.objects.using(PRIMARY).get(id=pk, address_id=request.user.address['id'])
             except Circuit.DoesNotExist:
                 return Http404(error_code='circuit_circuit_update_001')
 
-        with tracer.start_span('validating_controller', child_of=request.span) as span:
+        with instrumented_span(tracer, 'validating_controller', child_of=request.span) as span:
             controller = CircuitUpdateController(
                 instance=obj,
                 data=request.data,
@@ -220,10 +364,12 @@ class CircuitResource(APIView):
             if not controller.is_valid():
                 return Http400(errors=controller.errors)
 
-        with tracer.start_span('saving_object', child_of=request.span):
+        with instrumented_span(tracer, 'saving_object', child_of=request.span):
             controller.instance.save()
+            # The totals of the Circuit Class were moved if the Circuit was moved into it
+            controller.instance.circuit_class.refresh_counters()
 
-        with tracer.start_span('serializing_data', child_of=request.span):
+        with instrumented_span(tracer, 'serializing_data', child_of=request.span):
             data = CircuitSerializer(instance=controller.instance).data
 
         return Response({'content': data})
@@ -255,13 +401,14 @@ class CircuitResource(APIView):
 
         tracer = settings.TRACER
 
-        with tracer.start_span('retrieving_request_object', child_of=request.span):
+        with instrumented_span(tracer, 'retrieving_request_object', child_of=request.span):
             try:
-                obj = Circuit.objects.get(id=pk, address_id=request.user.address['id'])
+                # Loaded from the primary, as every column is written back from it
+                obj = Circuit.objects.using(PRIMARY).get(id=pk, address_id=request.user.address['id'])
             except Circuit.DoesNotExist:
                 return Http404(error_code='circuit_circuit_delete_001')
 
-        with tracer.start_span('saving_object', child_of=request.span):
+        with instrumented_span(tracer, 'saving_object', child_of=request.span):
             obj.deleted = datetime.now()
             obj.save()
 
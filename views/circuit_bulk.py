@@ -0,0 +1,240 @@
+"""
+Management of Circuit records in bulk
+"""
+# stdlib
+from typing import Any, Dict, List, Tuple
+# libs
+from cloudcix_rest.exceptions import Http400
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.functions import Now
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+# local
+from circuit.controllers.address_validation import prefetch_readable_addresses
+from circuit.controllers.circuit import (
+    CircuitBulkUpdateController,
+    CircuitCreateController,
+    CircuitListController,
+)
+from circuit.instrumentation import APIView, instrumented_span
+from circuit.models import Circuit
+from circuit.permissions.circuit import Permissions
+
+
+__all__ = [
+    'CircuitBulkCollection',
+]
+
+
+class CircuitBulkCollection(APIView):
+    """
+    Handles methods regarding batches of Circuit records
+    """
+
+    def post(self, request: Request) -> Response:
+        """
+        summary: Create a batch of new Circuit records
+
+        description: |
+            Create a batch of new Circuit records in the requesting User's Member. The body is an array of objects,
+            each of which is validated in the same way as a request to create a single Circuit.
+
+            The valid items are created together, and the response contains the `id` and generated
+            `reference_number` of each created Circuit along with the index of the item it was created from.
+            The errors for each invalid item are returned in `errors`, keyed by the index of the item.
+
+        responses:
+            201:
+                description: The valid Circuit records in the batch were created successfully
+            400: {}
+            403: {}
+        """
+        tracer = settings.TRACER
+
+        # Have Permission checks as early as possible
+        with instrumented_span(tracer, 'checking_permissions', child_of=request.span):
+            err = Permissions.create(request)
+            if err is not None:
+                return err
+
+        with instrumented_span(tracer, 'validating_controllers', child_of=request.span) as span:
+            items = request.data
+            if not isinstance(items, list) or len(items) == 0:
+                return Http400(error_code='circuit_circuit_bulk_create_101')
+            if len(items) > getattr(settings, 'CIRCUIT_BULK_LIMIT', 1000):
+                return Http400(error_code='circuit_circuit_bulk_create_102')
+            if not all(isinstance(item, dict) for item in items):
+                return Http400(error_code='circuit_circuit_bulk_create_103')
+
+            # Each distinct Circuit Class and Address is only looked up once for the whole batch
+            lookups: Dict[Tuple[str, int], Any] = {}
+            # Check every Address in the batch together rather than one Circuit at a time
+            prefetch_readable_addresses(request, span, items, lookups)
+            errors: Dict[int, Any] = {}
+            indices: List[int] = []
+            instances: List[Circuit] = []
+            for index, item in enumerate(items):
+                controller = CircuitCreateController(data=item, request=request, span=span, lookups=lookups)
+                if not controller.is_valid():
+                    errors[index] = controller.errors
+                    continue
+                controller.instance.address_id = request.user.address['id']
+                indices.append(index)
+                instances.append(controller.instance)
+
+            if len(instances) == 0:
+                return Http400(errors=errors)
+
+        with instrumented_span(tracer, 'saving_objects', child_of=request.span) as span:
+            span.set_tag('num_objects', len(instances))
+            with transaction.atomic(using='circuit'):
+                created = Circuit.objects.bulk_create(instances)
+                # The reference_number is generated by a trigger, so read them back in one query
+                reference_numbers = dict(
+                    Circuit.objects.filter(
+                        pk__in=[obj.pk for obj in created],
+                    ).order_by().values_list('pk', 'reference_number'),
+                )
+
+        with instrumented_span(tracer, 'serializing_data', child_of=request.span):
+            data = [
+                {
+                    'id': obj.pk,
+                    'index': index,
+                    'reference': obj.reference,
+                    'reference_number': reference_numbers[obj.pk],
+                }
+                for index, obj in zip(indices, created)
+            ]
+
+        return Response({'content': data, 'errors': errors}, status=status.HTTP_201_CREATED)
+
+    def delete(self, request: Request) -> Response:
+        """
+        summary: Delete a batch of Circuit records
+
+        description: |
+            Delete the Circuit records in the requesting User's Address that are either listed by id in the `ids`
+            array in the body, or that match the search filters sent as query parameters, in the same format as the
+            list of Circuit records. When both are sent a Circuit must match both to be deleted.
+
+            The Circuits are deleted with a single statement and the number of deleted Circuits is returned.
+
+        responses:
+            200:
+                description: The matching Circuit records were deleted successfully
+            400: {}
+        """
+        tracer = settings.TRACER
+
+        with instrumented_span(tracer, 'validating_controller', child_of=request.span) as span:
+            controller = CircuitListController(data=request.GET, request=request, span=span)
+            # By validating the controller we will generate the filters
+            controller.is_valid()
+
+            ids = request.data.get('ids', None) if isinstance(request.data, dict) else None
+            if ids is not None:
+                if not isinstance(ids, list):
+                    return Http400(error_code='circuit_circuit_bulk_delete_101')
+                try:
+                    ids = [int(pk) for pk in ids]
+                except (TypeError, ValueError):
+                    return Http400(error_code='circuit_circuit_bulk_delete_101')
+            elif len(controller.cleaned_data['search']) == 0:
+                # Deleting every Circuit in the Address has to be asked for explicitly with a filter
+                return Http400(error_code='circuit_circuit_bulk_delete_102')
+
+        with instrumented_span(tracer, 'get_objects', child_of=request.span):
+            try:
+                objs = Circuit.objects.filter(
+                    address_id=request.user.address['id'],
+                    **controller.cleaned_data['search'],
+                ).exclude(
+                    **controller.cleaned_data['exclude'],
+                )
+                if ids is not None:
+                    objs = objs.filter(id__in=ids)
+            except (ValueError, ValidationError):
+                return Http400(error_code='circuit_circuit_bulk_delete_103')
+
+        with instrumented_span(tracer, 'saving_objects', child_of=request.span) as span:
+            deleted = objs.order_by().update(deleted=Now(), updated=Now())
+            span.set_tag('num_objects', deleted)
+
+        return Response({'content': {'deleted': deleted}})
+
+    def patch(self, request: Request) -> Response:
+        """
+        summary: Update a batch of Circuit records
+
+        description: |
+            Update every Circuit record in the requesting User's Address that matches the search filters sent as query
+            parameters, in the same format as the list of Circuit records. At least one filter must be sent.
+
+            The body contains the fields to set, which can only be `bandwidth`, `decommission_date`, `group_name`,
+            `hand_off_point` and `reference`. Each sent field is set to the same value on every matching Circuit, and a
+            field sent as null is cleared. When `decommission_date` is sent, Circuits installed after it are left
+            unchanged and counted in `conflicts`.
+
+            The Circuits are updated with a single statement. Send `dry_run=true` to receive the counts without
+            updating anything.
+
+        responses:
+            200:
+                description: The matching Circuit records were updated successfully, or would be for a dry run
+            400: {}
+        """
+        tracer = settings.TRACER
+
+        with instrumented_span(tracer, 'validating_controller', child_of=request.span) as span:
+            controller = CircuitListController(data=request.GET, request=request, span=span)
+            # By validating the controller we will generate the filters
+            controller.is_valid()
+            if len(controller.cleaned_data['search']) == 0:
+                # Updating every Circuit in the Address has to be asked for explicitly with a filter
+                return Http400(error_code='circuit_circuit_bulk_update_102')
+
+            fields = CircuitBulkUpdateController.Meta.validation_order
+            data = request.data
+            if not isinstance(data, dict) or len(data) == 0 or any(key not in fields for key in data):
+                return Http400(error_code='circuit_circuit_bulk_update_101')
+            patch_controller = CircuitBulkUpdateController(data=data, request=request, partial=True, span=span)
+            if not patch_controller.is_valid():
+                return Http400(errors=patch_controller.errors)
+            patch = {key: value for key, value in patch_controller.cleaned_data.items() if key in data}
+            dry_run = request.GET.get('dry_run', 'false').lower() in ('true', '1')
+
+        with instrumented_span(tracer, 'get_objects', child_of=request.span):
+            try:
+                objs = Circuit.objects.filter(
+                    address_id=request.user.address['id'],
+                    **controller.cleaned_data['search'],
+                ).exclude(
+                    **controller.cleaned_data['exclude'],
+                ).order_by()
+                conflicting = objs.none()
+                if patch.get('decommission_date') is not None:
+                    conflicting = objs.filter(install_date__gt=patch['decommission_date'])
+                    objs = objs.exclude(install_date__gt=patch['decommission_date'])
+                conflicts = conflicting.count()
+            except (ValueError, ValidationError):
+                return Http400(error_code='circuit_circuit_bulk_update_103')
+
+        with instrumented_span(tracer, 'saving_objects', child_of=request.span) as span:
+            span.set_tag('dry_run', dry_run)
+            if dry_run:
+                matched = objs.count()
+                updated = 0
+            else:
+                matched = updated = objs.update(**patch, updated=Now())
+            span.set_tag('num_objects', updated)
+
+        return Response({'content': {
+            'conflicts': conflicts,
+            'dry_run': dry_run,
+            'matched': matched,
+            'updated': updated,
+        }})
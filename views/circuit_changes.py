@@ -0,0 +1,106 @@
+"""
+Change feed of Circuit records
+"""
+# stdlib
+# libs
+from cloudcix_rest.exceptions import Http400
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models.expressions import RawSQL
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+# local
+from circuit.controllers.circuit import CircuitListController
+from circuit.instrumentation import APIView, instrumented_span
+from circuit.models import Circuit, CircuitClass
+from circuit.serializers import CircuitSerializer
+from circuit.utils import encode_cursor, get_address_filtering, paginate_by_cursor
+
+
+__all__ = [
+    'CircuitChangesCollection',
+]
+
+
+class CircuitChangesCollection(APIView):
+    """
+    Handles reading the Circuit records that have changed since a watermark
+    """
+
+    def get(self, request: Request) -> Response:
+        """
+        summary: Retrieve the Circuit records changed since a watermark
+
+        description: |
+            Retrieve the Circuit records visible to the requesting User, in the same way as the list of Circuit
+            records, that were created, updated or deleted since the sent `since` watermark, oldest change first.
+            Send `since` empty to start from the beginning.
+
+            Deleted Circuits are included, with `deleted` set to the time they were deleted. Changes are ordered by
+            the transaction that wrote them, and a Circuit appears once for its latest change.
+
+            The response metadata contains the `watermark` to send as `since` in the next request, and `more`, which is
+            true when there are more changes to read straight away. Changes are held back until every transaction that
+            started before them has finished, so none are skipped.
+
+        responses:
+            200:
+                description: The changed Circuit records, oldest change first
+            400: {}
+        """
+        tracer = settings.TRACER
+
+        with instrumented_span(tracer, 'validating_controller', child_of=request.span) as span:
+            controller = CircuitListController(data=request.GET, request=request, span=span)
+            # By validating the controller we will generate the filters
+            controller.is_valid()
+            since = request.GET.get('since', '')
+
+        with instrumented_span(tracer, 'get_objects', child_of=request.span) as span:
+            address_filtering = get_address_filtering(request, span)
+            try:
+                # The default manager hides deleted Circuits, which the feed has to report. Transactions older than the
+                # oldest one still running have all finished, so no change can appear behind the ones read here. The
+                # bound is read in the same statement, so it matches the snapshot the rows are read from
+                objs = Circuit._base_manager.select_related('circuit_class').filter(
+                    address_filtering,
+                    change_xid__lt=RawSQL('pg_snapshot_xmin(pg_current_snapshot())::text::bigint', []),
+                    **controller.cleaned_data['search'],
+                ).exclude(
+                    **controller.cleaned_data['exclude'],
+                )
+            except (ValueError, ValidationError):
+                return Http400(error_code='circuit_circuit_changes_002')
+
+        with instrumented_span(tracer, 'generating_metadata', child_of=request.span):
+            limit = controller.cleaned_data['limit']
+            # Seek past the watermark on the (change_xid, id) index so each call reads only the changes it returns
+            try:
+                objs, next_watermark = paginate_by_cursor(objs, 'change_xid', since, limit)
+            except ValueError:
+                return Http400(error_code='circuit_circuit_changes_001')
+
+            more = next_watermark is not None
+            if not more:
+                # Every change has been read, so the next request starts after the last one returned, if any
+                next_watermark = encode_cursor(objs[-1], 'change_xid') if len(objs) > 0 else since
+            metadata = {
+                'limit': limit,
+                'more': more,
+                'since': since,
+                'warnings': controller.warnings,
+                'watermark': next_watermark,
+            }
+
+        with instrumented_span(tracer, 'prefetching_related', child_of=request.span):
+            # Load the nested Circuit Class properties for the whole page at once instead of per row
+            CircuitClass.objects.prefetch_totals(obj.circuit_class for obj in objs)
+
+        with instrumented_span(tracer, 'serializing_data', child_of=request.span) as span:
+            span.set_tag('num_objects', len(objs))
+            data = CircuitSerializer(instance=objs, many=True).data
+            for item, obj in zip(data, objs):
+                item['deleted'] = obj.deleted.isoformat() if obj.deleted is not None else None
+
+        return Response({'content': data, '_metadata': metadata}, status=status.HTTP_200_OK)
@@ -5,9 +5,9 @@ Management of Circuit Class
 from datetime import datetime
 # libs
 from cloudcix_rest.exceptions import Http400, Http404
-from cloudcix_rest.views import APIView
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
 from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.response import Response
@@ -17,9 +17,21 @@ from circuit.controllers import (
     CircuitClassListController,
     CircuitClassUpdateController,
 )
+from circuit.controllers.property_schema import invalidate_property_schema
+from circuit.db_router import PRIMARY
+from circuit.instrumentation import APIView, instrumented_span
 from circuit.models import CircuitClass, Property
 from circuit.permissions.circuit_class import Permissions
 from circuit.serializers import CircuitClassSerializer
+from circuit.utils import (
+    COUNT_STRATEGIES,
+    count_records,
+    is_conditional,
+    is_not_modified,
+    make_etag,
+    paginate_by_cursor,
+    set_validators,
+)
 
 
 __all__ = [
@@ -40,54 +52,119 @@ class CircuitClassCollection(APIView):
         description: |
             Retrieve a list of Circuit Class records for the requesting User's Member.
 
+            Send the `after` parameter to page with a cursor instead of `page`. Send it empty for the first page and
+            then send the `next` value from the previous response's metadata, which is null once every record has
+            been returned. In this mode `total_records` is only calculated when `count` is also sent.
+
+            Send `count` to choose how `total_records` is calculated. `exact` (the default) counts every matching
+            record, `capped` stops counting at a limit and returns e.g. "10000+" when there are more records, and
+            `estimate` returns the database's estimate of the number of records. The strategy that was used is
+            returned as `count_strategy` in the metadata.
+
+            The response has an ETag header if the records are counted exactly or validators were sent. Send it back
+            in If-None-Match to receive a 304 response with no content if the list has not changed.
+
         responses:
             200:
                 description: A list of Circuit Class records, filtered and ordered by the User.
+            304:
+                description: The list has not changed since the sent validators were generated
             400: {}
         """
         tracer = settings.TRACER
 
-        with tracer.start_span('validating_controller', child_of=request.span) as span:
+        with instrumented_span(tracer, 'validating_controller', child_of=request.span) as span:
             controller = CircuitClassListController(data=request.GET, request=request, span=span)
             # By validating the controller we will generate the filters
             controller.is_valid()
         # Now get a list of CircuitClass records using the filters
-        with tracer.start_span('get_objects', child_of=request.span):
+        with instrumented_span(tracer, 'get_objects', child_of=request.span):
             try:
                 # Search and exclude can be empty dicts so there's no need to check
                 # if they're populated
-                objs = CircuitClass.objects.filter(
+                # Properties are loaded for the page by CircuitClass.objects.prefetch_totals
+                objs = CircuitClass.objects.prefetch_related(None).filter(
                     member_id=request.user.member['id'],
                     **controller.cleaned_data['search'],
                 ).exclude(
                     **controller.cleaned_data['exclude'],
                 ).order_by(
                     controller.cleaned_data['order'],
+                    # id breaks ties so pages are stable, in the same direction so the indexes can be read backwards
+                    '-id' if controller.cleaned_data['order'].startswith('-') else 'id',
                 )
             except (ValueError, ValidationError):
                 return Http400(error_code='circuit_circuit_class_list_001')
 
-        with tracer.start_span('generating_metadata', child_of=request.span):
-            total_records = objs.count()
+        with instrumented_span(tracer, 'checking_validators', child_of=request.span):
+            # Cursor mode is meant for walking the whole list, so only count the records when asked to
+            cursor_mode = 'after' in request.GET
+            count_strategy = request.GET.get('count', None if cursor_mode else 'exact')
+            if count_strategy is not None and count_strategy not in COUNT_STRATEGIES:
+                return Http400(error_code='circuit_circuit_class_list_003')
+
+            # Generating the validators reads every matching record, so it is only done when the request sent
+            # validators, or when the records are counted exactly anyway and the count can share the read
+            totals = None
+            etag = None
+            last_modified = None
+            if count_strategy == 'exact' or is_conditional(request):
+                # The list changes when a Circuit Class in it is created, updated or deleted, or when its totals
+                # change. The totals are not timestamped, so only the ETag validates the list
+                totals = objs.order_by().aggregate(last_updated=Max('updated'), total=Count('id'))
+                totals_version = CircuitClass.objects.totals_version(objs.order_by().values('pk'))
+                etag = make_etag(request.GET.urlencode(), totals['total'], totals['last_updated'], totals_version)
+                if is_not_modified(request, etag, last_modified):
+                    return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+        with instrumented_span(tracer, 'generating_metadata', child_of=request.span):
             page = controller.cleaned_data['page']
             order = controller.cleaned_data['order']
             limit = controller.cleaned_data['limit']
             warnings = controller.warnings
 
-            metadata = {
-                'page': page,
-                'limit': limit,
-                'order': order,
-                'total_records': total_records,
-                'warnings': warnings,
-            }
-            objs = objs[page * limit:(page + 1) * limit]
-
-        with tracer.start_span('serializing_data', child_of=request.span) as span:
-            span.set_tag('num_objects', objs.count())
+            total_records = None
+            if count_strategy == 'exact':
+                # Already counted for the validators
+                total_records = totals['total']
+            elif count_strategy is not None:
+                total_records = count_records(objs, count_strategy)
+
+            if cursor_mode:
+                try:
+                    objs, next_cursor = paginate_by_cursor(objs, order, request.GET['after'], limit)
+                except ValueError:
+                    return Http400(error_code='circuit_circuit_class_list_002')
+
+                metadata = {
+                    'after': request.GET['after'],
+                    'count_strategy': count_strategy,
+                    'limit': limit,
+                    'next': next_cursor,
+                    'order': order,
+                    'total_records': total_records,
+                    'warnings': warnings,
+                }
+            else:
+                metadata = {
+                    'count_strategy': count_strategy,
+                    'page': page,
+                    'limit': limit,
+                    'order': order,
+                    'total_records': total_records,
+                    'warnings': warnings,
+                }
+                objs = objs[page * limit:(page + 1) * limit]
+
+        with instrumented_span(tracer, 'prefetching_related', child_of=request.span):
+            # Load the live properties for the whole page at once instead of per record
+            objs = CircuitClass.objects.prefetch_totals(objs)
+
+        with instrumented_span(tracer, 'serializing_data', child_of=request.span) as span:
+            span.set_tag('num_objects', len(objs))
             data = CircuitClassSerializer(instance=objs, many=True).data
 
-        return Response({'content': data, '_metadata': metadata})
+        return set_validators(Response({'content': data, '_metadata': metadata}), etag, last_modified)
 
     def post(self, request: Request) -> Response:
         """
@@ -105,34 +182,38 @@ class CircuitClassCollection(APIView):
         tracer = settings.TRACER
 
         # Have Permission checks as early as possible
-        with tracer.start_span('checking_permissions', child_of=request.span):
+        with instrumented_span(tracer, 'checking_permissions', child_of=request.span):
             err = Permissions.create(request)
             if err is not None:
                 return err
 
-        with tracer.start_span('validating_controller', child_of=request.span) as span:
+        with instrumented_span(tracer, 'validating_controller', child_of=request.span) as span:
             controller = CircuitClassCreateController(data=request.data, request=request, span=span)
             if not controller.is_valid():
                 return Http400(errors=controller.errors)
 
-        with tracer.start_span('saving_object', child_of=request.span):
+        with instrumented_span(tracer, 'saving_object', child_of=request.span):
             # Pop properties from controller.instance to save after Circuit Class is saved
             properties = controller.cleaned_data.pop('properties')
             # Set Required Values and save controller.instance
             controller.instance.member_id = request.user.member['id']
             controller.instance.save()
 
-        with tracer.start_span('saving_properties_object', child_of=request.span):
-            # Set Required Values and save validated properties
-            for item in properties:
-                Property.objects.create(
+        with instrumented_span(tracer, 'saving_properties_object', child_of=request.span):
+            # Set Required Values and save validated properties in one INSERT
+            Property.objects.bulk_create([
+                Property(
                     circuit_class=controller.instance,
                     key=item['key'],
                     property_type=item['property_type'],
                     required=item['required'],
                 )
+                for item in properties
+            ])
 
-        with tracer.start_span('serializing_data', child_of=request.span):
+        with instrumented_span(tracer, 'serializing_data', child_of=request.span):
+            # The totals were moved by writing the Properties
+            controller.instance.refresh_counters()
             data = CircuitClassSerializer(instance=controller.instance).data
 
         return Response({'content': data}, status=status.HTTP_201_CREATED)
@@ -150,6 +231,9 @@ class CircuitClassResource(APIView):
         description: |
             Attempt to read a Circuit Class record by the given `pk`, returning a 404 if it does not exist.
 
+            The response has an ETag header. Send it back in If-None-Match to receive a 304 response with no content
+            if the Circuit Class has not changed.
+
         path_params:
             pk:
                 description: The id of the Circuit Class record to be read.
@@ -158,20 +242,29 @@ class CircuitClassResource(APIView):
         responses:
             200:
                 description: Circuit Class record was read successfully.
+            304:
+                description: Circuit Class record has not changed since the sent validators were generated
             404: {}
         """
         tracer = settings.TRACER
 
-        with tracer.start_span('retrieving_requested_object', child_of=request.span):
+        with instrumented_span(tracer, 'retrieving_requested_object', child_of=request.span):
             try:
                 obj = CircuitClass.objects.get(id=pk, member_id=request.user.member['id'])
             except CircuitClass.DoesNotExist:
                 return Http404(error_code='circuit_circuit_class_read_001')
 
-        with tracer.start_span('serializing_data', child_of=request.span):
+        with instrumented_span(tracer, 'checking_validators', child_of=request.span):
+            # The totals are not timestamped, so only the ETag validates the Circuit Class
+            etag = make_etag(obj.pk, obj.updated, obj.total_circuits, obj.total_properties)
+            last_modified = None
+            if is_not_modified(request, etag, last_modified):
+                return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+        with instrumented_span(tracer, 'serializing_data', child_of=request.span):
             data = CircuitClassSerializer(instance=obj).data
 
-        return Response({'content': data})
+        return set_validators(Response({'content': data}), etag, last_modified)
 
     def put(self, request: Request, pk: int, partial: bool = False) -> Response:
         """
@@ -193,13 +286,14 @@ class CircuitClassResource(APIView):
         """
         tracer = settings.TRACER
 
-        with tracer.start_span('retrieving_department_object', child_of=request.span):
+        with instrumented_span(tracer, 'retrieving_department_object', child_of=request.span):
             try:
-                obj = CircuitClass.objects.get(id=pk, member_id=request.user.member['id'])
+                # Loaded from the primary, as every column is written back from it
+                obj = CircuitClass.objects.using(PRIMARY).get(id=pk, member_id=request.user.member['id'])
             except CircuitClass.DoesNotExist:
                 return Http404(error_code='circuit_circuit_class_update_001')
 
-        with tracer.start_span('validating_controller', child_of=request.span) as span:
+        with instrumented_span(tracer, 'validating_controller', child_of=request.span) as span:
             controller = CircuitClassUpdateController(
                 instance=obj,
                 data=request.data,
@@ -210,24 +304,39 @@ class CircuitClassResource(APIView):
             if not controller.is_valid():
                 return Http400(errors=controller.errors)
 
-        with tracer.start_span('saving_object', child_of=request.span):
+        with instrumented_span(tracer, 'saving_object', child_of=request.span):
             properties = controller.cleaned_data.pop('properties')
             controller.instance.save()
 
-        with tracer.start_span('updating_properties_object', child_of=request.span):
-            # Set deleted property to current time for existing properties
-            obj.properties.all().update(deleted=datetime.now())
+        with instrumented_span(tracer, 'updating_properties_object', child_of=request.span):
+            # Only the properties that were removed or changed are touched. A changed property is replaced, so the
+            # old definition is kept as a deleted record in the same way as a removed one
+            current = {p.key: p for p in obj.properties.filter(deleted__isnull=True)}
+            sent = {item['key']: item for item in properties}
+            replaced = {
+                p.pk for key, p in current.items()
+                if key not in sent or (
+                    p.property_type_id != sent[key]['property_type'].pk or p.required != sent[key]['required']
+                )
+            }
+            if len(replaced) > 0:
+                Property.objects.filter(pk__in=replaced).update(deleted=datetime.now())
 
-            # Create and save new Property objects with updated values
-            for item in properties:
-                Property.objects.create(
+            Property.objects.bulk_create([
+                Property(
                     circuit_class=controller.instance,
-                    key=item['key'],
+                    key=key,
                     property_type=item['property_type'],
                     required=item['required'],
                 )
-
-        with tracer.start_span('serializing_data', child_of=request.span):
+                for key, item in sent.items()
+                if key not in current or current[key].pk in replaced
+            ])
+            invalidate_property_schema(controller.instance.pk)
+
+        with instrumented_span(tracer, 'serializing_data', child_of=request.span):
+            # The totals were moved by writing the Properties
+            controller.instance.refresh_counters()
             data = CircuitClassSerializer(instance=controller.instance).data
 
         return Response({'content': data}, status=status.HTTP_200_OK)
@@ -259,17 +368,19 @@ class CircuitClassResource(APIView):
         """
         tracer = settings.TRACER
 
-        with tracer.start_span('retrieving_department_object', child_of=request.span):
+        with instrumented_span(tracer, 'retrieving_department_object', child_of=request.span):
             try:
-                obj = CircuitClass.objects.get(id=pk, member_id=request.user.member['id'])
+                # Loaded from the primary, so the checks before deleting see the latest writes
+                obj = CircuitClass.objects.using(PRIMARY).get(id=pk, member_id=request.user.member['id'])
             except CircuitClass.DoesNotExist:
                 return Http404(error_code='circuit_circuit_class_delete_001')
 
-        with tracer.start_span('checking_permissions', child_of=request.span):
+        with instrumented_span(tracer, 'checking_permissions', child_of=request.span):
             err = Permissions.delete(request, obj)
             if err is not None:
                 return err
 
-        with tracer.start_span('saving_object', child_of=request.span):
+        with instrumented_span(tracer, 'saving_object', child_of=request.span):
             obj.cascade_delete()
+            invalidate_property_schema(obj.pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
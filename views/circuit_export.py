@@ -0,0 +1,173 @@
+"""
+Export of Circuit records
+"""
+# stdlib
+import csv
+import json
+from typing import Any, Dict, Iterable, Iterator, List
+# libs
+from cloudcix_rest.exceptions import Http400
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.request import Request
+# local
+from circuit.controllers.circuit import CircuitListController
+from circuit.instrumentation import APIView, instrumented_span
+from circuit.models import Circuit, CircuitClass
+from circuit.serializers import CircuitSerializer
+from circuit.utils import get_address_filtering
+
+
+__all__ = [
+    'CircuitExportCollection',
+]
+
+# Columns written to the CSV export. The nested Circuit Class is reduced to its name and the properties are written
+# as a JSON object
+CSV_COLUMNS = (
+    'id',
+    'reference_number',
+    'reference',
+    'address_id',
+    'customer_address_id',
+    'service_provider_address_id',
+    'circuit_class_id',
+    'circuit_class_name',
+    'bandwidth',
+    'description',
+    'group_name',
+    'hand_off_point',
+    'install_date',
+    'decommission_date',
+    'properties',
+    'created',
+    'updated',
+    'uri',
+)
+
+
+class _Echo:
+    """
+    File-like object that hands back what is written to it, so csv.writer can produce one line at a time
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _serialize_chunks(objs: Iterable[Circuit], chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Serialize Circuit records a chunk at a time. Each Circuit Class is loaded, with its live properties,
+    the first time it is seen and reused for every later Circuit, so memory use depends on the chunk size and
+    the number of Circuit Classes rather than the number of Circuits.
+    """
+    circuit_classes: Dict[int, CircuitClass] = {}
+    chunk: List[Circuit] = []
+
+    def serialize() -> List[Dict[str, Any]]:
+        missing = {obj.circuit_class_id for obj in chunk} - circuit_classes.keys()
+        if len(missing) > 0:
+            for circuit_class in CircuitClass.objects.prefetch_totals(
+                CircuitClass.objects.prefetch_related(None).filter(pk__in=missing),
+            ):
+                circuit_classes[circuit_class.pk] = circuit_class
+        for obj in chunk:
+            if obj.circuit_class_id in circuit_classes:
+                obj.circuit_class = circuit_classes[obj.circuit_class_id]
+        return CircuitSerializer(instance=chunk, many=True).data
+
+    for obj in objs:
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            yield serialize()
+            chunk = []
+    if len(chunk) > 0:
+        yield serialize()
+
+
+def _ndjson_rows(chunks: Iterator[List[Dict[str, Any]]]) -> Iterator[str]:
+    """
+    Write each serialized Circuit as one line of JSON
+    """
+    for chunk in chunks:
+        yield ''.join(f'{json.dumps(row, cls=DjangoJSONEncoder)}\n' for row in chunk)
+
+
+def _csv_rows(chunks: Iterator[List[Dict[str, Any]]]) -> Iterator[str]:
+    """
+    Write each serialized Circuit as one CSV row, after a header row
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for chunk in chunks:
+        lines = []
+        for row in chunk:
+            row = dict(row)
+            row['circuit_class_name'] = row['circuit_class']['name']
+            row['properties'] = json.dumps(row['properties'], cls=DjangoJSONEncoder)
+            lines.append(writer.writerow([row.get(column) for column in CSV_COLUMNS]))
+        yield ''.join(lines)
+
+
+class CircuitExportCollection(APIView):
+    """
+    Handles exporting every Circuit record the requesting User can see
+    """
+
+    def get(self, request: Request) -> StreamingHttpResponse:
+        """
+        summary: Export a list of Circuit records
+
+        description: |
+            Stream every Circuit record visible to the requesting User, filtered and ordered in the same way as the
+            list of Circuit records, without pagination.
+
+            Send `output=csv` to receive CSV, with the Circuit Class name in place of the nested Circuit Class and the
+            properties as a JSON object. By default each Circuit is sent as one line of JSON (NDJSON), in the same
+            shape as the list of Circuit records.
+
+        responses:
+            200:
+                description: The filtered and ordered Circuit records, as NDJSON or CSV
+            400: {}
+        """
+        tracer = settings.TRACER
+
+        # `format` is reserved by Django REST Framework for choosing a renderer
+        export_format = request.GET.get('output', 'ndjson').lower()
+        if export_format not in ('csv', 'ndjson'):
+            return Http400(error_code='circuit_circuit_export_001')
+
+        with instrumented_span(tracer, 'validating_controller', child_of=request.span) as span:
+            controller = CircuitListController(data=request.GET, request=request, span=span)
+            # By validating the controller we will generate the filters
+            controller.is_valid()
+
+        with instrumented_span(tracer, 'get_objects', child_of=request.span) as span:
+            address_filtering = get_address_filtering(request, span)
+            try:
+                # The Circuit Classes are loaded once each while serializing instead of being joined to every row
+                objs = Circuit.objects.select_related(None).filter(
+                    **controller.cleaned_data['search'],
+                ).filter(
+                    address_filtering,
+                ).exclude(
+                    **controller.cleaned_data['exclude'],
+                ).order_by(
+                    controller.cleaned_data['order'],
+                    '-id' if controller.cleaned_data['order'].startswith('-') else 'id',
+                )
+            except (ValueError, ValidationError):
+                return Http400(error_code='circuit_circuit_export_002')
+
+        # Read the rows through a server side cursor so only one chunk is held in memory at a time
+        chunk_size = getattr(settings, 'CIRCUIT_EXPORT_CHUNK_SIZE', 2000)
+        chunks = _serialize_chunks(objs.iterator(chunk_size=chunk_size), chunk_size)
+        if export_format == 'csv':
+            response = StreamingHttpResponse(_csv_rows(chunks), content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="circuits.csv"'
+        else:
+            response = StreamingHttpResponse(_ndjson_rows(chunks), content_type='application/x-ndjson')
+        return response
@@ -0,0 +1,325 @@
+"""
+Import of Circuit records from a CSV or NDJSON file
+"""
+# stdlib
+import csv
+import json
+from datetime import datetime
+from io import StringIO
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+# libs
+from cloudcix_rest.exceptions import Http400
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import connections, transaction
+from rest_framework import status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.request import Request
+from rest_framework.response import Response
+# local
+from circuit import errors as error_codes
+from circuit.controllers.address_validation import prefetch_readable_addresses
+from circuit.controllers.circuit import CircuitCreateController
+from circuit.instrumentation import APIView, instrumented_span
+from circuit.permissions.circuit import Permissions
+
+
+__all__ = [
+    'CircuitImportCollection',
+]
+
+# Fields that can be sent for each Circuit, as for a request to create a single Circuit
+IMPORT_FIELDS = (
+    'bandwidth',
+    'circuit_class_id',
+    'customer_address_id',
+    'decommission_date',
+    'description',
+    'group_name',
+    'hand_off_point',
+    'install_date',
+    'properties',
+    'reference',
+    'service_provider_address_id',
+)
+# Text fields where an empty CSV cell is an empty string rather than a missing value
+_TEXT_FIELDS = ('description', 'group_name', 'hand_off_point', 'reference')
+
+# Columns of the staging table that valid rows are copied into, in COPY order
+STAGING_COLUMNS = (
+    'row_index',
+    'address_id',
+    'bandwidth',
+    'circuit_class_id',
+    'customer_address_id',
+    'decommission_date',
+    'description',
+    'group_name',
+    'hand_off_point',
+    'install_date',
+    'properties',
+    'reference',
+    'service_provider_address_id',
+)
+
+CREATE_STAGING_TABLE = """
+    CREATE TEMPORARY TABLE circuit_import_staging (
+        row_index integer NOT NULL,
+        address_id integer NOT NULL,
+        bandwidth integer,
+        circuit_class_id bigint NOT NULL,
+        customer_address_id integer,
+        decommission_date timestamptz,
+        description text NOT NULL,
+        group_name varchar(250),
+        hand_off_point varchar(20),
+        install_date timestamptz NOT NULL,
+        properties jsonb NOT NULL,
+        reference varchar(100),
+        service_provider_address_id integer
+    ) ON COMMIT DROP
+"""
+
+# Move the staged rows into circuit in one statement. Each Address takes a block of reference_numbers from its counter
+# with a single upsert, and the numbers in the block are given out in the order of the rows in the file
+INSERT_FROM_STAGING = """
+    WITH counts AS (
+        SELECT address_id, COUNT(*) AS num_rows
+        FROM circuit_import_staging
+        GROUP BY address_id
+    ), blocks AS (
+        INSERT INTO circuit_reference_number AS counter (address_id, last_reference_number)
+        SELECT address_id, num_rows FROM counts
+        ON CONFLICT (address_id) DO UPDATE
+            SET last_reference_number = counter.last_reference_number + EXCLUDED.last_reference_number
+        RETURNING counter.address_id, counter.last_reference_number
+    )
+    INSERT INTO circuit (
+        created, updated, extra, address_id, bandwidth, circuit_class_id, customer_address_id, decommission_date,
+        description, group_name, hand_off_point, install_date, properties, reference, service_provider_address_id,
+        party_address_ids, change_xid, reference_number
+    )
+    SELECT
+        NOW(), NOW(), '{}', staged.address_id, staged.bandwidth, staged.circuit_class_id, staged.customer_address_id,
+        staged.decommission_date, staged.description, staged.group_name, staged.hand_off_point, staged.install_date,
+        staged.properties, staged.reference, staged.service_provider_address_id, '{}', 0,
+        blocks.last_reference_number - counts.num_rows
+        + ROW_NUMBER() OVER (PARTITION BY staged.address_id ORDER BY staged.row_index)
+    FROM circuit_import_staging AS staged
+    JOIN counts USING (address_id)
+    JOIN blocks USING (address_id)
+    ORDER BY staged.row_index
+    RETURNING address_id, reference_number
+"""
+
+
+def _read_rows(upload: UploadedFile, input_format: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Read the uploaded file a line at a time, yielding the index and data of each Circuit in it.
+    The data is None for a row that could not be read as a Circuit.
+    :raises ValueError: If the file is not UTF-8, or the CSV header has columns that are not Circuit fields
+    """
+    lines = (line.decode('utf-8') for line in upload)
+    if input_format == 'ndjson':
+        index = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                item = None
+            yield index, item if isinstance(item, dict) else None
+            index += 1
+        return
+
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [column.strip() for column in header]
+    if any(column not in IMPORT_FIELDS for column in header):
+        raise ValueError('Unknown column')
+    for index, values in enumerate(reader):
+        if len(values) != len(header):
+            yield index, None
+            continue
+        item: Dict[str, Any] = {}
+        for column, value in zip(header, values):
+            if value == '' and column not in _TEXT_FIELDS:
+                continue
+            if column == 'properties':
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    # Left as a string so it is rejected like any other properties that are not an object
+                    pass
+            item[column] = value
+        yield index, item
+
+
+def _chunks(rows: Iterable[Tuple[int, Any]], size: int) -> Iterator[List[Tuple[int, Any]]]:
+    chunk: List[Tuple[int, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+
+def _copy_value(value: Any) -> str:
+    """
+    Write one value in the text format of COPY
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, dict):
+        value = json.dumps(value)
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+def _copy_rows(cursor: Any, rows: Sequence[Sequence[Any]]):
+    """
+    COPY the rows into the staging table, with either version of the psycopg driver
+    """
+    data = ''.join('\t'.join(_copy_value(value) for value in row) + '\n' for row in rows)
+    sql = f'COPY circuit_import_staging ({", ".join(STAGING_COLUMNS)}) FROM STDIN'
+    raw = cursor.cursor
+    if hasattr(raw, 'copy'):
+        # psycopg 3
+        with raw.copy(sql) as copy:
+            copy.write(data)
+    else:
+        # psycopg2
+        raw.copy_expert(sql, StringIO(data))
+
+
+class CircuitImportCollection(APIView):
+    """
+    Handles importing Circuit records from a file
+    """
+    parser_classes = (MultiPartParser,)
+
+    def post(self, request: Request) -> Response:
+        """
+        summary: Import Circuit records from a file
+
+        description: |
+            Create Circuit records in the requesting User's Address from an uploaded file, sent as `file` in a
+            multipart request. Send `input=ndjson` for a file with one JSON object per line. By default the file is
+            read as CSV with a header row naming the columns, which must be fields of a Circuit. Empty cells are
+            treated as missing values, and `properties` is a JSON object.
+
+            The file is read and validated in chunks with the same rules as a request to create a single Circuit.
+            The valid rows are created together, with reference numbers given out in the order of the rows in the
+            file. The response contains the number of created Circuits and the errors for each invalid row, keyed by
+            the index of the row, starting at 0 for the first row after the header.
+
+        responses:
+            201:
+                description: The valid Circuit records in the file were created successfully
+            400: {}
+            403: {}
+        """
+        tracer = settings.TRACER
+
+        # Have Permission checks as early as possible
+        with instrumented_span(tracer, 'checking_permissions', child_of=request.span):
+            err = Permissions.create(request)
+            if err is not None:
+                return err
+
+        upload = request.FILES.get('file', None)
+        if upload is None:
+            return Http400(error_code='circuit_circuit_import_001')
+        input_format = request.GET.get('input', 'csv').lower()
+        if input_format not in ('csv', 'ndjson'):
+            return Http400(error_code='circuit_circuit_import_002')
+
+        address_id = request.user.address['id']
+        chunk_size = getattr(settings, 'CIRCUIT_IMPORT_CHUNK_SIZE', 5000)
+        # Each distinct Circuit Class and Address is only looked up once for the whole file
+        lookups: Dict[Tuple[str, int], Any] = {}
+        errors: Dict[int, Any] = {}
+        num_rows = 0
+        num_valid = 0
+
+        with transaction.atomic(using='circuit'), connections['circuit'].cursor() as cursor:
+            cursor.execute(CREATE_STAGING_TABLE)
+            try:
+                for chunk in _chunks(_read_rows(upload, input_format), chunk_size):
+                    with instrumented_span(tracer, 'validating_chunk', child_of=request.span) as span:
+                        span.set_tag('num_rows', len(chunk))
+                        # Check every Address in the chunk together rather than one row at a time
+                        prefetch_readable_addresses(request, span, (item for _, item in chunk), lookups)
+                        staged = []
+                        for index, item in chunk:
+                            if item is None:
+                                errors[index] = {'row': {
+                                    'error_code': 'circuit_circuit_import_004',
+                                    'detail': error_codes.circuit_circuit_import_004,
+                                }}
+                                continue
+                            item = {key: item[key] for key in IMPORT_FIELDS if key in item}
+                            controller = CircuitCreateController(
+                                data=item,
+                                request=request,
+                                span=span,
+                                lookups=lookups,
+                            )
+                            if not controller.is_valid():
+                                errors[index] = controller.errors
+                                continue
+                            obj = controller.instance
+                            staged.append((
+                                index,
+                                address_id,
+                                obj.bandwidth,
+                                obj.circuit_class_id,
+                                obj.customer_address_id,
+                                obj.decommission_date,
+                                obj.description,
+                                obj.group_name,
+                                obj.hand_off_point,
+                                obj.install_date,
+                                obj.properties,
+                                obj.reference,
+                                obj.service_provider_address_id,
+                            ))
+                        num_rows += len(chunk)
+
+                    with instrumented_span(tracer, 'copying_chunk', child_of=request.span) as span:
+                        span.set_tag('num_objects', len(staged))
+                        if len(staged) > 0:
+                            _copy_rows(cursor, staged)
+                            num_valid += len(staged)
+            except (UnicodeDecodeError, ValueError, csv.Error):
+                transaction.set_rollback(True, using='circuit')
+                return Http400(error_code='circuit_circuit_import_003')
+
+            if num_rows == 0:
+                return Http400(error_code='circuit_circuit_import_003')
+            if num_valid == 0:
+                return Http400(errors=errors)
+
+            with instrumented_span(tracer, 'saving_objects', child_of=request.span) as span:
+                span.set_tag('num_objects', num_valid)
+                cursor.execute(INSERT_FROM_STAGING)
+                reference_numbers = [reference_number for _, reference_number in cursor.fetchall()]
+
+        data = {
+            'created': num_valid,
+            'first_reference_number': min(reference_numbers),
+            'last_reference_number': max(reference_numbers),
+        }
+        return Response({'content': data, 'errors': errors}, status=status.HTTP_201_CREATED)
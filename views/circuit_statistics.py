@@ -0,0 +1,135 @@
+"""
+Statistics of Circuit records
+"""
+# stdlib
+from datetime import date
+from typing import Any, Dict
+# libs
+from cloudcix_rest.exceptions import Http400
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Sum
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+# local
+from circuit.controllers import CircuitStatisticsListController
+from circuit.instrumentation import APIView, instrumented_span
+from circuit.models import CircuitRollup
+from circuit.utils import get_address_filtering
+
+
+__all__ = [
+    'CircuitStatisticsCollection',
+]
+
+# Fields the statistics can be grouped by
+GROUP_BY_FIELDS = (
+    'circuit_class_id',
+    'decommission_month',
+    'group_name',
+    'hand_off_point',
+    'install_month',
+)
+
+# The annotations the sums are read into, by the name they are returned as. They cannot share the names of the
+# CircuitRollup fields they sum
+_AGGREGATES = {
+    'num_circuits': 'circuits',
+    'total_bandwidth': 'bandwidth',
+}
+
+
+class CircuitStatisticsCollection(APIView):
+    """
+    Handles reading the statistics of the Circuit records the requesting User can see
+    """
+
+    def get(self, request: Request) -> Response:
+        """
+        summary: Retrieve statistics of Circuit records
+
+        description: |
+            Retrieve the number of Circuit records and their total bandwidth, for the Circuits visible to the
+            requesting User in the same way as the list of Circuit records. Deleted Circuits are not counted.
+
+            Send `group_by` as a comma separated list of fields to receive one row per group instead of one row for
+            every Circuit. The fields that can be used are `circuit_class_id`, `decommission_month`, `group_name`,
+            `hand_off_point` and `install_month`. The months are the first day of the month the Circuit was installed
+            or decommissioned in, in UTC.
+
+            The rows can be filtered by the group fields and the Address fields, and ordered by any of the grouped
+            fields, `num_circuits` or `total_bandwidth`. The statistics are read from a rollup that is kept up to date
+            as Circuits are written, so no Circuit records are scanned.
+
+        responses:
+            200:
+                description: The number and total bandwidth of the Circuit records in each group
+            400: {}
+        """
+        tracer = settings.TRACER
+
+        with instrumented_span(tracer, 'validating_controller', child_of=request.span) as span:
+            controller = CircuitStatisticsListController(data=request.GET, request=request, span=span)
+            # By validating the controller we will generate the filters
+            controller.is_valid()
+
+            group_by = [field.strip() for field in request.GET.get('group_by', '').split(',') if field.strip()]
+            if any(field not in GROUP_BY_FIELDS for field in group_by):
+                return Http400(error_code='circuit_circuit_statistics_001')
+            group_by = list(dict.fromkeys(group_by))
+
+            order = controller.cleaned_data['order']
+            field = order.lstrip('-')
+            if field in _AGGREGATES:
+                order_by = f'{order[:-len(field)]}{_AGGREGATES[field]}'
+            elif field in group_by:
+                order_by = order
+            else:
+                return Http400(error_code='circuit_circuit_statistics_002')
+
+        with instrumented_span(tracer, 'get_objects', child_of=request.span) as span:
+            address_filtering = get_address_filtering(request, span)
+            try:
+                objs = CircuitRollup.objects.filter(
+                    address_filtering,
+                    **controller.cleaned_data['search'],
+                ).exclude(
+                    **controller.cleaned_data['exclude'],
+                )
+                aggregates = {name: Sum(field) for field, name in _AGGREGATES.items()}
+                if len(group_by) == 0:
+                    objs = [objs.aggregate(**aggregates)]
+                    total_records = 1
+                else:
+                    objs = objs.values(*group_by).annotate(**aggregates).order_by(order_by, *group_by)
+                    total_records = objs.count()
+            except (ValueError, ValidationError):
+                return Http400(error_code='circuit_circuit_statistics_003')
+
+        with instrumented_span(tracer, 'generating_metadata', child_of=request.span):
+            page = controller.cleaned_data['page']
+            limit = controller.cleaned_data['limit']
+            metadata = {
+                'group_by': group_by,
+                'page': page,
+                'limit': limit,
+                'order': order,
+                'total_records': total_records,
+                'warnings': controller.warnings,
+            }
+            objs = objs[page * limit:(page + 1) * limit]
+
+        with instrumented_span(tracer, 'serializing_data', child_of=request.span) as span:
+            results = []
+            for obj in objs:
+                row: Dict[str, Any] = {
+                    field: obj[field].isoformat() if isinstance(obj[field], date) else obj[field]
+                    for field in group_by
+                }
+                for field, name in _AGGREGATES.items():
+                    row[field] = obj[name] or 0
+                results.append(row)
+            span.set_tag('num_objects', len(results))
+
+        return Response({'content': results, '_metadata': metadata}, status=status.HTTP_200_OK)
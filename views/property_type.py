@@ -3,13 +3,13 @@ Management of Property Type
 """
 # libs
 from cloudcix_rest.exceptions import Http400
-from cloudcix_rest.views import APIView
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from rest_framework.request import Request
 from rest_framework.response import Response
 # local
 from circuit.controllers import PropertyTypeListController
+from circuit.instrumentation import APIView, instrumented_span
 from circuit.models import PropertyType
 from circuit.serializers import PropertyTypeSerializer
 
@@ -38,12 +38,12 @@ class PropertyTypeCollection(APIView):
         """
         tracer = settings.TRACER
 
-        with tracer.start_span('validating_controller', child_of=request.span) as span:
+        with instrumented_span(tracer, 'validating_controller', child_of=request.span) as span:
             controller = PropertyTypeListController(data=request.GET, request=request, span=span)
             # By validating the controller we will generate the filters
             controller.is_valid()
         # Now get a list of PropertyType records using the filters
-        with tracer.start_span('get_objects', child_of=request.span):
+        with instrumented_span(tracer, 'get_objects', child_of=request.span):
             try:
                 # Search and exclude can be empty dicts so there's no need to check
                 # if they're populated
@@ -57,7 +57,7 @@ class PropertyTypeCollection(APIView):
             except (ValueError, ValidationError):
                 return Http400(error_code='circuit_property_type_list_001')
 
-        with tracer.start_span('generating_metadata', child_of=request.span):
+        with instrumented_span(tracer, 'generating_metadata', child_of=request.span):
             total_records = objs.count()
             page = controller.cleaned_data['page']
             order = controller.cleaned_data['order']
@@ -73,7 +73,7 @@ class PropertyTypeCollection(APIView):
             }
             objs = objs[page * limit:(page + 1) * limit]
 
-        with tracer.start_span('serializing_data', child_of=request.span) as span:
+        with instrumented_span(tracer, 'serializing_data', child_of=request.span) as span:
             span.set_tag('num_objects', objs.count())
             data = PropertyTypeSerializer(instance=objs, many=True).data
 
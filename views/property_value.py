@@ -2,15 +2,17 @@
 Management of Property Value
 """
 # libs
-from cloudcix_rest.views import APIView
+from cloudcix_rest.exceptions import Http400
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.response import Response
-from django.db.models import Q
 # local
-from circuit.models import Circuit
-from circuit.utils import get_addresses_in_member
+from circuit.controllers import PropertyValueListController
+from circuit.instrumentation import APIView, instrumented_span
+from circuit.models import PropertyValue
+from circuit.utils import get_address_filtering
 
 
 __all__ = [
@@ -29,6 +31,7 @@ class PropertyValueCollection(APIView):
 
         description: |
             Retrieve a list of Circuit Properties that contain sent search_term for the requesting User's Address.
+            The list is paginated and ordered by the property value unless another order is requested.
 
             The data is returned in a map similar to
             ```
@@ -52,43 +55,64 @@ class PropertyValueCollection(APIView):
                     application/json:
                         schema:
                             type: object
+            400: {}
         """
         tracer = settings.TRACER
 
+        with instrumented_span(tracer, 'validating_controller', child_of=request.span) as span:
+            controller = PropertyValueListController(data=request.GET, request=request, span=span)
+            # By validating the controller we will generate the filters
+            controller.is_valid()
+
         # Now get a list of Circuit records using the filters
-        with tracer.start_span('set_address_filtering', child_of=request.span) as span:
-            # A global-active user can list all projects in their member
-            if request.user.is_global and request.user.global_active:
-                addresses = get_addresses_in_member(request, span)
-                address_filtering = (
-                    Q(address_id__in=addresses) |
-                    Q(customer_address_id__in=addresses) |
-                    Q(service_provider_address_id__in=addresses)
-                )
-            else:
-                address_filtering = (
-                    Q(address_id=request.user.address['id']) |
-                    Q(customer_address_id=request.user.address['id']) |
-                    Q(service_provider_address_id=request.user.address['id'])
+        with instrumented_span(tracer, 'set_address_filtering', child_of=request.span) as span:
+            address_filtering = get_address_filtering(request, span, prefix='circuit__')
+
+        with instrumented_span(tracer, 'get_objects', child_of=request.span):
+            try:
+                # Matching uses the trigram index on circuit_property_value, and sorting and paging happen in the DB
+                objs = PropertyValue.objects.filter(
+                    address_filtering,
+                    circuit__deleted__isnull=True,
+                    circuit__decommission_date__isnull=True,
+                    value__icontains=search_term,
+                    **controller.cleaned_data['search'],
+                ).exclude(
+                    **controller.cleaned_data['exclude'],
+                ).order_by(
+                    controller.cleaned_data['order'],
+                    'circuit_id',
+                    'key',
                 )
+            except (ValueError, ValidationError):
+                return Http400(error_code='circuit_property_value_list_001')
+
+        with instrumented_span(tracer, 'generating_metadata', child_of=request.span):
+            total_records = objs.count()
+            page = controller.cleaned_data['page']
+            order = controller.cleaned_data['order']
+            limit = controller.cleaned_data['limit']
+            warnings = controller.warnings
+
+            metadata = {
+                'page': page,
+                'limit': limit,
+                'order': order,
+                'total_records': total_records,
+                'warnings': warnings,
+            }
+            objs = objs[page * limit:(page + 1) * limit]
+
+        with instrumented_span(tracer, 'serializing_data', child_of=request.span) as span:
+            results = [
+                {
+                    'circuit_id': obj['circuit_id'],
+                    'property_value': obj['value'],
+                    'reference': obj['circuit__reference'],
+                    'reference_number': obj['circuit__reference_number'],
+                }
+                for obj in objs.values('circuit_id', 'value', 'circuit__reference', 'circuit__reference_number')
+            ]
+            span.set_tag('num_objects', len(results))
 
-        with tracer.start_span('get_objects', child_of=request.span):
-            # Apply address filtering
-            objs = Circuit.objects.filter(address_filtering, decommission_date__isnull=True)
-            # Filtering results by sent search_term
-            objs = objs.filter(properties__icontains=search_term)
-            results = []
-            for circuit in objs:
-                for value in circuit.properties.values():
-                    value = str(value)
-                    if search_term.lower() in value.lower():
-                        results.append({
-                            'circuit_id': circuit.id,
-                            'property_value': value,
-                            'reference': circuit.reference,
-                            'reference_number': circuit.reference_number,
-                        })
-            # Sort results alphabetically
-            results = sorted(results, key=lambda x: x['property_value'])
-
-        return Response({'content': results}, status=status.HTTP_200_OK)
+        return Response({'content': results, '_metadata': metadata}, status=status.HTTP_200_OK)